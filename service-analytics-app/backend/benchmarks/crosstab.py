@@ -0,0 +1,156 @@
+"""
+Benchmark of the crosstab engine against a per-answer Python loop.
+
+Run from the backend directory against a loaded database:
+
+    python -m benchmarks.crosstab --survey QS0001 --rows Q1 --columns Q4 [--repeat 5] [--output results.json]
+
+The choice rows of both questions are fetched once (timed separately); the
+vectorized engine (``bincount`` over the paired answers) and a loop that
+collects answer sets per respondent and counts cell by cell are timed on the
+same rows and must agree.
+"""
+import argparse
+import json
+import statistics
+import time
+from typing import Callable, Dict, List, Sequence
+import numpy as np
+from src.models import SessionLocal, AnswerOption, Question, QuestionType
+from src.services.crosstab_service import Crosstab, answers_statement, crosstab_from_rows
+
+
+def time_call(func: Callable[[], Crosstab], repeat: int) -> Dict[str, float]:
+    timings: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return {"ms_median": statistics.median(timings) * 1000, "ms_min": min(timings) * 1000}
+
+
+def loop_crosstab(
+    answer_rows: Sequence,
+    row_question: Question,
+    column_question: Question,
+    row_codes: Sequence[int],
+    column_codes: Sequence[int]
+) -> Crosstab:
+    """Reference implementation: answer sets per respondent, counted in Python loops."""
+    answers: Dict[str, Dict[str, set]] = {row_question.id: {}, column_question.id: {}}
+    for question_id, respondent_id, code in answer_rows:
+        for question in (row_question, column_question):
+            if question.id != question_id:
+                continue
+            if question.type == QuestionType.SINGLE:
+                answers[question_id][respondent_id] = {code}
+            else:
+                answers[question_id].setdefault(respondent_id, set()).add(code)
+
+    row_answers, column_answers = answers[row_question.id], answers[column_question.id]
+    row_position = {code: i for i, code in enumerate(row_codes)}
+    column_position = {code: j for j, code in enumerate(column_codes)}
+    counts = np.zeros((len(row_codes), len(column_codes)), dtype=np.int64)
+    row_totals = np.zeros(len(row_codes), dtype=np.int64)
+    column_totals = np.zeros(len(column_codes), dtype=np.int64)
+    total = 0
+    for respondent_id, row_set in row_answers.items():
+        column_set = column_answers.get(respondent_id)
+        if not column_set:
+            continue
+        total += 1
+        for row_code in row_set:
+            row_totals[row_position[row_code]] += 1
+            for column_code in column_set:
+                counts[row_position[row_code], column_position[column_code]] += 1
+        for column_code in column_set:
+            column_totals[column_position[column_code]] += 1
+    return Crosstab(counts, row_totals, column_totals, total)
+
+
+def run(survey_id: str, row_name: str, column_name: str, repeat: int) -> Dict[str, Dict]:
+    """Fetch the answers of both questions and time both engines on them."""
+    db = SessionLocal()
+    try:
+        questions = {
+            q.name: q for q in db.query(Question).filter(
+                Question.survey_id == survey_id, Question.name.in_([row_name, column_name])
+            ).all()
+        }
+        missing = [name for name in (row_name, column_name) if name not in questions]
+        if missing:
+            raise SystemExit(f"Questions not found in survey {survey_id}: {', '.join(missing)}")
+        row_question, column_question = questions[row_name], questions[column_name]
+
+        def option_codes(question: Question) -> List[int]:
+            return [code for (code,) in db.query(AnswerOption.code).filter(
+                AnswerOption.question_id == question.id
+            ).order_by(AnswerOption.code).all()]
+
+        row_codes, column_codes = option_codes(row_question), option_codes(column_question)
+        started = time.perf_counter()
+        answer_rows = db.execute(
+            answers_statement(survey_id, list(dict.fromkeys([row_question.id, column_question.id])))
+        ).all()
+        fetch_ms = (time.perf_counter() - started) * 1000
+    finally:
+        db.close()
+
+    args = (answer_rows, row_question, column_question, row_codes, column_codes)
+    vectorized, looped = crosstab_from_rows(*args), loop_crosstab(*args)
+    if not (np.array_equal(vectorized.counts, looped.counts)
+            and np.array_equal(vectorized.row_totals, looped.row_totals)
+            and np.array_equal(vectorized.column_totals, looped.column_totals)
+            and vectorized.total == looped.total):
+        raise SystemExit("Vectorized and loop crosstabs differ")
+
+    return {
+        "vectorized": time_call(lambda: crosstab_from_rows(*args), repeat),
+        "loop": time_call(lambda: loop_crosstab(*args), repeat),
+        "_meta": {
+            "answer_rows": len(answer_rows),
+            "respondents": vectorized.total,
+            "cells": int(vectorized.counts.size),
+            "row_type": row_question.type.name,
+            "column_type": column_question.type.name,
+            "fetch_ms": fetch_ms,
+        },
+    }
+
+
+def print_results(survey_id: str, row_name: str, column_name: str, results: Dict[str, Dict]) -> None:
+    meta = results["_meta"]
+    print(
+        f"Survey {survey_id}: {row_name} ({meta['row_type']}) x {column_name} ({meta['column_type']}), "
+        f"{meta['answer_rows']:,} answer rows, {meta['respondents']:,} respondents in the base, "
+        f"fetch {meta['fetch_ms']:.0f} ms"
+    )
+    baseline = results["loop"]["ms_median"]
+    print(f"{'engine':<12}{'median ms':>11}{'min ms':>10}{'speedup':>9}")
+    for name in ("loop", "vectorized"):
+        result = results[name]
+        print(
+            f"{name:<12}{result['ms_median']:>11.1f}{result['ms_min']:>10.1f}"
+            f"{baseline / result['ms_median']:>8.1f}x"
+        )
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Time the vectorized crosstab engine against a Python loop.")
+    parser.add_argument("--survey", required=True, help="survey id, e.g. QS0001")
+    parser.add_argument("--rows", required=True, help="question name of the table rows, e.g. Q1")
+    parser.add_argument("--columns", required=True, help="question name of the table columns, e.g. Q4")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per engine (default: 5)")
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = run(args.survey, args.rows, args.columns, args.repeat)
+    print_results(args.survey, args.rows, args.columns, results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"survey": args.survey, "rows": args.rows, "columns": args.columns,
+                       "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark of the streaming file export: throughput and peak memory per format.
+
+Run from the backend directory against a loaded database:
+
+    python -m benchmarks.export --survey QS0001 [--format csv --format parquet] [--chunk-size 50000]
+        [--questions Q1,Q2] [--output results.json]
+
+Each format is exported in a fresh process into a temporary file, as
+``ResponseService.iter_export`` does, so the reported peak resident memory
+belongs to that export alone.
+"""
+import argparse
+import json
+import multiprocessing
+import tempfile
+import time
+from typing import Dict, List, Optional
+from src.models import SessionLocal, Survey
+from src.schemas import ExportFormat, GetResponsesRequest
+from src.loading.summary import peak_memory_mb
+from src.services.exporters import create_exporter, export_columns
+from src.services.response_service import ResponseService
+from src.settings import settings
+
+
+def export_once(
+    survey_id: str,
+    export_format: ExportFormat,
+    question_names: Optional[List[str]],
+    chunk_size: int
+) -> Dict[str, float]:
+    """Export the survey into a temporary file; meant to run in its own process."""
+    db = SessionLocal()
+    try:
+        if question_names is None:
+            survey = db.get(Survey, survey_id)
+            if survey is None:
+                raise SystemExit(f"Survey not found: {survey_id}")
+            question_names = [q.name for q in sorted(survey.questions, key=lambda q: q.id)]
+        response_service = ResponseService(db)
+        questions = response_service.resolve_questions(
+            GetResponsesRequest(survey_id=survey_id, question_ids=question_names)
+        )
+        baseline_mb = peak_memory_mb()
+
+        started = time.perf_counter()
+        size = 0
+        exporter = create_exporter(export_format, export_columns(questions, question_names))
+        with tempfile.TemporaryFile() as file:
+            for matrix in response_service.iter_response_matrices(questions, chunk_size):
+                size += file.write(exporter.write(matrix))
+            for data in exporter.finish():
+                size += file.write(data)
+        seconds = time.perf_counter() - started
+    finally:
+        db.close()
+    return {
+        "rows": exporter.rows,
+        "seconds": seconds,
+        "rows_per_second": exporter.rows / max(seconds, 1e-9),
+        "file_mb": size / 1024 / 1024,
+        "baseline_rss_mb": baseline_mb,
+        "peak_rss_mb": peak_memory_mb(),
+    }
+
+
+def run(
+    survey_id: str,
+    formats: List[ExportFormat],
+    question_names: Optional[List[str]],
+    chunk_size: int
+) -> Dict[str, Dict[str, float]]:
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for export_format in formats:
+        with context.Pool(1) as pool:
+            results[export_format.value] = pool.apply(
+                export_once, (survey_id, export_format, question_names, chunk_size)
+            )
+    return results
+
+
+def print_results(survey_id: str, chunk_size: int, results: Dict[str, Dict[str, float]]) -> None:
+    print(f"Survey {survey_id}, {chunk_size:,} response rows per chunk")
+    print(f"{'format':<9}{'rows':>10}{'seconds':>9}{'rows/s':>10}{'file MiB':>10}{'base RSS':>10}{'peak RSS':>10}")
+    for name, result in results.items():
+        print(
+            f"{name:<9}{result['rows']:>10,}{result['seconds']:>9.2f}{result['rows_per_second']:>10,.0f}"
+            f"{result['file_mb']:>10.1f}{result['baseline_rss_mb']:>10.0f}{result['peak_rss_mb']:>10.0f}"
+        )
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Time streaming exports of a survey per file format.")
+    parser.add_argument("--survey", required=True, help="survey id, e.g. QS0001")
+    parser.add_argument(
+        "--format",
+        type=ExportFormat,
+        choices=list(ExportFormat),
+        action="append",
+        default=[],
+        help="format to export (repeatable; default: all)",
+    )
+    parser.add_argument("--questions", help="comma-separated question names (default: all)")
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=settings.EXPORT_CHUNK_SIZE,
+        help="response rows read from the cursor at a time (default: EXPORT_CHUNK_SIZE)",
+    )
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    formats = args.format or list(ExportFormat)
+    question_names = [name.strip() for name in args.questions.split(",") if name.strip()] if args.questions else None
+    results = run(args.survey, formats, question_names, args.chunk_size)
+    print_results(args.survey, args.chunk_size, results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"survey": args.survey, "chunk_size": args.chunk_size, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
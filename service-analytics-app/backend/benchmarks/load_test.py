@@ -0,0 +1,140 @@
+"""
+Load test of the API under many concurrent dashboard clients.
+
+Start the server, then run from the backend directory:
+
+    python -m benchmarks.load_test --url http://localhost:8000 --survey QS0001 \\
+        [--clients 200] [--duration 30] [--page-size 200] [--output results.json]
+
+Every client loops over what a dashboard does: list surveys, load the
+questions of a survey, fetch a page of all responses, fetch a page of
+responses for a few questions and look up answer options. Requests per
+second and latency percentiles are reported per endpoint.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from collections import defaultdict
+from typing import Dict, List
+import httpx
+
+
+def percentile(values: List[float], share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+async def client_loop(
+    client: httpx.AsyncClient,
+    survey_id: str,
+    question_names: List[str],
+    page_size: int,
+    deadline: float,
+    latencies: Dict[str, List[float]],
+    errors: Dict[str, int]
+) -> None:
+    """Repeat the dashboard scenario until the deadline."""
+    subset = question_names[:3]
+    requests = [
+        ("GET /surveys", "GET", "/api/surveys/", None),
+        ("GET /questions", "GET", f"/api/surveys/{survey_id}/questions", None),
+        ("GET /all-responses page", "GET", f"/api/surveys/{survey_id}/all-responses?limit={page_size}", None),
+        ("POST /responses page", "POST", f"/api/surveys/responses",
+         {"survey_id": survey_id, "question_ids": subset, "limit": page_size}),
+        ("GET /answer-options", "GET", f"/api/answer-options/questions/{','.join(subset)}", None),
+    ]
+    while time.perf_counter() < deadline:
+        for name, method, path, body in requests:
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+                await response.aread()
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies[name].append(time.perf_counter() - started)
+            else:
+                errors[name] += 1
+
+
+async def run(url: str, survey_id: str, clients: int, duration: float, page_size: int) -> Dict[str, Dict]:
+    """Run ``clients`` concurrent scenario loops for ``duration`` seconds."""
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=120) as client:
+        response = await client.get(f"/api/surveys/{survey_id}/questions")
+        response.raise_for_status()
+        question_names = [q["name"] for q in response.json()]
+        if not question_names:
+            raise SystemExit(f"Survey {survey_id} has no questions")
+
+        latencies: Dict[str, List[float]] = defaultdict(list)
+        errors: Dict[str, int] = defaultdict(int)
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(
+            client_loop(client, survey_id, question_names, page_size, deadline, latencies, errors)
+            for _ in range(clients)
+        ))
+        elapsed = time.perf_counter() - started
+
+    results = {}
+    for name in sorted(set(latencies) | set(errors)):
+        values = latencies.get(name, [])
+        results[name] = {
+            "requests": len(values),
+            "errors": errors.get(name, 0),
+            "rps": len(values) / elapsed,
+            "p50_ms": statistics.median(values) * 1000 if values else None,
+            "p95_ms": percentile(values, 0.95) * 1000 if values else None,
+            "p99_ms": percentile(values, 0.99) * 1000 if values else None,
+        }
+    total = sum(len(values) for values in latencies.values())
+    results["_total"] = {
+        "requests": total,
+        "errors": sum(errors.values()),
+        "rps": total / elapsed,
+        "clients": clients,
+        "seconds": elapsed,
+    }
+    return results
+
+
+def print_results(results: Dict[str, Dict]) -> None:
+    total = results["_total"]
+    print(
+        f"{total['clients']} clients, {total['seconds']:.1f}s: {total['requests']} requests, "
+        f"{total['errors']} errors, {total['rps']:.1f} req/s"
+    )
+    print(f"{'endpoint':<26}{'requests':>10}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for name, result in results.items():
+        if name == "_total":
+            continue
+        timings = [result[key] for key in ("p50_ms", "p95_ms", "p99_ms")]
+        print(
+            f"{name:<26}{result['requests']:>10}{result['errors']:>8}{result['rps']:>9.1f}"
+            + "".join(f"{value:>9.0f}" if value is not None else f"{'-':>9}" for value in timings)
+        )
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Measure API throughput under concurrent clients.")
+    parser.add_argument("--url", default="http://localhost:8000", help="base URL of a running server")
+    parser.add_argument("--survey", required=True, help="survey id, e.g. QS0001")
+    parser.add_argument("--clients", type=int, default=200, help="concurrent clients (default: 200)")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to run (default: 30)")
+    parser.add_argument("--page-size", type=int, default=200, help="respondents per page (default: 200)")
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args.url, args.survey, args.clients, args.duration, args.page_size))
+    print_results(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"url": args.url, "survey": args.survey, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Benchmark of the logging cost a responses request pays on the request thread.
+
+Run from the backend directory:
+
+    python -m benchmarks.logging_overhead [--requests 20000] [--questions 40] [--output results.json]
+
+Loggers are at INFO level and write JSON to ``os.devnull``. Timed per request:
+
+- ``request_fstring`` / ``request_lazy``: the DEBUG calls of ``POST /responses``
+  (router and service messages, the sample-response dump) with f-string and
+  with lazy messages;
+- ``info_sync`` / ``info_queued``: one INFO record formatted and written on the
+  caller, and put on the background queue; the queue is drained after the timed
+  runs (``drain_seconds``), so on few CPUs the listener does not compete with them;
+- ``disabled``: the lazy calls on a disabled logger (the floor).
+"""
+import argparse
+import json
+import logging
+import os
+import queue
+import statistics
+import time
+from logging.handlers import QueueListener
+from typing import Callable, Dict, List
+from src.logger import BackgroundQueueHandler, JsonFormatter
+
+
+def fstring_request(logger: logging.Logger, survey_id: str, question_ids: List[str], answers: List[Dict]) -> None:
+    logger.debug(f"=== Request for survey {survey_id}, questions: {question_ids} ===")
+    logger.debug(f"DEBUG: Found {len(question_ids)} questions by name")
+    logger.debug(f"DEBUG: Found {len(answers)} text responses and {len(answers)} choice responses")
+    logger.debug(f"\n=== DEBUG: SAMPLE RESPONSE DATA ===")
+    for answer in answers:
+        logger.debug(f"  - {answer['name']} ({answer['type']}): {answer['value']} (type: {type(answer['value'])})")
+
+
+def lazy_request(logger: logging.Logger, survey_id: str, question_ids: List[str], answers: List[Dict]) -> None:
+    logger.debug("=== Request for survey %s, questions: %s ===", survey_id, question_ids)
+    logger.debug("DEBUG: Found %d questions by name", len(question_ids))
+    logger.debug("DEBUG: Found %d text responses and %d choice responses", len(answers), len(answers))
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("\n=== DEBUG: SAMPLE RESPONSE DATA ===")
+        for answer in answers:
+            logger.debug("  - %s (%s): %s (type: %s)", answer["name"], answer["type"], answer["value"],
+                         type(answer["value"]))
+
+
+def info_record(logger: logging.Logger, survey_id: str, question_ids: List[str], answers: List[Dict]) -> None:
+    logger.info("Answered survey %s: %d questions", survey_id, len(answers))
+
+
+def time_requests(request: Callable[[], None], requests: int, repeat: int) -> Dict[str, float]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(requests):
+            request()
+        timings.append((time.perf_counter() - started) / requests)
+    return {"us_per_request": statistics.median(timings) * 1e6, "us_min": min(timings) * 1e6}
+
+
+def run(requests: int, question_count: int, repeat: int) -> Dict[str, Dict[str, float]]:
+    question_ids = [f"Q{i}" for i in range(1, question_count + 1)]
+    answers = [{"name": name, "type": "SINGLE", "value": i % 5 + 1} for i, name in enumerate(question_ids)]
+    devnull = open(os.devnull, "w")
+    results = {}
+    setups = {
+        "request_fstring": (fstring_request, False, False),
+        "request_lazy": (lazy_request, False, False),
+        "info_sync": (info_record, False, False),
+        "info_queued": (info_record, True, False),
+        "disabled": (lazy_request, False, True),
+    }
+    for name, (request_logs, queued, disabled) in setups.items():
+        logger = logging.getLogger(f"benchmarks.logging_overhead.{name}")
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        logger.disabled = disabled
+        stream_handler = logging.StreamHandler(devnull)
+        stream_handler.setFormatter(JsonFormatter())
+        handler = BackgroundQueueHandler(queue.Queue(), stream_handler) if queued else stream_handler
+        logger.addHandler(handler)
+
+        results[name] = time_requests(
+            lambda: request_logs(logger, "QS0001", question_ids, answers), requests, repeat
+        )
+        if queued:
+            started = time.perf_counter()
+            listener = QueueListener(handler.queue, stream_handler)
+            listener.start()
+            listener.stop()
+            results[name]["drain_seconds"] = time.perf_counter() - started
+        logger.removeHandler(handler)
+    devnull.close()
+    return results
+
+
+def print_results(results: Dict[str, Dict[str, float]]) -> None:
+    floor = results["disabled"]["us_per_request"]
+    print(f"{'setup':<17}{'us/request':>12}{'us min':>9}{'over floor':>12}")
+    for name, result in results.items():
+        print(
+            f"{name:<17}{result['us_per_request']:>12.2f}{result['us_min']:>9.2f}"
+            f"{result['us_per_request'] - floor:>12.2f}"
+        )
+    if "drain_seconds" in results["info_queued"]:
+        print(f"background queue drained in {results['info_queued']['drain_seconds']:.2f}s")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Time the logging cost of a request on the caller thread.")
+    parser.add_argument("--requests", type=int, default=20_000, help="simulated requests per run (default: 20000)")
+    parser.add_argument("--questions", type=int, default=40, help="questions per request (default: 40)")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per setup (default: 5)")
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = run(args.requests, args.questions, args.repeat)
+    print_results(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"requests": args.requests, "questions": args.questions, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
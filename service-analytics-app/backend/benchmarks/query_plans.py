@@ -0,0 +1,161 @@
+"""
+Query plans and timings of the response reads before and after the unique response indexes.
+
+Run from the backend directory with a loaded SQLite database file:
+
+    python -m benchmarks.query_plans --database /tmp/synthetic/bench.db --survey QS9001
+        [--questions 2] [--repeat 5] [--output results.json]
+
+The database is copied into a temporary directory and the copy is migrated
+down to revision 0001 ("before": responses indexed on ``survey_id,
+respondent_id``) and back up to head ("after": unique indexes on the response
+keys). In both states every query gets its ``EXPLAIN QUERY PLAN`` and its
+median time to fetch all rows. The queries are the statements of the response
+services for the first ``--questions`` text and choice questions of the
+survey, and the response-key lookups the loader's conflict checks make.
+"""
+import argparse
+import json
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+from alembic import command
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+from src.logger import stop_logging
+from src.models import ChoiceResponse, Question, QuestionType, TextResponse, upgrade_database
+from src.models.migrations import alembic_config
+from src.services.response_service import ResponseQueries
+
+PAGE_SIZE = 100
+STATES = {"before": "0001", "after": "head"}
+
+
+def response_statements(questions: List[Question], sample: Dict[str, str]) -> Dict[str, object]:
+    """The statements compared: response reads of the questions and the loader's key lookups."""
+    queries = ResponseQueries()
+    return {
+        "text_rows": queries._text_rows_statement(questions),
+        "choice_rows": queries._choice_rows_statement(questions),
+        "ordered_rows": queries._ordered_rows_statement(questions),
+        "respondent_page": queries._respondent_page_statement(questions, None, PAGE_SIZE),
+        "loader_text_exists": select(TextResponse.id).where(
+            TextResponse.respondent_id == sample["respondent_id"],
+            TextResponse.question_id == sample["text_question_id"],
+            TextResponse.survey_id == sample["survey_id"],
+        ).limit(1),
+        "loader_choice_exists": select(ChoiceResponse.id).where(
+            ChoiceResponse.respondent_id == sample["respondent_id"],
+            ChoiceResponse.question_id == sample["choice_question_id"],
+            ChoiceResponse.survey_id == sample["survey_id"],
+            ChoiceResponse.answer_option_id == sample["answer_option_id"],
+        ).limit(1),
+    }
+
+
+def measure(db: Session, statements: Dict[str, object], repeat: int) -> Dict[str, Dict]:
+    results = {}
+    connection = db.connection()
+    for name, statement in statements.items():
+        sql = str(statement.compile(connection, compile_kwargs={"literal_binds": True}))
+        plan = [row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+        timings = []
+        rows = 0
+        for _ in range(repeat):
+            started = time.perf_counter()
+            rows = len(connection.exec_driver_sql(sql).all())
+            timings.append(time.perf_counter() - started)
+        results[name] = {
+            "plan": plan,
+            "rows": rows,
+            "ms_median": statistics.median(timings) * 1000,
+            "ms_min": min(timings) * 1000,
+        }
+    return results
+
+
+def run(database: Path, survey_id: str, question_count: int, repeat: int) -> Dict[str, Dict[str, Dict]]:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        copy = Path(tmp) / database.name
+        shutil.copyfile(database, copy)
+        engine = create_engine(f"sqlite:///{copy}")
+        try:
+            upgrade_database(engine)
+            with Session(engine) as db:
+                survey_questions = db.scalars(
+                    select(Question).where(Question.survey_id == survey_id).order_by(Question.id)
+                ).all()
+                text_questions = [q for q in survey_questions if q.type == QuestionType.TEXT]
+                choice_questions = [q for q in survey_questions if q.type != QuestionType.TEXT]
+                questions = text_questions[:question_count] + choice_questions[:question_count]
+                if not questions:
+                    raise SystemExit(f"Survey {survey_id} has no questions")
+                text = db.execute(select(TextResponse).where(TextResponse.survey_id == survey_id).limit(1)).scalar()
+                choice = db.execute(
+                    select(ChoiceResponse).where(ChoiceResponse.survey_id == survey_id).limit(1)
+                ).scalar()
+                if text is None or choice is None:
+                    raise SystemExit(f"Survey {survey_id} needs text and choice responses")
+                sample = {
+                    "survey_id": survey_id,
+                    "respondent_id": choice.respondent_id,
+                    "text_question_id": text.question_id,
+                    "choice_question_id": choice.question_id,
+                    "answer_option_id": choice.answer_option_id,
+                }
+                statements = response_statements(questions, sample)
+
+            for state, revision in STATES.items():
+                if revision == "head":
+                    upgrade_database(engine)
+                else:
+                    with engine.begin() as connection:
+                        command.downgrade(alembic_config(connection), revision)
+                with Session(engine) as db:
+                    results[state] = measure(db, statements, repeat)
+        finally:
+            engine.dispose()
+    return results
+
+
+def print_results(results: Dict[str, Dict[str, Dict]]) -> None:
+    before, after = results["before"], results["after"]
+    print(f"{'query':<22}{'rows':>9}{'before ms':>11}{'after ms':>10}{'speedup':>9}")
+    for name in before:
+        speedup = before[name]["ms_median"] / max(after[name]["ms_median"], 1e-9)
+        print(
+            f"{name:<22}{after[name]['rows']:>9,}{before[name]['ms_median']:>11.2f}"
+            f"{after[name]['ms_median']:>10.2f}{speedup:>8.1f}x"
+        )
+    for name in before:
+        print(f"\n{name}")
+        for state in ("before", "after"):
+            for line in results[state][name]["plan"]:
+                print(f"  {state:<7}{line}")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Compare query plans before and after the unique response indexes.")
+    parser.add_argument("--database", type=Path, required=True, help="loaded SQLite database file (it is copied)")
+    parser.add_argument("--survey", required=True, help="survey id, e.g. QS9001")
+    parser.add_argument(
+        "--questions", type=int, default=2, help="text and choice questions read, each, first by id (default: 2)"
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="runs per query (default: 5)")
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = run(args.database, args.survey, args.questions, args.repeat)
+    print_results(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"survey": args.survey, "questions": args.questions, "results": results}, f, indent=2)
+    stop_logging()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark of the response wire formats: payload size and encode time.
+
+Run from the backend directory against a loaded database:
+
+    python -m benchmarks.response_formats --survey QS0001 [--repeat 5] [--output results.json]
+
+The respondent × question matrix is assembled once; only encoding is timed.
+"rows (models)" is the Pydantic path of ``ResponseService.get_responses_for_questions``
+(models rendered as FastAPI would); the other formats are encoded straight
+from the matrix, as the API does.
+"""
+import argparse
+import gzip
+import json
+import statistics
+import time
+from typing import Callable, Dict, List
+from fastapi.responses import JSONResponse
+from src.models import SessionLocal, Question
+from src.schemas import GetResponsesRequest, GetResponsesResponse, ResponseFormat
+from src.services.response_encoders import encode_response_page
+from src.services.response_service import ResponseService
+
+
+def time_encoder(encode: Callable[[], bytes], repeat: int) -> Dict[str, float]:
+    """Encode ``repeat`` times and report the payload size and timings."""
+    timings: List[float] = []
+    payload = b""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        payload = encode()
+        timings.append(time.perf_counter() - started)
+    return {
+        "bytes": len(payload),
+        "gzip_bytes": len(gzip.compress(payload, compresslevel=6)),
+        "encode_ms_median": statistics.median(timings) * 1000,
+        "encode_ms_min": min(timings) * 1000,
+    }
+
+
+def run(survey_id: str, repeat: int) -> Dict[str, Dict[str, float]]:
+    """Assemble the survey matrix once and time every encoder on it."""
+    db = SessionLocal()
+    try:
+        question_names = [
+            name for (name,) in db.query(Question.name).filter(Question.survey_id == survey_id).all()
+        ]
+        if not question_names:
+            raise SystemExit(f"Survey {survey_id} has no questions")
+
+        service = ResponseService(db)
+        request = GetResponsesRequest(survey_id=survey_id, question_ids=question_names)
+        page = service.get_response_page(request)
+    finally:
+        db.close()
+
+    def encode_models() -> bytes:
+        response = GetResponsesResponse(
+            respondents=service._build_respondents_list(page.matrix, question_names),
+            next_cursor=page.next_cursor,
+        )
+        # What FastAPI does with a response_model: dump, validate and serialize again.
+        content = GetResponsesResponse.model_validate(response.model_dump()).model_dump(mode="json")
+        return JSONResponse(content).body
+
+    encoders = {"rows (models)": encode_models}
+    for response_format in ResponseFormat:
+        encoders[response_format.value] = (
+            lambda fmt=response_format: encode_response_page(page.matrix, question_names, page.next_cursor, fmt)
+        )
+
+    results = {name: time_encoder(encode, repeat) for name, encode in encoders.items()}
+    results["_meta"] = {"respondents": len(page.matrix), "questions": len(question_names)}
+    return results
+
+
+def print_results(survey_id: str, results: Dict[str, Dict[str, float]]) -> None:
+    meta = results["_meta"]
+    baseline = results["rows (models)"]
+    print(f"Survey {survey_id}: {meta['respondents']} respondents x {meta['questions']} questions")
+    print(f"{'format':<16}{'bytes':>14}{'gzip':>12}{'size %':>9}{'encode ms':>12}{'speedup':>9}")
+    for name, result in results.items():
+        if name == "_meta":
+            continue
+        print(
+            f"{name:<16}{result['bytes']:>14,}{result['gzip_bytes']:>12,}"
+            f"{100 * result['bytes'] / baseline['bytes']:>8.1f}%"
+            f"{result['encode_ms_median']:>12.1f}"
+            f"{baseline['encode_ms_median'] / result['encode_ms_median']:>8.1f}x"
+        )
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Compare payload size and encode time of response formats.")
+    parser.add_argument("--survey", required=True, help="survey id, e.g. QS0001")
+    parser.add_argument("--repeat", type=int, default=5, help="encodes per format (default: 5)")
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = run(args.survey, args.repeat)
+    print_results(args.survey, results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"survey": args.survey, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Benchmark suite over a synthetic dataset, recorded as JSON for regression tracking.
+
+Generate the data, then run from the backend directory against an empty
+SQLite database:
+
+    python -m benchmarks.synthetic_data --output /tmp/synthetic --scale 10k
+    DATABASE_URL=sqlite:////tmp/synthetic/bench.db python -m benchmarks.suite --data /tmp/synthetic
+        [--repeat 5] [--output results.json] [--baseline previous.json] [--threshold 1.25]
+
+Cases:
+
+- ``load``: ``load_all_data`` of the surveys and responses (bulk mode, with
+  materialization), once;
+- ``service.*``: ``ResponseService.get_responses_for_questions`` for every
+  question, a few questions and a first page;
+- ``all_responses.*``: ``GET /api/surveys/{id}/all-responses`` through the app
+  in every response format, with the serialization stage and payload size;
+- ``answer_options.*``: the answer options of one and of every question.
+
+Each case reports milliseconds (median and minimum of ``--repeat`` runs; the
+result cache is off, so every run does the work). With ``--baseline``, cases
+slower than ``--threshold`` times the baseline median are listed and the exit
+status is 1. ``--skip-load`` reuses an already loaded database.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+from src.logger import stop_logging
+from src.models import SessionLocal, engine, upgrade_database, Survey
+from src.load_data import load_all_data
+from src.loading.summary import peak_memory_mb
+from src.main import app
+from src.schemas import GetResponsesRequest, ResponseFormat
+from src.services.response_service import ResponseService
+from src.settings import settings
+
+FEW_QUESTIONS = 3
+PAGE_SIZE = 1000
+DATASET_KEYS = ("surveys", "respondents", "questions", "options", "answer_rate", "seed", "rows")
+
+
+def time_call(call: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """Run ``call`` ``repeat`` times; report the timings and what the last run returned, if a dict."""
+    timings: List[float] = []
+    extra: object = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        extra = call()
+        timings.append(time.perf_counter() - started)
+    result = {"ms_median": statistics.median(timings) * 1000, "ms_min": min(timings) * 1000}
+    if isinstance(extra, dict):
+        result.update(extra)
+    return result
+
+
+def run_load(data_dir: Path, manifest: Dict) -> Dict[str, float]:
+    upgrade_database(engine)
+    db = SessionLocal()
+    try:
+        if db.scalar(select(func.count()).select_from(Survey)):
+            raise SystemExit("The database is not empty: point DATABASE_URL at a new file or pass --skip-load")
+        started = time.perf_counter()
+        load_all_data(data_dir / "input" / "xml", data_dir / manifest["responses_file"], db, bulk=True)
+        seconds = time.perf_counter() - started
+    finally:
+        db.close()
+    return {
+        "ms_median": seconds * 1000,
+        "ms_min": seconds * 1000,
+        "rows": manifest["rows"],
+        "rows_per_second": manifest["rows"] / seconds,
+        "peak_rss_mb": peak_memory_mb(),
+    }
+
+
+def run_service(survey_id: str, question_names: List[str], repeat: int) -> Dict[str, Dict[str, float]]:
+    requests = {
+        "all_questions": GetResponsesRequest(survey_id=survey_id, question_ids=question_names),
+        "few_questions": GetResponsesRequest(survey_id=survey_id, question_ids=question_names[:FEW_QUESTIONS]),
+        "first_page": GetResponsesRequest(survey_id=survey_id, question_ids=question_names, limit=PAGE_SIZE),
+    }
+    results = {}
+    db = SessionLocal()
+    try:
+        service = ResponseService(db)
+        for name, request in requests.items():
+            results[name] = time_call(
+                lambda: {"respondents": len(service.get_responses_for_questions(request).respondents)}, repeat
+            )
+    finally:
+        db.close()
+    return results
+
+
+def server_timing_ms(header: str, name: str) -> float:
+    """Duration of one entry of a ``Server-Timing`` header, 0 if absent."""
+    for entry in header.split(","):
+        parts = entry.strip().split(";")
+        if parts[0] == name:
+            for part in parts[1:]:
+                if part.startswith("dur="):
+                    return float(part[4:])
+    return 0.0
+
+
+def run_api(client: TestClient, survey_id: str, questions: List[Dict], repeat: int) -> Dict[str, Dict[str, float]]:
+    results = {}
+
+    for response_format in ResponseFormat:
+        def get_all_responses() -> Dict[str, float]:
+            response = client.get(f"/api/surveys/{survey_id}/all-responses", params={"format": response_format.value})
+            response.raise_for_status()
+            return {
+                "bytes": len(response.content),
+                "encode_ms": server_timing_ms(response.headers.get("server-timing", ""), "encode"),
+            }
+        results[f"all_responses.{response_format.value}"] = time_call(get_all_responses, repeat)
+
+    def get(url: str) -> None:
+        client.get(url).raise_for_status()
+
+    choice_question = next((q for q in questions if q["type"] != "TEXT"), questions[0])
+    results["answer_options.one_question"] = time_call(
+        lambda: get(f"/api/answer-options/question/{choice_question['id']}"), repeat
+    )
+    names = ",".join(q["name"] for q in questions)
+    results["answer_options.all_questions"] = time_call(lambda: get(f"/api/answer-options/questions/{names}"), repeat)
+    return results
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(data_dir: Path, repeat: int, skip_load: bool) -> Dict:
+    with open(data_dir / "synthetic.json", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if engine.dialect.name != "sqlite":
+        raise SystemExit("The suite runs against SQLite: set DATABASE_URL=sqlite:///<file>")
+    settings.RESULT_CACHE_ENABLED = False
+
+    results: Dict[str, Dict[str, float]] = {}
+    if not skip_load:
+        results["load"] = run_load(data_dir, manifest)
+
+    with TestClient(app) as client:
+        for survey_id in manifest["surveys"]:
+            questions = client.get(f"/api/surveys/{survey_id}/questions").json()
+            if not questions:
+                raise SystemExit(f"Survey {survey_id} is not loaded")
+            question_names = [q["name"] for q in questions]
+            for name, result in run_service(survey_id, question_names, repeat).items():
+                results[f"service.{name}.{survey_id}"] = result
+            for name, result in run_api(client, survey_id, questions, repeat).items():
+                results[f"{name}.{survey_id}"] = result
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "database": engine.dialect.name,
+            "materialized": settings.MATERIALIZED_RESPONSES_ENABLED,
+            "repeat": repeat,
+            "data": manifest,
+        },
+        "results": results,
+    }
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], threshold: float) -> List[str]:
+    """Names of the cases whose median is more than ``threshold`` times the baseline one."""
+    return [
+        name for name, result in results.items()
+        if name in baseline and result["ms_median"] > baseline[name]["ms_median"] * threshold
+    ]
+
+
+def print_results(results: Dict[str, Dict[str, float]], baseline: Optional[Dict[str, Dict[str, float]]]) -> None:
+    print(f"{'case':<42}{'ms median':>11}{'ms min':>10}{'vs base':>9}  details")
+    for name, result in results.items():
+        ratio = ""
+        if baseline and name in baseline:
+            ratio = f"{result['ms_median'] / max(baseline[name]['ms_median'], 1e-9):.2f}x"
+        details = ", ".join(
+            f"{key}={value:,.0f}" for key, value in result.items() if key not in ("ms_median", "ms_min")
+        )
+        print(f"{name:<42}{result['ms_median']:>11.1f}{result['ms_min']:>10.1f}{ratio:>9}  {details}")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Run the benchmark suite over a synthetic dataset.")
+    parser.add_argument("--data", type=Path, required=True, help="directory written by benchmarks.synthetic_data")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per case (default: 5)")
+    parser.add_argument("--skip-load", action="store_true", help="reuse the data already in the database")
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.25,
+        help="slowdown over the baseline median reported as a regression (default: 1.25)",
+    )
+    args = parser.parse_args(argv)
+
+    report = run(args.data, args.repeat, args.skip_load)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline_report = json.load(f)
+        baseline = baseline_report["results"]
+        data, baseline_data = report["meta"]["data"], baseline_report["meta"]["data"]
+        if any(data.get(key) != baseline_data.get(key) for key in DATASET_KEYS):
+            print("Warning: the baseline was recorded on a different dataset")
+    print_results(report["results"], baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    regressions = compare(report["results"], baseline, args.threshold) if baseline else []
+    if regressions:
+        print(f"Slower than {args.threshold}x the baseline: {', '.join(regressions)}")
+    stop_logging()
+    sys.stdout.flush()
+    # The aiosqlite worker thread of the app's async engine can keep the interpreter alive.
+    os._exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
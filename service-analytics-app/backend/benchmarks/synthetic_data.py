@@ -0,0 +1,321 @@
+"""
+Synthetic survey data for the benchmarks, in the layout the loader reads.
+
+Run from the backend directory:
+
+    python -m benchmarks.synthetic_data --output /tmp/synthetic [--scale 10k|100k|1m | --respondents N]
+        [--surveys 1] [--questions 30] [--mix 2,5,3] [--options 6] [--answer-rate 0.85] [--seed 1]
+
+Writes ``<output>/input/xml/QS9001.xml``, ... with the structure of the real
+survey exports and the responses in the long format of ``responses.xlsx``
+(survey, respondent, question, type, text, response, order), respondent by
+respondent. ``--mix`` weighs the TEXT, SINGLE and MULTIPLE questions. Choice
+distributions are skewed per question, so crosstabs and pair tests are not
+flat.
+
+A worksheet holds at most 1,048,576 rows and the loader reads only the first
+one, so when the responses do not fit (about 20k respondents of 30 questions)
+they are written as ``responses.arrow`` instead: an Arrow IPC file of string
+columns, the layout of the loader's columnar cache, which
+``python -m src.load_data --responses`` reads directly.
+``<output>/synthetic.json`` records the parameters and row counts.
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from openpyxl import Workbook
+
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+EXCEL_MAX_ROWS = 1_048_576 - 1  # minus the header row
+RESPONSE_COLUMNS = ["survey", "respondent", "question", "type", "text", "response", "order"]
+TEXT, SINGLE, MULTIPLE = 1, 2, 3
+WORDS = (
+    "доставка курьер быстро долго заказ оператор поддержка приложение оплата возврат цена качество "
+    "упаковка вежливый сервис удобно неудобно магазин товар скидка ожидание звонок сайт ошибка "
+    "рекомендую спасибо плохо хорошо отлично проблема"
+).split()
+
+
+@dataclass
+class SyntheticQuestion:
+    id: str
+    name: str
+    type: int
+    option_ids: List[str] = field(default_factory=list)
+    # SINGLE: probability of each option; MULTIPLE: probability that each option is picked
+    weights: Optional[np.ndarray] = None
+
+    def expected_rows(self, answer_rate: float) -> float:
+        if self.type == MULTIPLE:
+            return answer_rate * float(self.weights.sum())
+        return answer_rate
+
+
+@dataclass
+class SyntheticSurvey:
+    id: str
+    questions: List[SyntheticQuestion]
+
+
+def build_surveys(surveys: int, questions: int, mix: List[float], options: int, seed: int) -> List[SyntheticSurvey]:
+    """Questions of every survey, with their types, options and answer distributions."""
+    rng = random.Random(seed)
+    np_rng = np.random.default_rng(seed)
+    weights = np.array(mix, dtype=float) / sum(mix)
+    counts = np.floor(weights * questions).astype(int)
+    counts[np.argmax(weights)] += questions - counts.sum()
+
+    result = []
+    for survey_index in range(surveys):
+        types = [TEXT] * counts[0] + [SINGLE] * counts[1] + [MULTIPLE] * counts[2]
+        rng.shuffle(types)
+        survey_questions = []
+        for number, question_type in enumerate(types, 1):
+            question = SyntheticQuestion(
+                id=str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+                name=f"Q{number}",
+                type=question_type,
+            )
+            if question_type != TEXT:
+                option_count = rng.randint(2, max(options, 2))
+                question.option_ids = [
+                    str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(option_count)
+                ]
+                if question_type == SINGLE:
+                    question.weights = np_rng.dirichlet(np.full(option_count, 2.0))
+                else:
+                    question.weights = np_rng.uniform(0.1, 0.6, option_count)
+            survey_questions.append(question)
+        result.append(SyntheticSurvey(id=f"QS{9001 + survey_index:04d}", questions=survey_questions))
+    return result
+
+
+def write_survey_xml(survey: SyntheticSurvey, path: Path) -> None:
+    """Write the survey in the structure of the real XML exports."""
+    root = ET.Element("xml")
+    questions = ET.SubElement(ET.SubElement(root, "metadata"), "questions")
+    variables = ET.SubElement(root, "variables")
+    for question in survey.questions:
+        element = ET.SubElement(questions, "question", id=question.id, type=str(question.type))
+        ET.SubElement(element, "name").text = question.name
+        ET.SubElement(element, "text").text = f"Текст вопроса {question.name}."
+        if question.option_ids:
+            categories = ET.SubElement(variables, "categories", id=question.id)
+            for code, option_id in enumerate(question.option_ids, 1):
+                category = ET.SubElement(categories, "category", id=option_id, code=str(code))
+                category.text = f"Вариант {code} ({question.name})"
+    ET.ElementTree(root).write(path, encoding="utf-8", xml_declaration=True)
+
+
+def text_pool(rng: np.random.Generator, size: int = 2_000) -> np.ndarray:
+    """Free-text answers of 2 to 9 words, drawn from a small vocabulary."""
+    return np.array(
+        [" ".join(rng.choice(WORDS, rng.integers(2, 10))) for _ in range(size)], dtype=object
+    )
+
+
+def iter_response_frames(
+    survey: SyntheticSurvey,
+    respondents: int,
+    answer_rate: float,
+    rng: np.random.Generator,
+    texts: np.ndarray,
+    chunk_size: int = 50_000
+) -> Iterator[pd.DataFrame]:
+    """Yield the response rows of the survey, ``chunk_size`` respondents at a time."""
+    for start in range(0, respondents, chunk_size):
+        count = min(chunk_size, respondents - start)
+        respondent_index = np.arange(start, start + count)
+        parts = []
+        for question in survey.questions:
+            answered = rng.random(count) < answer_rate
+            if question.type == TEXT:
+                rows = respondent_index[answered]
+                parts.append((rows, question, texts[rng.integers(0, len(texts), len(rows))], None, None))
+            elif question.type == SINGLE:
+                rows = respondent_index[answered]
+                picks = rng.choice(len(question.option_ids), size=len(rows), p=question.weights)
+                parts.append((rows, question, None, picks, np.ones(len(rows), dtype=int)))
+            else:
+                picked = answered[:, None] & (rng.random((count, len(question.option_ids))) < question.weights)
+                order = np.cumsum(picked, axis=1)
+                rows, picks = np.nonzero(picked)
+                parts.append((respondent_index[rows], question, None, picks, order[rows, picks]))
+
+        respondent_ids = np.array([f"R{index:07d}" for index in respondent_index], dtype=object)
+        frames = []
+        for rows, question, text, picks, order in parts:
+            missing = np.full(len(rows), None, dtype=object)
+            frames.append(pd.DataFrame({
+                "respondent_index": rows,
+                "question": question.id,
+                "type": question.type,
+                "text": text if text is not None else missing,
+                "response": np.array(question.option_ids, dtype=object)[picks] if picks is not None else missing,
+                "order": pd.array(order if order is not None else missing, dtype="Int64"),
+            }))
+        frame = pd.concat(frames, ignore_index=True).sort_values("respondent_index", kind="stable")
+        frame.insert(0, "survey", survey.id)
+        frame.insert(1, "respondent", respondent_ids[frame.pop("respondent_index").to_numpy() - start])
+        yield frame[RESPONSE_COLUMNS]
+
+
+class ExcelResponseWriter:
+    """Rows appended to a write-only workbook (constant memory)."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet("responses")
+        self.sheet.append(RESPONSE_COLUMNS)
+        self.rows = 0
+
+    def write(self, frame: pd.DataFrame) -> None:
+        self.rows += len(frame)
+        if self.rows > EXCEL_MAX_ROWS:
+            raise SystemExit(f"{self.rows:,} rows do not fit in a worksheet; use --format arrow")
+        for survey, respondent, question, question_type, text, response, order in frame.itertuples(index=False):
+            self.sheet.append([
+                survey, respondent, question, question_type,
+                text, response, None if pd.isna(order) else int(order),
+            ])
+
+    def close(self) -> None:
+        self.workbook.save(self.path)
+
+
+class ArrowResponseWriter:
+    """Rows written as string columns, like the columnar cache of a workbook."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.schema = pa.schema([(name, pa.string()) for name in RESPONSE_COLUMNS])
+        self.writer = pa.ipc.new_file(str(path), self.schema)
+        self.rows = 0
+
+    def write(self, frame: pd.DataFrame) -> None:
+        self.rows += len(frame)
+        columns = [pa.array(frame[name].astype("string"), type=pa.string()) for name in RESPONSE_COLUMNS]
+        self.writer.write_batch(pa.RecordBatch.from_arrays(columns, schema=self.schema))
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+def generate(
+    output: Path,
+    respondents: int,
+    surveys: int = 1,
+    questions: int = 30,
+    mix: Optional[List[float]] = None,
+    options: int = 6,
+    answer_rate: float = 0.85,
+    seed: int = 1,
+    file_format: str = "auto"
+) -> Dict:
+    """Write the survey files and responses under ``output/input``; return the manifest."""
+    started = time.perf_counter()
+    mix = mix or [2, 5, 3]
+    xml_dir = output / "input" / "xml"
+    xml_dir.mkdir(parents=True, exist_ok=True)
+    for stale in xml_dir.glob("QS*.xml"):
+        stale.unlink()
+
+    survey_list = build_surveys(surveys, questions, mix, options, seed)
+    for survey in survey_list:
+        write_survey_xml(survey, xml_dir / f"{survey.id}.xml")
+
+    expected_rows = respondents * sum(
+        question.expected_rows(answer_rate) for survey in survey_list for question in survey.questions
+    )
+    if file_format == "auto":
+        file_format = "xlsx" if expected_rows <= EXCEL_MAX_ROWS * 0.95 else "arrow"
+    responses_path = output / "input" / f"responses.{file_format}"
+    for stale in (output / "input").glob("responses.*"):
+        stale.unlink()
+
+    rng = np.random.default_rng(seed)
+    texts = text_pool(rng)
+    writer = ExcelResponseWriter(responses_path) if file_format == "xlsx" else ArrowResponseWriter(responses_path)
+    try:
+        for survey in survey_list:
+            for frame in iter_response_frames(survey, respondents, answer_rate, rng, texts):
+                writer.write(frame)
+    finally:
+        writer.close()
+
+    manifest = {
+        "surveys": [survey.id for survey in survey_list],
+        "respondents": respondents,
+        "questions": questions,
+        "question_types": {
+            name: sum(question.type == value for question in survey_list[0].questions)
+            for name, value in (("TEXT", TEXT), ("SINGLE", SINGLE), ("MULTIPLE", MULTIPLE))
+        },
+        "options": options,
+        "answer_rate": answer_rate,
+        "seed": seed,
+        "responses_file": str(responses_path.relative_to(output)),
+        "rows": writer.rows,
+        "seconds": time.perf_counter() - started,
+    }
+    with open(output / "synthetic.json", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Generate synthetic surveys and responses for the benchmarks.")
+    parser.add_argument("--output", type=Path, required=True, help="directory to write input/ and synthetic.json to")
+    size = parser.add_mutually_exclusive_group()
+    size.add_argument("--scale", choices=list(SCALES), default="10k", help="respondents per survey (default: 10k)")
+    size.add_argument("--respondents", type=int, help="respondents per survey, instead of --scale")
+    parser.add_argument("--surveys", type=int, default=1, help="number of surveys (default: 1)")
+    parser.add_argument("--questions", type=int, default=30, help="questions per survey (default: 30)")
+    parser.add_argument(
+        "--mix",
+        default="2,5,3",
+        help="relative weights of TEXT, SINGLE and MULTIPLE questions (default: 2,5,3)",
+    )
+    parser.add_argument("--options", type=int, default=6, help="most answer options of a choice question (default: 6)")
+    parser.add_argument("--answer-rate", type=float, default=0.85, help="share of questions answered (default: 0.85)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed (default: 1)")
+    parser.add_argument(
+        "--format",
+        choices=["auto", "xlsx", "arrow"],
+        default="auto",
+        help="responses file format; auto writes a workbook when the rows fit in one sheet (default: auto)",
+    )
+    args = parser.parse_args(argv)
+
+    mix = [float(weight) for weight in args.mix.split(",")]
+    if len(mix) != 3 or min(mix) < 0 or sum(mix) <= 0:
+        parser.error("--mix needs three non-negative weights")
+    manifest = generate(
+        args.output,
+        respondents=args.respondents or SCALES[args.scale],
+        surveys=args.surveys,
+        questions=args.questions,
+        mix=mix,
+        options=args.options,
+        answer_rate=args.answer_rate,
+        seed=args.seed,
+        file_format=args.format,
+    )
+    print(
+        f"{len(manifest['surveys'])} survey(s) x {manifest['respondents']:,} respondents: "
+        f"{manifest['rows']:,} response rows in {manifest['responses_file']} ({manifest['seconds']:.1f}s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
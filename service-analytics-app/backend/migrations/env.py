@@ -0,0 +1,63 @@
+"""
+Alembic environment: migrates the database of ``DATABASE_URL`` against the models' metadata.
+
+``src.models.upgrade_database`` passes its own connection in
+``config.attributes["connection"]``; the ``alembic`` command line opens one.
+"""
+from logging.config import fileConfig
+from alembic import context
+from sqlalchemy.engine import Connection
+from src.models import Base, engine
+from src.models.text_search import TEXT_SEARCH_INDEX, TEXT_SEARCH_TABLE
+
+config = context.config
+target_metadata = Base.metadata
+
+
+def include_name(name, type_, parent_names) -> bool:
+    """Leave the full-text index (the FTS5 table and its shadow tables) out of autogenerate."""
+    if type_ == "table":
+        return not name.startswith(TEXT_SEARCH_TABLE)
+    return name != TEXT_SEARCH_INDEX
+
+
+def run_migrations(connection: Connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_name=include_name,
+        # SQLite cannot alter constraints in place; batch mode recreates the table.
+        render_as_batch=connection.dialect.name == "sqlite",
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_offline() -> None:
+    """Print the SQL of the migrations instead of running it (``alembic upgrade head --sql``)."""
+    context.configure(
+        url=str(engine.url),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        run_migrations(connection)
+        return
+
+    if config.config_file_name is not None:
+        fileConfig(config.config_file_name, disable_existing_loggers=False)
+    with engine.connect() as connection:
+        run_migrations(connection)
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
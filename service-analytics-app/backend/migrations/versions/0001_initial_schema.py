@@ -0,0 +1,196 @@
+"""Initial schema
+
+The tables created by ``Base.metadata.create_all`` before migrations were
+introduced, and the full-text index of text answers. Only what is missing is
+created, so a database created that way (possibly by an older version, without
+some tables or indexes) is upgraded in place.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 01:09:19.195836
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from src.models.text_search import drop_text_search_index, ensure_text_search_index
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def create_table(name: str, *columns) -> None:
+    if not sa.inspect(op.get_bind()).has_table(name):
+        op.create_table(name, *columns)
+
+
+def upgrade() -> None:
+    create_table('data_generations',
+    sa.Column('survey_id', sa.String(length=50), nullable=False),
+    sa.Column('generation', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('survey_id')
+    )
+    op.create_index('ix_data_generations_survey_id', 'data_generations', ['survey_id'], if_not_exists=True)
+
+    create_table('load_manifest',
+    sa.Column('key', sa.String(length=500), nullable=False),
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('row_count', sa.Integer(), nullable=True),
+    sa.Column('loaded_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index('ix_load_manifest_key', 'load_manifest', ['key'], if_not_exists=True)
+
+    create_table('pair_test_runs',
+    sa.Column('survey_id', sa.String(length=50), nullable=False),
+    sa.Column('generation', sa.Integer(), nullable=False),
+    sa.Column('question_count', sa.Integer(), nullable=False),
+    sa.Column('pair_count', sa.Integer(), nullable=False),
+    sa.Column('respondent_count', sa.Integer(), nullable=False),
+    sa.Column('seconds', sa.Float(), nullable=False),
+    sa.Column('built_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('survey_id')
+    )
+    op.create_index('ix_pair_test_runs_survey_id', 'pair_test_runs', ['survey_id'], if_not_exists=True)
+
+    create_table('question_pair_tests',
+    sa.Column('survey_id', sa.String(length=50), nullable=False),
+    sa.Column('row_question_id', sa.String(length=100), nullable=False),
+    sa.Column('column_question_id', sa.String(length=100), nullable=False),
+    sa.Column('respondents', sa.Integer(), nullable=False),
+    sa.Column('observations', sa.Integer(), nullable=False),
+    sa.Column('chi_square', sa.Float(), nullable=False),
+    sa.Column('dof', sa.Integer(), nullable=False),
+    sa.Column('p_value', sa.Float(), nullable=True),
+    sa.Column('cramers_v', sa.Float(), nullable=True),
+    sa.PrimaryKeyConstraint('survey_id', 'row_question_id', 'column_question_id')
+    )
+    create_table('respondent_rows',
+    sa.Column('survey_id', sa.String(length=50), nullable=False),
+    sa.Column('respondent_id', sa.String(length=100), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('cells', sa.Text(), nullable=False),
+    sa.PrimaryKeyConstraint('survey_id', 'respondent_id')
+    )
+    create_table('respondents',
+    sa.Column('id', sa.String(length=100), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_respondents_id', 'respondents', ['id'], if_not_exists=True)
+
+    create_table('response_materializations',
+    sa.Column('survey_id', sa.String(length=50), nullable=False),
+    sa.Column('generation', sa.Integer(), nullable=False),
+    sa.Column('question_count', sa.Integer(), nullable=False),
+    sa.Column('respondent_count', sa.Integer(), nullable=False),
+    sa.Column('built_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('survey_id')
+    )
+    op.create_index('ix_response_materializations_survey_id', 'response_materializations', ['survey_id'], if_not_exists=True)
+
+    create_table('surveys',
+    sa.Column('id', sa.String(length=50), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_surveys_id', 'surveys', ['id'], if_not_exists=True)
+
+    create_table('questions',
+    sa.Column('id', sa.String(length=100), nullable=False),
+    sa.Column('survey_id', sa.String(length=50), nullable=False),
+    sa.Column('name', sa.String(length=200), nullable=False),
+    sa.Column('text', sa.String(length=1000), nullable=False),
+    sa.Column('type', sa.Enum('TEXT', 'SINGLE', 'MULTIPLE', name='questiontype'), nullable=False),
+    sa.ForeignKeyConstraint(['survey_id'], ['surveys.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_questions_id', 'questions', ['id'], if_not_exists=True)
+
+    create_table('answer_options',
+    sa.Column('id', sa.String(length=100), nullable=False),
+    sa.Column('question_id', sa.String(length=100), nullable=False),
+    sa.Column('code', sa.Integer(), nullable=False),
+    sa.Column('label', sa.String(length=500), nullable=False),
+    sa.ForeignKeyConstraint(['question_id'], ['questions.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_answer_options_id', 'answer_options', ['id'], if_not_exists=True)
+
+    create_table('text_responses',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('respondent_id', sa.String(length=100), nullable=False),
+    sa.Column('question_id', sa.String(length=100), nullable=False),
+    sa.Column('survey_id', sa.String(length=50), nullable=False),
+    sa.Column('text', sa.Text(), nullable=False),
+    sa.ForeignKeyConstraint(['question_id'], ['questions.id'], ),
+    sa.ForeignKeyConstraint(['respondent_id'], ['respondents.id'], ),
+    sa.ForeignKeyConstraint(['survey_id'], ['surveys.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_text_responses_id', 'text_responses', ['id'], if_not_exists=True)
+    op.create_index('ix_text_responses_survey_respondent', 'text_responses', ['survey_id', 'respondent_id'], if_not_exists=True)
+
+    create_table('choice_responses',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('respondent_id', sa.String(length=100), nullable=False),
+    sa.Column('question_id', sa.String(length=100), nullable=False),
+    sa.Column('survey_id', sa.String(length=50), nullable=False),
+    sa.Column('answer_option_id', sa.String(length=100), nullable=False),
+    sa.Column('response_order', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['answer_option_id'], ['answer_options.id'], ),
+    sa.ForeignKeyConstraint(['question_id'], ['questions.id'], ),
+    sa.ForeignKeyConstraint(['respondent_id'], ['respondents.id'], ),
+    sa.ForeignKeyConstraint(['survey_id'], ['surveys.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_choice_responses_id', 'choice_responses', ['id'], if_not_exists=True)
+    op.create_index('ix_choice_responses_survey_question', 'choice_responses', ['survey_id', 'question_id', 'respondent_id', 'answer_option_id'], if_not_exists=True)
+    op.create_index('ix_choice_responses_survey_respondent', 'choice_responses', ['survey_id', 'respondent_id'], if_not_exists=True)
+
+    ensure_text_search_index(op.get_bind())
+
+
+
+def downgrade() -> None:
+    drop_text_search_index(op.get_bind())
+
+    op.drop_index('ix_choice_responses_survey_respondent', table_name='choice_responses')
+    op.drop_index('ix_choice_responses_survey_question', table_name='choice_responses')
+    op.drop_index('ix_choice_responses_id', table_name='choice_responses')
+    op.drop_table('choice_responses')
+
+    op.drop_index('ix_text_responses_survey_respondent', table_name='text_responses')
+    op.drop_index('ix_text_responses_id', table_name='text_responses')
+    op.drop_table('text_responses')
+
+    op.drop_index('ix_answer_options_id', table_name='answer_options')
+    op.drop_table('answer_options')
+
+    op.drop_index('ix_questions_id', table_name='questions')
+    op.drop_table('questions')
+
+    op.drop_index('ix_surveys_id', table_name='surveys')
+    op.drop_table('surveys')
+
+    op.drop_index('ix_response_materializations_survey_id', table_name='response_materializations')
+    op.drop_table('response_materializations')
+
+    op.drop_index('ix_respondents_id', table_name='respondents')
+    op.drop_table('respondents')
+    op.drop_table('respondent_rows')
+    op.drop_table('question_pair_tests')
+
+    op.drop_index('ix_pair_test_runs_survey_id', table_name='pair_test_runs')
+    op.drop_table('pair_test_runs')
+
+    op.drop_index('ix_load_manifest_key', table_name='load_manifest')
+    op.drop_table('load_manifest')
+
+    op.drop_index('ix_data_generations_survey_id', table_name='data_generations')
+    op.drop_table('data_generations')
+    sa.Enum(name='questiontype').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,57 @@
+"""Unique response keys
+
+Text answers are unique per (survey, question, respondent) and choices per
+(survey, question, respondent, option), the keys the loader deduplicates on.
+The indexes lead with ``survey_id, question_id``, which every response read
+filters on, and let the loader insert with ``ON CONFLICT DO NOTHING``.
+Duplicates left by earlier loads are deleted first, keeping the first row.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 01:09:50.542805
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TEXT_KEY = "survey_id, question_id, respondent_id"
+CHOICE_KEY = "survey_id, question_id, respondent_id, answer_option_id"
+
+
+def delete_duplicates(table: str, key: str) -> None:
+    op.execute(
+        f"DELETE FROM {table} WHERE id NOT IN (SELECT min(id) FROM {table} GROUP BY {key})"
+    )
+
+
+def upgrade() -> None:
+    delete_duplicates('text_responses', TEXT_KEY)
+    delete_duplicates('choice_responses', CHOICE_KEY)
+
+    op.create_index(
+        'uq_text_responses_survey_question_respondent', 'text_responses',
+        ['survey_id', 'question_id', 'respondent_id'], unique=True,
+    )
+    op.create_index(
+        'uq_choice_responses_survey_question_respondent_option', 'choice_responses',
+        ['survey_id', 'question_id', 'respondent_id', 'answer_option_id'], unique=True,
+    )
+    # Missing in databases created before the index was added to the model
+    op.drop_index('ix_choice_responses_survey_question', table_name='choice_responses', if_exists=True)
+
+
+def downgrade() -> None:
+    op.create_index(
+        'ix_choice_responses_survey_question', 'choice_responses',
+        ['survey_id', 'question_id', 'respondent_id', 'answer_option_id'],
+    )
+    op.drop_index('uq_choice_responses_survey_question_respondent_option', table_name='choice_responses')
+    op.drop_index('uq_text_responses_survey_question_respondent', table_name='text_responses')
@@ -0,0 +1,58 @@
+"""
+Batch job computing the chi-square tests of all coded question pairs.
+
+Run as ``python -m src.analyze_pairs``: surveys whose tests are missing or
+older than their data generation are recomputed; ``--survey`` recomputes the
+given surveys regardless.
+"""
+import argparse
+from src.logger import logger
+from src.models import SessionLocal, Survey, engine, upgrade_database
+from src.loading import analyze_stale_surveys, analyze_survey
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Parse command line options of the job."""
+    parser = argparse.ArgumentParser(description="Compute chi-square tests of all question pairs of surveys.")
+    parser.add_argument(
+        "--survey",
+        action="append",
+        default=[],
+        help="survey id to recompute (repeatable); default: every survey with missing or stale results",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="processes multiplying answer chunks (default: PAIR_TESTS_WORKERS, 0 means one per CPU)",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Recompute the requested or stale pair tests."""
+    args = parse_args(argv)
+    upgrade_database(engine)
+    db = SessionLocal()
+    try:
+        if args.survey:
+            for survey_id in args.survey:
+                if db.get(Survey, survey_id) is None:
+                    raise SystemExit(f"Survey not found: {survey_id}")
+                run = analyze_survey(db, survey_id, args.workers)
+                db.commit()
+                logger.info(
+                    f"Pair tests of survey {survey_id}: {run.pair_count} pairs of "
+                    f"{run.question_count} questions in {run.seconds:.2f}s"
+                )
+        elif not analyze_stale_surveys(db, args.workers):
+            logger.info("Pair tests are up to date")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Export the responses of a survey to a CSV, XLSX or Parquet file.
+
+Run as ``python -m src.export_data --survey <id> --format parquet``: the file
+is written as the rows are read from a server-side cursor, ``--chunk-size``
+response rows at a time, so memory stays bounded by one chunk.
+"""
+import argparse
+import time
+from pathlib import Path
+from fastapi import HTTPException
+from src.logger import logger
+from src.models import SessionLocal, Survey
+from src.schemas import ExportFormat, GetResponsesRequest
+from src.loading.summary import peak_memory_mb
+from src.services.response_service import ResponseService
+from src.settings import settings
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Parse command line options of the export."""
+    parser = argparse.ArgumentParser(description="Export the responses of a survey to a file.")
+    parser.add_argument("--survey", required=True, help="survey id")
+    parser.add_argument(
+        "--format",
+        type=ExportFormat,
+        choices=list(ExportFormat),
+        default=ExportFormat.CSV,
+        help="file format (default: csv)",
+    )
+    parser.add_argument(
+        "--questions",
+        default=None,
+        help="comma-separated question names, in column order; default: every question of the survey",
+    )
+    parser.add_argument("--output", type=Path, default=None, help="output file (default: <survey>.<format>)")
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=settings.EXPORT_CHUNK_SIZE,
+        help="response rows read from the cursor at a time (default: EXPORT_CHUNK_SIZE)",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Write the requested export file."""
+    args = parse_args(argv)
+    output = args.output or Path(f"{args.survey}.{args.format.value}")
+    db = SessionLocal()
+    try:
+        survey = db.get(Survey, args.survey)
+        if survey is None:
+            raise SystemExit(f"Survey not found: {args.survey}")
+        if args.questions:
+            question_names = [name.strip() for name in args.questions.split(",") if name.strip()]
+        else:
+            question_names = [q.name for q in sorted(survey.questions, key=lambda q: q.id)]
+
+        response_service = ResponseService(db)
+        try:
+            questions = response_service.resolve_questions(
+                GetResponsesRequest(survey_id=args.survey, question_ids=question_names)
+            )
+        except HTTPException as exc:
+            raise SystemExit(exc.detail)
+
+        started = time.perf_counter()
+        size = 0
+        with open(output, "wb") as file:
+            for data in response_service.iter_export(questions, question_names, args.format, args.chunk_size):
+                file.write(data)
+                size += len(data)
+        seconds = time.perf_counter() - started
+        logger.info(
+            f"Wrote {output} ({size / 1024 / 1024:.1f} MiB) in {seconds:.2f}s, "
+            f"peak memory {peak_memory_mb():.0f} MiB"
+        )
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
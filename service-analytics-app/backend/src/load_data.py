@@ -5,109 +5,80 @@ Can be run both as:
 - `python -m src.load_data` (recommended inside Docker)
 - `python src/load_data.py` (from project root)
 """
+import argparse
 import os
-import xml.etree.ElementTree as ET
 import pandas as pd
 from pathlib import Path
+from typing import List, Optional, Set
 from sqlalchemy.orm import Session
 from src.logger import logger
+from src.settings import settings
 
 try:
     from .models import (
-        Base,
         engine,
         SessionLocal,
-        Survey,
-        Question,
-        QuestionType,
-        Respondent,
-        AnswerOption,
-        TextResponse,
-        ChoiceResponse,
+        upgrade_database,
+    )
+    from .loading import (
+        BulkResponseWriter,
+        LoadSummary,
+        iter_excel_batches,
+        read_survey_records,
+        iter_survey_records,
+        write_survey_records,
+        resolve_workers,
+        LoadManifest,
+        file_sha256,
+        frame_sha256,
+        ColumnarCache,
+        iter_cache_batches,
+        bump_generations,
+        materialize_stale_surveys,
+        analyze_stale_surveys,
     )
 except ImportError:
     from src.models import (
-        Base,
         engine,
         SessionLocal,
-        Survey,
-        Question,
-        QuestionType,
-        Respondent,
-        AnswerOption,
-        TextResponse,
-        ChoiceResponse,
+        upgrade_database,
+    )
+    from src.loading import (
+        BulkResponseWriter,
+        LoadSummary,
+        iter_excel_batches,
+        read_survey_records,
+        iter_survey_records,
+        write_survey_records,
+        resolve_workers,
+        LoadManifest,
+        file_sha256,
+        frame_sha256,
+        ColumnarCache,
+        iter_cache_batches,
+        bump_generations,
+        materialize_stale_surveys,
+        analyze_stale_surveys,
     )
 
+COMMIT_INTERVAL = 5000
+
 
 def parse_xml_survey(xml_path: Path, survey_id: str, db: Session) -> None:
     """Parse XML file and load survey structure into database."""
-    tree = ET.parse(xml_path)
-    root = tree.getroot()
-
-    survey = db.query(Survey).filter(Survey.id == survey_id).first()
-    if not survey:
-        survey = Survey(id=survey_id)
-        db.add(survey)
-        db.flush()
-
-    questions_elem = root.find(".//questions")
-    if questions_elem is not None:
-        for question_elem in questions_elem.findall("question"):
-            question_id = question_elem.get("id")
-            question_type = int(question_elem.get("type"))
-            name_elem = question_elem.find("name")
-            text_elem = question_elem.find("text")
-
-            name = name_elem.text if name_elem is not None else ""
-            text = text_elem.text if text_elem is not None else ""
-
-            type_map = {1: QuestionType.TEXT, 2: QuestionType.SINGLE, 3: QuestionType.MULTIPLE}
-            question_type_enum = type_map.get(question_type, QuestionType.TEXT)
-
-            question = db.query(Question).filter(Question.id == question_id).first()
-            if not question:
-                question = Question(
-                    id=question_id,
-                    survey_id=survey_id,
-                    name=name,
-                    text=text,
-                    type=question_type_enum
-                )
-                db.add(question)
-            else:
-                question.name = name
-                question.text = text
-                question.type = question_type_enum
-
-            db.flush()
-
-            if question_type in [2, 3]:
-                categories_elem = root.find(f".//categories[@id='{question_id}']")
-                if categories_elem is not None:
-                    for category_elem in categories_elem.findall("category"):
-                        option_id = category_elem.get("id")
-                        code = int(category_elem.get("code"))
-                        label = category_elem.text if category_elem.text else ""
-
-                        answer_option = db.query(AnswerOption).filter(
-                            AnswerOption.id == option_id
-                        ).first()
-                        if not answer_option:
-                            answer_option = AnswerOption(
-                                id=option_id,
-                                question_id=question_id,
-                                code=code,
-                                label=label
-                            )
-                            db.add(answer_option)
-                        else:
-                            answer_option.code = code
-                            answer_option.label = label
-
-
-def load_responses_from_excel(excel_path: Path, db: Session) -> None:
-    """Load responses from Excel file into database."""
+    write_survey_records(db, read_survey_records(xml_path, survey_id))
+
+
+def load_responses_from_excel(excel_path: Path, db: Session) -> Set[str]:
+    """Load responses from Excel file into database.
+
+    The whole workbook is read at once and written in windows of
+    ``COMMIT_INTERVAL`` rows by the same writer as the bulk mode, so rows
+    whose key is already stored are updated instead of failing on the unique
+    indexes. A failed window is rolled back and the error is raised.
+
+    Returns ids of the surveys that received new or changed responses.
+    """
     logger.info(f"Loading Excel file from: {excel_path}")
 
     df = pd.read_excel(excel_path)
@@ -115,127 +86,265 @@ def load_responses_from_excel(excel_path: Path, db: Session) -> None:
 
     logger.info(f"Excel loaded successfully! Rows: {len(df)}")
 
-    text_responses_count = 0
-    choice_responses_count = 0
-    respondents_count = 0
-    respondents_cache = {}
-
-    for idx, row in df.iterrows():
-        survey_id = str(row["survey"])
-        respondent_id = str(row["respondent"])
-        question_id = str(row["question"])
-        question_type = int(row["type"])
-
-        if idx % 10000 == 0:
-            logger.info(f"Processing row {idx}/{len(df)}...")
-
-        if respondent_id not in respondents_cache:
-
-            respondent = db.query(Respondent).filter_by(id=respondent_id).first()
-            if not respondent:
-                respondent = Respondent(id=respondent_id)
-                db.add(respondent)
-                respondents_count += 1
-            respondents_cache[respondent_id] = respondent
-
-        if question_type == 1:
-            if pd.notna(row.get("text")):
-                text = str(row["text"]).strip()
-                if text.lower() != 'nan' and text:
-                    existing = db.query(TextResponse).filter_by(
-                        respondent_id=respondent_id,
-                        question_id=question_id,
-                        survey_id=survey_id
-                    ).first()
-
-                    if not existing:
-                        text_response = TextResponse(
-                            respondent_id=respondent_id,
-                            question_id=question_id,
-                            survey_id=survey_id,
-                            text=text
-                        )
-                        db.add(text_response)
-                        text_responses_count += 1
-
-        elif question_type in [2, 3]:
-            if pd.notna(row.get("response")):
-                response_id = str(row["response"]).strip()
-                order = int(row["order"]) if pd.notna(row.get("order")) else 1
-
-                if response_id.lower() != 'nan' and response_id:
-                    existing = db.query(ChoiceResponse).filter_by(
-                        respondent_id=respondent_id,
-                        question_id=question_id,
-                        survey_id=survey_id,
-                        answer_option_id=response_id
-                    ).first()
-
-                    if not existing:
-                        choice_response = ChoiceResponse(
-                            respondent_id=respondent_id,
-                            question_id=question_id,
-                            survey_id=survey_id,
-                            answer_option_id=response_id,
-                            response_order=order
-                        )
-                        db.add(choice_response)
-                        choice_responses_count += 1
-
-        if idx > 0 and idx % 5000 == 0:
-            try:
-                db.commit()
-                logger.info(f"Committed {idx} rows...")
-            except Exception as e:
-                db.rollback()
-                logger.info(f"Error at row {idx}, rolling back: {e}")
+    writer = BulkResponseWriter(db)
+    for start in range(0, len(df), COMMIT_INTERVAL):
+        try:
+            writer.write_batch(df.iloc[start:start + COMMIT_INTERVAL])
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error in rows {start}-{start + COMMIT_INTERVAL}, rolled back: {e}")
+            raise
+
+    writer.summary.finish()
+    writer.summary.log()
+    return writer.summary.surveys_changed
+
+
+def load_responses_bulk(
+    excel_path: Path,
+    db: Session,
+    batch_size: Optional[int] = None,
+    manifest: Optional[LoadManifest] = None,
+    cache_path: Optional[Path] = None
+) -> LoadSummary:
+    """Stream responses from Excel file in fixed-size batches into batched inserts.
+
+    With a manifest, batches whose content hash was already applied are skipped.
+    With a columnar cache file, batches are read from it instead of the workbook.
+    """
+    batch_size = batch_size or settings.LOAD_BATCH_SIZE
+    if cache_path is not None:
+        logger.info(f"Reading responses from columnar cache: {cache_path} (batch size {batch_size})")
+        batches = iter_cache_batches(cache_path, batch_size)
+    else:
+        logger.info(f"Streaming Excel file from: {excel_path} (batch size {batch_size})")
+        batches = iter_excel_batches(excel_path, batch_size)
+
+    writer = BulkResponseWriter(db)
+    for index, batch in enumerate(batches):
+        if manifest is not None:
+            batch_key = f"excel:{excel_path.name}:batch:{index}"
+            batch_hash = frame_sha256(batch)
+            if manifest.is_current(batch_key, batch_hash):
+                writer.summary.rows_skipped += len(batch)
+                writer.summary.batches_skipped += 1
                 continue
+            manifest.record(batch_key, batch_hash, row_count=len(batch))
+        writer.write_batch(batch)
+
+    writer.summary.finish()
+    writer.summary.log()
+    return writer.summary
+
+
+def load_surveys(
+    xml_dir: Path,
+    db: Session,
+    workers: Optional[int] = None,
+    manifest: Optional[LoadManifest] = None
+) -> List[str]:
+    """Parse survey XML files in parallel and upsert them through a single writer.
+
+    Returns ids of the surveys that were applied; with a manifest, files whose
+    content hash was already applied are skipped without being parsed.
+    """
+    all_files = sorted(xml_dir.glob("*.xml"))
+    xml_files = all_files
+    file_hashes = {}
+    if manifest is not None:
+        file_hashes = {xml_file: file_sha256(xml_file) for xml_file in all_files}
+        xml_files = [
+            xml_file for xml_file in all_files
+            if not manifest.is_current(f"xml:{xml_file.name}", file_hashes[xml_file])
+        ]
+
+    workers = resolve_workers(workers if workers is not None else settings.LOAD_XML_WORKERS)
+    logger.info(f"Parsing {len(xml_files)} survey files with {workers} worker(s)...")
+
+    for xml_file, records in zip(xml_files, iter_survey_records(xml_files, workers)):
+        logger.info(
+            f"Loading survey {records.survey_id}: {len(records.questions)} questions, "
+            f"{len(records.answer_options)} answer options..."
+        )
+        write_survey_records(db, records)
+        if manifest is not None:
+            manifest.record(f"xml:{xml_file.name}", file_hashes[xml_file], row_count=len(records.questions))
 
-    try:
-        db.commit()
-    except Exception as e:
-        logger.info(f"Final commit error: {e}")
-        db.rollback()
-        raise
-
-    logger.info(f"\n=== Loading Summary ===")
-    logger.info(f"Total rows in Excel: {len(df)}")
-    logger.info(f"Unique respondents created: {respondents_count}")
-    logger.info(f"Text responses added: {text_responses_count}")
-    logger.info(f"Choice responses added: {choice_responses_count}")
-    logger.info(f"Total responses added: {text_responses_count + choice_responses_count}")
-
+    db.commit()
+    logger.info(f"Surveys applied: {len(xml_files)}, skipped (unchanged): {len(all_files) - len(xml_files)}")
+    return [xml_file.stem for xml_file in xml_files]
+
+
+def load_all_data(
+    xml_dir: Path,
+    excel_path: Path,
+    db: Session,
+    bulk: bool = False,
+    batch_size: Optional[int] = None,
+    xml_workers: Optional[int] = None,
+    incremental: bool = True,
+    cache: Optional[ColumnarCache] = None,
+    rebuild_cache: bool = False,
+    materialize: bool = True,
+    analyze: bool = False
+) -> None:
+    """Load all survey data from XML files and Excel responses.
+
+    In incremental mode, inputs recorded in the load manifest with the same
+    content hash are skipped; ``incremental=False`` reprocesses everything.
+    With a columnar cache, responses are read from the cached copy of the
+    workbook (built on first use, or always when ``rebuild_cache`` is set).
+    A responses file that is already columnar (``.arrow``, the layout of the
+    cache) is read directly.
+    Surveys whose structure or responses changed get their data generation
+    bumped, which invalidates cached response results. Finally the
+    per-respondent rows of every survey whose generation moved on are
+    materialized again, unless ``materialize`` is off. With ``analyze``, the
+    chi-square tests of all question pairs are recomputed for those surveys too.
+    """
+    manifest = LoadManifest(db, enabled=incremental)
 
-def load_all_data(xml_dir: Path, excel_path: Path, db: Session) -> None:
-    """Load all survey data from XML files and Excel responses."""
     logger.info("Loading surveys from XML files...")
-
-    xml_files = sorted(xml_dir.glob("*.xml"))
-    for xml_file in xml_files:
-        survey_id = xml_file.stem
-        logger.info(f"Loading survey {survey_id} from {xml_file.name}...")
-        parse_xml_survey(xml_file, survey_id, db)
-        db.commit()
+    surveys_changed = set(load_surveys(xml_dir, db, workers=xml_workers, manifest=manifest))
 
     logger.info("Loading responses from Excel file...")
-    load_responses_from_excel(excel_path, db)
+    excel_key = f"excel:{excel_path.name}"
+    excel_hash = file_sha256(excel_path)
+    columnar = excel_path.suffix == ".arrow"
+    if cache is not None and rebuild_cache and not columnar:
+        cache.ensure(excel_path, excel_hash, rebuild=True)
+
+    if manifest.is_current(excel_key, excel_hash):
+        logger.info(f"{excel_path.name} is unchanged since the last load, skipped")
+    else:
+        if columnar:
+            summary = load_responses_bulk(
+                excel_path, db, batch_size=batch_size, manifest=manifest, cache_path=excel_path
+            )
+            surveys_changed |= summary.surveys_changed
+        elif cache is not None:
+            summary = load_responses_bulk(
+                excel_path,
+                db,
+                batch_size=batch_size,
+                manifest=manifest,
+                cache_path=cache.ensure(excel_path, excel_hash),
+            )
+            surveys_changed |= summary.surveys_changed
+        elif bulk:
+            summary = load_responses_bulk(excel_path, db, batch_size=batch_size, manifest=manifest)
+            surveys_changed |= summary.surveys_changed
+        else:
+            surveys_changed |= load_responses_from_excel(excel_path, db)
+        manifest.record(excel_key, excel_hash)
+
+    generations = bump_generations(db, surveys_changed)
     db.commit()
+    if generations:
+        logger.info(
+            "Data generations bumped: "
+            + ", ".join(f"{survey_id}={generation}" for survey_id, generation in sorted(generations.items()))
+        )
+
+    if materialize:
+        logger.info("Materializing respondent rows...")
+        materialized = materialize_stale_surveys(db)
+        for survey_id, respondents in materialized.items():
+            logger.info(f"Materialized {respondents} respondent rows of survey {survey_id}")
+        if not materialized:
+            logger.info("Respondent rows are up to date")
+    if analyze:
+        logger.info("Testing question pairs...")
+        if not analyze_stale_surveys(db):
+            logger.info("Pair tests are up to date")
     logger.info("Data loading completed!")
 
 
-def main():
+def parse_args(argv=None) -> argparse.Namespace:
+    """Parse command line options of the loader."""
+    parser = argparse.ArgumentParser(description="Load survey structure and responses into the database.")
+    parser.add_argument(
+        "--responses",
+        type=Path,
+        default=None,
+        help="responses workbook, or an Arrow IPC file with its columns (default: input/responses.xlsx)",
+    )
+    parser.add_argument(
+        "--bulk",
+        action="store_true",
+        help="stream responses in batches and write them with multi-row inserts (COPY on PostgreSQL)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=None,
+        help=f"rows per batch in bulk mode (default: LOAD_BATCH_SIZE={settings.LOAD_BATCH_SIZE})",
+    )
+    parser.add_argument(
+        "--xml-workers",
+        type=int,
+        default=None,
+        help="processes parsing survey XML files (default: LOAD_XML_WORKERS, 0 means one per CPU)",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="reprocess every input even if the load manifest says it is unchanged",
+    )
+    parser.add_argument(
+        "--from-cache",
+        action="store_true",
+        help="read responses from the columnar cache of the workbook, building it if missing (implies --bulk)",
+    )
+    parser.add_argument(
+        "--rebuild-cache",
+        action="store_true",
+        help="convert the workbook into the columnar cache again and read responses from it (implies --bulk)",
+    )
+    parser.add_argument(
+        "--skip-materialize",
+        action="store_true",
+        help="do not rebuild the materialized respondent rows (responses are then served from the live tables)",
+    )
+    parser.add_argument(
+        "--analyze",
+        action="store_true",
+        help="recompute the chi-square tests of all question pairs of changed surveys",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
     """Main function to create database and load data."""
-    logger.info("Creating database tables...")
-    Base.metadata.create_all(bind=engine)
+    args = parse_args(argv)
+
+    logger.info("Applying database migrations...")
+    upgrade_database(engine)
 
     base_dir = Path(os.getenv("INPUT_BASE_DIR", Path(__file__).resolve().parent.parent))
     xml_dir = base_dir / "input" / "xml"
-    excel_path = base_dir / "input" / "responses.xlsx"
+    excel_path = args.responses or base_dir / "input" / "responses.xlsx"
+
+    cache = None
+    if args.from_cache or args.rebuild_cache:
+        cache = ColumnarCache(Path(settings.LOAD_CACHE_DIR or base_dir / "input" / ".cache"))
 
     db = SessionLocal()
 
     try:
-        load_all_data(xml_dir, excel_path, db)
+        load_all_data(
+            xml_dir,
+            excel_path,
+            db,
+            bulk=args.bulk,
+            batch_size=args.batch_size,
+            xml_workers=args.xml_workers,
+            incremental=not args.full,
+            cache=cache,
+            rebuild_cache=args.rebuild_cache,
+            materialize=not args.skip_materialize,
+            analyze=args.analyze,
+        )
     except Exception as e:
         logger.info(f"Error loading data: {e}")
         db.rollback()
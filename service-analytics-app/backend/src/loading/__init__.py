@@ -0,0 +1,42 @@
+from .summary import LoadSummary, peak_memory_mb
+from .bulk_writer import BulkResponseWriter, classify_rows
+from .excel_reader import iter_excel_batches
+from .upsert import upsert_rows
+from .survey_records import (
+    SurveyRecords,
+    read_survey_records,
+    iter_survey_records,
+    write_survey_records,
+    resolve_workers,
+)
+from .manifest import LoadManifest, file_sha256, frame_sha256
+from .columnar_cache import ColumnarCache, iter_cache_batches
+from .generations import bump_generations
+from .materialize import materialize_survey, materialize_stale_surveys, stale_survey_ids
+from .analysis import analyze_survey, analyze_stale_surveys, stale_pair_test_survey_ids
+
+__all__ = [
+    "LoadSummary",
+    "peak_memory_mb",
+    "BulkResponseWriter",
+    "classify_rows",
+    "iter_excel_batches",
+    "upsert_rows",
+    "SurveyRecords",
+    "read_survey_records",
+    "iter_survey_records",
+    "write_survey_records",
+    "resolve_workers",
+    "LoadManifest",
+    "file_sha256",
+    "frame_sha256",
+    "ColumnarCache",
+    "iter_cache_batches",
+    "bump_generations",
+    "materialize_survey",
+    "materialize_stale_surveys",
+    "stale_survey_ids",
+    "analyze_survey",
+    "analyze_stale_surveys",
+    "stale_pair_test_survey_ids",
+]
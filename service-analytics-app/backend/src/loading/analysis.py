@@ -0,0 +1,91 @@
+"""
+Batch chi-square tests of all coded question pairs, persisted per data generation.
+
+``question_pair_tests`` holds the results of a survey and its
+``pair_test_runs`` entry the data generation they were computed from;
+readers only use the results while it is current.
+"""
+import time
+from typing import Dict, List, Optional
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+from src.logger import logger
+from src.models import DataGeneration, PairTestRun, QuestionPairTest, Survey
+from src.services.pair_tests import (
+    answer_options_statement,
+    choice_rows_statement,
+    coded_questions_statement,
+    compute_pair_tests,
+    option_lookups,
+    pair_test_rows,
+    run_values,
+)
+from src.services.segment_index import encode_choice_rows
+from src.settings import settings
+from .survey_records import resolve_workers
+
+
+def stale_pair_test_survey_ids(db: Session) -> List[str]:
+    """Surveys whose pair tests are missing or computed from an older data generation."""
+    current_generation = func.coalesce(DataGeneration.generation, 0)
+    return list(db.scalars(
+        select(Survey.id)
+        .outerjoin(DataGeneration, DataGeneration.survey_id == Survey.id)
+        .outerjoin(PairTestRun, PairTestRun.survey_id == Survey.id)
+        .where(PairTestRun.survey_id.is_(None) | (PairTestRun.generation != current_generation))
+        .order_by(Survey.id)
+    ))
+
+
+def analyze_survey(db: Session, survey_id: str, workers: Optional[int] = None) -> PairTestRun:
+    """Recompute the pair tests of a survey at its current data generation."""
+    started = time.perf_counter()
+    generation = db.scalar(
+        select(DataGeneration.generation).where(DataGeneration.survey_id == survey_id)
+    ) or 0
+    questions = db.scalars(coded_questions_statement(survey_id)).all()
+    options = db.execute(answer_options_statement([q.id for q in questions])).all()
+    question_positions, option_codes, question_codes = option_lookups(questions, options)
+
+    # Rows are read on the session's connection: the ORM result layer costs more than the tests.
+    parts = [
+        encode_choice_rows(partition, question_positions, option_codes)
+        for partition in db.connection().execute(
+            choice_rows_statement(survey_id).execution_options(yield_per=settings.SEGMENT_INDEX_CHUNK_SIZE)
+        ).partitions()
+    ]
+    tests = compute_pair_tests(
+        parts,
+        questions,
+        question_codes,
+        workers=resolve_workers(workers if workers is not None else settings.PAIR_TESTS_WORKERS),
+        chunk_size=settings.PAIR_TESTS_CHUNK_SIZE,
+    )
+
+    db.execute(delete(QuestionPairTest).where(QuestionPairTest.survey_id == survey_id))
+    rows = pair_test_rows(survey_id, questions, tests)
+    if rows:
+        db.execute(insert(QuestionPairTest), rows)
+    values = run_values(generation, questions, tests, started)
+    run = db.get(PairTestRun, survey_id)
+    if run is None:
+        run = PairTestRun(survey_id=survey_id, **values)
+        db.add(run)
+    else:
+        for field, value in values.items():
+            setattr(run, field, value)
+    db.flush()
+    return run
+
+
+def analyze_stale_surveys(db: Session, workers: Optional[int] = None) -> Dict[str, PairTestRun]:
+    """Recompute the pair tests of every stale survey, committing after each one."""
+    runs = {}
+    for survey_id in stale_pair_test_survey_ids(db):
+        runs[survey_id] = analyze_survey(db, survey_id, workers)
+        db.commit()
+        logger.info(
+            f"Pair tests of survey {survey_id}: {runs[survey_id].pair_count} pairs of "
+            f"{runs[survey_id].question_count} questions in {runs[survey_id].seconds:.2f}s"
+        )
+    return runs
@@ -0,0 +1,332 @@
+"""
+Batched response writer used by the bulk ingestion mode.
+
+Rows are classified with vectorized pandas operations and written with
+multi-row inserts. A response whose key is already stored is not inserted
+again, but its value (``text``, ``response_order``) is updated when it differs,
+so an edited answer in a re-sent batch reaches the database; within a batch the
+last row of a key wins. On PostgreSQL and SQLite the unique indexes of the
+response keys do this (``INSERT ... ON CONFLICT``; on PostgreSQL from a
+``COPY``-filled staging table). Other databases compare against the keys and
+values already stored, kept in memory, and use ``executemany``.
+"""
+import io
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+import pandas as pd
+from sqlalchemy import Table, bindparam, insert, or_, select, update
+from sqlalchemy.orm import Session
+from src.models import Respondent, TextResponse, ChoiceResponse
+from src.logger import logger
+from .summary import LoadSummary
+from .upsert import DIALECT_INSERTS
+
+KEY_SEPARATOR = "\x1f"
+EXECUTEMANY_CHUNK_SIZE = 10_000
+NO_SURVEY = ""
+
+TEXT_KEY_COLUMNS = ["respondent_id", "question_id", "survey_id"]
+CHOICE_KEY_COLUMNS = ["respondent_id", "question_id", "survey_id", "answer_option_id"]
+TEXT_VALUE_COLUMNS = ["text"]
+CHOICE_VALUE_COLUMNS = ["response_order"]
+
+
+def _column(df: pd.DataFrame, name: str) -> pd.Series:
+    """Return a column of the raw frame, or an all-missing column if it is absent."""
+    if name in df.columns:
+        return df[name]
+    return pd.Series(pd.NA, index=df.index, dtype=object)
+
+
+def _clean_values(values: pd.Series) -> pd.Series:
+    """Strip cell values and mask empty and 'nan' cells."""
+    cleaned = values.astype(str).str.strip()
+    valid = values.notna() & (cleaned != "") & (cleaned.str.lower() != "nan")
+    return cleaned.where(valid)
+
+
+def _composite_key(frame: pd.DataFrame, columns: List[str]) -> pd.Series:
+    """Join key columns into a single string per row."""
+    first, *rest = columns
+    return frame[first].str.cat([frame[c] for c in rest], sep=KEY_SEPARATOR)
+
+
+def classify_rows(df: pd.DataFrame) -> Tuple[pd.Series, pd.DataFrame, pd.DataFrame]:
+    """Split a raw response frame into respondent ids, text rows and choice rows."""
+    keys = pd.DataFrame({
+        "respondent_id": df["respondent"].astype(str),
+        "question_id": df["question"].astype(str),
+        "survey_id": df["survey"].astype(str),
+    })
+    question_type = pd.to_numeric(df["type"], errors="coerce")
+
+    text = _clean_values(_column(df, "text"))
+    text_mask = (question_type == 1) & text.notna()
+    texts = keys[text_mask].assign(text=text[text_mask])
+
+    response = _clean_values(_column(df, "response"))
+    choice_mask = question_type.isin([2, 3]) & response.notna()
+    order = pd.to_numeric(_column(df, "order"), errors="coerce").fillna(1).astype(int)
+    choices = keys[choice_mask].assign(
+        answer_option_id=response[choice_mask],
+        response_order=order[choice_mask],
+    )
+
+    return keys["respondent_id"], texts, choices
+
+
+class BulkResponseWriter:
+    """Writes batches of raw response rows with multi-row inserts."""
+
+    def __init__(self, db: Session, summary: Optional[LoadSummary] = None):
+        self.db = db
+        self.summary = summary or LoadSummary()
+        dialect = db.get_bind().dialect.name
+        self.use_copy = dialect == "postgresql"
+        self.dialect_insert = DIALECT_INSERTS.get(dialect)
+        self._respondent_ids: Optional[Set[str]] = None
+        self._loaded_surveys: Set[str] = set()
+        self._text_values: Dict[str, tuple] = {}
+        self._choice_values: Dict[str, tuple] = {}
+
+    def write_batch(self, df: pd.DataFrame) -> None:
+        """Classify, deduplicate and write one batch of raw rows, then commit."""
+        respondent_ids, texts, choices = classify_rows(df)
+        texts = texts.drop_duplicates(TEXT_KEY_COLUMNS, keep="last")
+        choices = choices.drop_duplicates(CHOICE_KEY_COLUMNS, keep="last")
+
+        if self.dialect_insert is not None:
+            respondents = pd.DataFrame({"id": respondent_ids.unique()})
+            respondents_added = sum(self._insert_new(Respondent.__table__, respondents).values())
+            text_added, text_updated = self._upsert(
+                TextResponse.__table__, texts, TEXT_KEY_COLUMNS, TEXT_VALUE_COLUMNS
+            )
+            choice_added, choice_updated = self._upsert(
+                ChoiceResponse.__table__, choices, CHOICE_KEY_COLUMNS, CHOICE_VALUE_COLUMNS
+            )
+        else:
+            self._load_survey_keys(set(texts["survey_id"]) | set(choices["survey_id"]))
+            new_respondents = self._new_respondents(respondent_ids)
+            texts, changed_texts = self._split_stored(
+                texts, TEXT_KEY_COLUMNS, TEXT_VALUE_COLUMNS, self._text_values
+            )
+            choices, changed_choices = self._split_stored(
+                choices, CHOICE_KEY_COLUMNS, CHOICE_VALUE_COLUMNS, self._choice_values
+            )
+
+            self._insert(Respondent.__table__, pd.DataFrame({"id": new_respondents}))
+            self._insert(TextResponse.__table__, texts)
+            self._insert(ChoiceResponse.__table__, choices)
+            self._update(TextResponse.__table__, changed_texts, TEXT_KEY_COLUMNS, TEXT_VALUE_COLUMNS)
+            self._update(ChoiceResponse.__table__, changed_choices, CHOICE_KEY_COLUMNS, CHOICE_VALUE_COLUMNS)
+            respondents_added = len(new_respondents)
+            text_added = texts["survey_id"].value_counts().to_dict()
+            text_updated = changed_texts["survey_id"].value_counts().to_dict()
+            choice_added = choices["survey_id"].value_counts().to_dict()
+            choice_updated = changed_choices["survey_id"].value_counts().to_dict()
+        self.db.commit()
+
+        self.summary.rows += len(df)
+        self.summary.batches += 1
+        self.summary.respondents_added += respondents_added
+        self.summary.text_responses_added += sum(text_added.values())
+        self.summary.text_responses_updated += sum(text_updated.values())
+        self.summary.choice_responses_added += sum(choice_added.values())
+        self.summary.choice_responses_updated += sum(choice_updated.values())
+        for counts in (text_added, text_updated, choice_added, choice_updated):
+            self.summary.surveys_changed.update(counts)
+        logger.info(
+            f"Committed {self.summary.rows} rows "
+            f"({self.summary.rows_per_second:,.0f} rows/s)..."
+        )
+
+    def _new_respondents(self, respondent_ids: pd.Series) -> List[str]:
+        """Return respondent ids of the batch that are not stored yet."""
+        if self._respondent_ids is None:
+            self._respondent_ids = set(self.db.scalars(select(Respondent.id)))
+
+        new_ids = [rid for rid in respondent_ids.unique() if rid not in self._respondent_ids]
+        self._respondent_ids.update(new_ids)
+        return new_ids
+
+    def _load_survey_keys(self, survey_ids: Set[str]) -> None:
+        """Fetch keys and values of responses already stored for surveys seen for the first time."""
+        for survey_id in sorted(survey_ids - self._loaded_surveys):
+            for model, key_columns, value_columns, stored in (
+                (TextResponse, TEXT_KEY_COLUMNS, TEXT_VALUE_COLUMNS, self._text_values),
+                (ChoiceResponse, CHOICE_KEY_COLUMNS, CHOICE_VALUE_COLUMNS, self._choice_values),
+            ):
+                table = model.__table__
+                rows = self.db.execute(
+                    select(*[table.c[c] for c in key_columns + value_columns])
+                    .where(table.c.survey_id == survey_id)
+                )
+                size = len(key_columns)
+                stored.update((KEY_SEPARATOR.join(row[:size]), tuple(row[size:])) for row in rows)
+
+            self._loaded_surveys.add(survey_id)
+
+    @staticmethod
+    def _split_stored(
+        frame: pd.DataFrame, key_columns: List[str], value_columns: List[str], stored: Dict[str, tuple]
+    ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Split rows into those whose key is not stored and those whose stored value differs."""
+        if frame.empty:
+            return frame, frame
+
+        keys = _composite_key(frame, key_columns)
+        values = list(zip(*(frame[c].tolist() for c in value_columns)))
+        previous = [stored.get(key) for key in keys]
+        new = np.fromiter((value is None for value in previous), dtype=bool, count=len(keys))
+        changed = np.fromiter(
+            (old is not None and old != value for old, value in zip(previous, values)),
+            dtype=bool,
+            count=len(keys),
+        )
+        stored.update(zip(keys, values))
+        return frame[new], frame[changed]
+
+    def _insert(self, table: Table, frame: pd.DataFrame) -> None:
+        """Insert all rows of the frame into the table."""
+        if frame.empty:
+            return
+
+        if self.use_copy:
+            self._copy(table, frame)
+            return
+
+        records = frame.to_dict("records")
+        for start in range(0, len(records), EXECUTEMANY_CHUNK_SIZE):
+            self.db.execute(insert(table), records[start:start + EXECUTEMANY_CHUNK_SIZE])
+
+    def _copy(self, table: Table, frame: pd.DataFrame, target: Optional[str] = None) -> None:
+        """Stream the frame into the table (or ``target``) with PostgreSQL ``COPY ... FROM STDIN``."""
+        buffer = io.StringIO()
+        frame.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+
+        columns = ", ".join(frame.columns)
+        cursor = self.db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {target or table.name} ({columns}) FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+        finally:
+            cursor.close()
+
+    def _update(self, table: Table, frame: pd.DataFrame, key_columns: List[str], value_columns: List[str]) -> None:
+        """Set the value columns of the stored rows with the keys of the frame."""
+        if frame.empty:
+            return
+
+        stmt = (
+            update(table)
+            .where(*[table.c[c] == bindparam(f"key_{c}") for c in key_columns])
+            .values({c: bindparam(f"value_{c}") for c in value_columns})
+        )
+        records = frame[key_columns + value_columns].rename(
+            columns={**{c: f"key_{c}" for c in key_columns}, **{c: f"value_{c}" for c in value_columns}}
+        ).to_dict("records")
+        for start in range(0, len(records), EXECUTEMANY_CHUNK_SIZE):
+            self.db.execute(stmt, records[start:start + EXECUTEMANY_CHUNK_SIZE])
+
+    def _execute_counted(self, stmt, frame: pd.DataFrame, per_survey: bool = True) -> Dict[str, int]:
+        """Execute the statement for every row of the frame; count the returned rows per survey.
+
+        The statement returns one column, ``survey_id`` when ``per_survey`` is set;
+        otherwise every row is counted under ``NO_SURVEY``.
+        """
+        records = frame.to_dict("records")
+        counts: Dict[str, int] = {}
+        for start in range(0, len(records), EXECUTEMANY_CHUNK_SIZE):
+            for (value,) in self.db.execute(stmt, records[start:start + EXECUTEMANY_CHUNK_SIZE]):
+                key = value if per_survey else NO_SURVEY
+                counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    def _insert_new(self, table: Table, frame: pd.DataFrame) -> Dict[str, int]:
+        """Insert the rows whose key is not stored yet; return the number inserted per survey.
+
+        Tables without ``survey_id`` (respondents) are counted under ``NO_SURVEY``.
+        """
+        if frame.empty:
+            return {}
+
+        if self.use_copy:
+            return self._copy_new(table, frame)
+
+        per_survey = "survey_id" in table.c
+        counted = table.c.survey_id if per_survey else table.c.id
+        stmt = self.dialect_insert(table).on_conflict_do_nothing().returning(counted)
+        return self._execute_counted(stmt, frame, per_survey)
+
+    def _upsert(
+        self, table: Table, frame: pd.DataFrame, key_columns: List[str], value_columns: List[str]
+    ) -> Tuple[Dict[str, int], Dict[str, int]]:
+        """Insert new rows and update the differing values of stored ones; return both counts per survey."""
+        if frame.empty:
+            return {}, {}
+
+        if self.use_copy:
+            return self._copy_upsert(table, frame, key_columns, value_columns)
+
+        added = self._insert_new(table, frame)
+        if sum(added.values()) == len(frame):
+            return added, {}
+
+        # Every row of the frame is stored now: the conflict branch updates those whose value differs.
+        stmt = self.dialect_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={c: stmt.excluded[c] for c in value_columns},
+            where=or_(*[table.c[c].is_distinct_from(stmt.excluded[c]) for c in value_columns]),
+        ).returning(table.c.survey_id)
+        return added, self._execute_counted(stmt, frame)
+
+    def _stage(self, table: Table, frame: pd.DataFrame) -> str:
+        """``COPY`` the frame into an emptied temporary table shaped like ``table``; return its name."""
+        staging = table.name + "_staging"
+        columns = ", ".join(frame.columns)
+        connection = self.db.connection()
+        connection.exec_driver_sql(
+            f"CREATE TEMP TABLE IF NOT EXISTS {staging} AS SELECT {columns} FROM {table.name} WITH NO DATA"
+        )
+        connection.exec_driver_sql(f"TRUNCATE {staging}")
+        self._copy(table, frame, target=staging)
+        return staging
+
+    def _count_returned(self, sql: str) -> Dict[str, int]:
+        """Run a data-modifying statement returning ``survey_id`` and count its rows per survey."""
+        rows = self.db.connection().exec_driver_sql(
+            f"WITH changed AS ({sql}) SELECT survey_id, count(*) FROM changed GROUP BY survey_id"
+        )
+        return {survey_id: count for survey_id, count in rows}
+
+    def _copy_new(self, table: Table, frame: pd.DataFrame, staging: Optional[str] = None) -> Dict[str, int]:
+        """``COPY`` the frame into a staging table and move the new rows with ``ON CONFLICT DO NOTHING``."""
+        staging = staging or self._stage(table, frame)
+        columns = ", ".join(frame.columns)
+        counted = "survey_id" if "survey_id" in table.c else f"'{NO_SURVEY}'"
+        return self._count_returned(
+            f"INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {staging} "
+            f"ON CONFLICT DO NOTHING RETURNING {counted} AS survey_id"
+        )
+
+    def _copy_upsert(
+        self, table: Table, frame: pd.DataFrame, key_columns: List[str], value_columns: List[str]
+    ) -> Tuple[Dict[str, int], Dict[str, int]]:
+        """Staged variant of :meth:`_upsert`: insert the new rows, then update the differing stored ones."""
+        staging = self._stage(table, frame)
+        added = self._copy_new(table, frame, staging)
+        if sum(added.values()) == len(frame):
+            return added, {}
+
+        assignments = ", ".join(f"{c} = s.{c}" for c in value_columns)
+        matches = " AND ".join(f"t.{c} = s.{c}" for c in key_columns)
+        differs = " OR ".join(f"t.{c} IS DISTINCT FROM s.{c}" for c in value_columns)
+        updated = self._count_returned(
+            f"UPDATE {table.name} AS t SET {assignments} FROM {staging} AS s "
+            f"WHERE {matches} AND ({differs}) RETURNING t.survey_id"
+        )
+        return added, updated
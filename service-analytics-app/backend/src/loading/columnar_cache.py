@@ -0,0 +1,86 @@
+"""
+Columnar (Arrow IPC) cache of the raw responses workbook.
+
+The workbook is converted once into ``<stem>-<hash>.arrow`` keyed by the
+SHA-256 of the source file; later loads read the cache memory-mapped instead
+of parsing the workbook again. Cells are stored in their string form, which
+is what the bulk writer works with anyway.
+"""
+import os
+from pathlib import Path
+from typing import Iterator
+import pandas as pd
+import pyarrow as pa
+from src.logger import logger
+from .excel_reader import iter_excel_batches
+
+
+def _to_record_batch(df: pd.DataFrame, schema: pa.Schema) -> pa.RecordBatch:
+    """Convert a raw frame into a batch of nullable string columns."""
+    columns = [
+        pa.array([None if pd.isna(value) else str(value) for value in df[name]], type=pa.string())
+        for name in schema.names
+    ]
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+class ColumnarCache:
+    """Arrow IPC files of converted workbooks stored in one directory."""
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = Path(cache_dir)
+
+    def path_for(self, excel_path: Path, source_hash: str) -> Path:
+        return self.cache_dir / f"{excel_path.stem}-{source_hash[:16]}.arrow"
+
+    def ensure(self, excel_path: Path, source_hash: str, rebuild: bool = False) -> Path:
+        """Return the cache file of the workbook, converting it first if needed."""
+        cache_path = self.path_for(excel_path, source_hash)
+        if rebuild or not cache_path.exists():
+            self.build(excel_path, cache_path)
+        else:
+            logger.info(f"Using columnar cache {cache_path}")
+        return cache_path
+
+    def build(self, excel_path: Path, cache_path: Path, batch_size: int = 50_000) -> None:
+        """Convert the workbook batch by batch and atomically replace older caches."""
+        logger.info(f"Building columnar cache {cache_path} from {excel_path.name}...")
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix(".arrow.tmp")
+
+        rows = 0
+        writer = None
+        try:
+            for batch in iter_excel_batches(excel_path, batch_size):
+                if writer is None:
+                    schema = pa.schema([(str(name), pa.string()) for name in batch.columns])
+                    writer = pa.ipc.new_file(str(tmp_path), schema)
+                writer.write_batch(_to_record_batch(batch, schema))
+                rows += len(batch)
+        finally:
+            if writer is not None:
+                writer.close()
+
+        if writer is None:
+            raise ValueError(f"{excel_path} has no header row")
+
+        os.replace(tmp_path, cache_path)
+        for stale in self.cache_dir.glob(f"{excel_path.stem}-*.arrow"):
+            if stale != cache_path:
+                stale.unlink()
+        logger.info(f"Columnar cache built: {rows} rows")
+
+
+def iter_cache_batches(cache_path: Path, batch_size: int) -> Iterator[pd.DataFrame]:
+    """Yield the cached rows as frames of at most ``batch_size`` rows.
+
+    The file is memory-mapped, so slicing is zero-copy and only the frame of
+    the current batch is materialized.
+    """
+    if batch_size <= 0:
+        raise ValueError("batch_size must be positive")
+
+    with pa.memory_map(str(cache_path), "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+        for offset in range(0, table.num_rows, batch_size):
+            yield table.slice(offset, batch_size).to_pandas()
@@ -0,0 +1,43 @@
+"""
+Constant-memory reader for the responses workbook.
+"""
+from pathlib import Path
+from typing import Iterator, List
+import pandas as pd
+from openpyxl import load_workbook
+
+
+def iter_excel_batches(excel_path: Path, batch_size: int) -> Iterator[pd.DataFrame]:
+    """Yield the first sheet of the workbook as frames of at most ``batch_size`` rows.
+
+    The workbook is opened in openpyxl read-only mode, so only the current batch
+    is held in memory. Cells keep their Python values (``dtype=object``) instead
+    of being coerced per column, which matches what the writer expects.
+    """
+    if batch_size <= 0:
+        raise ValueError("batch_size must be positive")
+
+    workbook = load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(name) if name is not None else "" for name in header]
+        width = len(columns)
+
+        batch: List[tuple] = []
+        for row in rows:
+            if not any(value is not None for value in row):
+                continue
+            if len(row) != width:
+                row = (tuple(row) + (None,) * width)[:width]
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield pd.DataFrame(batch, columns=columns, dtype=object)
+                batch = []
+
+        if batch:
+            yield pd.DataFrame(batch, columns=columns, dtype=object)
+    finally:
+        workbook.close()
@@ -0,0 +1,44 @@
+"""
+Per-survey data generation counters.
+
+Every load that changes a survey's structure or responses increments its
+generation; readers compare generations to tell whether derived results
+(cached responses) are still current.
+"""
+from datetime import datetime
+from typing import Dict, Iterable
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+from src.models import DataGeneration
+
+
+def bump_generations(db: Session, survey_ids: Iterable[str]) -> Dict[str, int]:
+    """Increment the generation of each survey in the current transaction.
+
+    Returns the new generation of every bumped survey.
+    """
+    survey_ids = sorted(set(survey_ids))
+    if not survey_ids:
+        return {}
+
+    now = datetime.utcnow()
+    existing = set(db.scalars(
+        select(DataGeneration.survey_id).where(DataGeneration.survey_id.in_(survey_ids))
+    ))
+    if existing:
+        db.execute(
+            update(DataGeneration)
+            .where(DataGeneration.survey_id.in_(existing))
+            .values(generation=DataGeneration.generation + 1, updated_at=now)
+        )
+    missing = [survey_id for survey_id in survey_ids if survey_id not in existing]
+    if missing:
+        db.execute(
+            insert(DataGeneration),
+            [{"survey_id": survey_id, "generation": 1, "updated_at": now} for survey_id in missing],
+        )
+
+    return dict(db.execute(
+        select(DataGeneration.survey_id, DataGeneration.generation)
+        .where(DataGeneration.survey_id.in_(survey_ids))
+    ).all())
@@ -0,0 +1,70 @@
+"""
+Content manifest used to skip inputs that did not change since the last load.
+
+Entries are keyed by input (``xml:QS0001.xml``, ``excel:responses.xlsx``) or by
+row batch of an input (``excel:responses.xlsx:batch:3``) and store the SHA-256
+of the content that was applied.
+"""
+import hashlib
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from src.models import LoadManifestEntry
+from .upsert import upsert_rows
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path: Path) -> str:
+    """SHA-256 of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def frame_sha256(df: pd.DataFrame) -> str:
+    """SHA-256 of a row batch, computed over the string form of its cells.
+
+    Hashing strings keeps the value stable whether the batch was read from the
+    workbook or from the columnar cache.
+    """
+    digest = hashlib.sha256()
+    digest.update("\x1f".join(map(str, df.columns)).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(df.astype(str), index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class LoadManifest:
+    """Stored content hashes of previously applied inputs."""
+
+    def __init__(self, db: Session, enabled: bool = True):
+        self.db = db
+        self.enabled = enabled
+        self._hashes: Dict[str, str] = dict(
+            db.execute(select(LoadManifestEntry.key, LoadManifestEntry.content_hash)).all()
+        )
+
+    def is_current(self, key: str, content_hash: str) -> bool:
+        """Whether the content stored under ``key`` was already applied."""
+        return self.enabled and self._hashes.get(key) == content_hash
+
+    def record(self, key: str, content_hash: str, row_count: Optional[int] = None) -> None:
+        """Store the hash in the current transaction; it is committed with the data."""
+        upsert_rows(
+            self.db,
+            LoadManifestEntry,
+            [{
+                "key": key,
+                "content_hash": content_hash,
+                "row_count": row_count,
+                "loaded_at": datetime.utcnow(),
+            }],
+            ["key"],
+            ["content_hash", "row_count", "loaded_at"],
+        )
+        self._hashes[key] = content_hash
@@ -0,0 +1,94 @@
+"""
+Materialized per-respondent response rows.
+
+The last load stage denormalizes the responses of every stale survey into
+``respondent_rows``: one row per respondent holding a JSON object of its
+answered cells, with MULTIPLE codes already ordered and deduplicated. The
+survey's ``response_materializations`` entry records the data generation the
+rows were built from; readers only use the rows while it is current.
+"""
+from datetime import datetime
+from typing import Dict, List
+import orjson
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+from src.models import DataGeneration, Question, RespondentRow, ResponseMaterialization, Survey
+from src.services.response_service import ResponseService
+from src.settings import settings
+
+
+def stale_survey_ids(db: Session) -> List[str]:
+    """Surveys whose materialized rows are missing or built from an older data generation."""
+    current_generation = func.coalesce(DataGeneration.generation, 0)
+    return list(db.scalars(
+        select(Survey.id)
+        .outerjoin(DataGeneration, DataGeneration.survey_id == Survey.id)
+        .outerjoin(ResponseMaterialization, ResponseMaterialization.survey_id == Survey.id)
+        .where(
+            ResponseMaterialization.survey_id.is_(None)
+            | (ResponseMaterialization.generation != current_generation)
+        )
+        .order_by(Survey.id)
+    ))
+
+
+def materialize_survey(db: Session, survey_id: str) -> int:
+    """Rebuild the respondent rows of a survey at its current data generation.
+
+    Returns the number of respondents written.
+    """
+    generation = db.scalar(
+        select(DataGeneration.generation).where(DataGeneration.survey_id == survey_id)
+    ) or 0
+    questions = db.query(Question).filter(Question.survey_id == survey_id).all()
+    matrix = ResponseService(db).assemble_matrix(questions)
+
+    names = [q.name for q in matrix.questions]
+    columns = [matrix.columns[name] for name in names]
+    db.execute(delete(RespondentRow).where(RespondentRow.survey_id == survey_id))
+
+    batch_size = settings.LOAD_BATCH_SIZE
+    batch = []
+    for position, respondent_id in enumerate(matrix.respondent_ids):
+        cells = {
+            name: column[position]
+            for name, column in zip(names, columns) if column[position] is not None
+        }
+        batch.append({
+            "survey_id": survey_id,
+            "respondent_id": respondent_id,
+            "position": position,
+            "cells": orjson.dumps(cells).decode("utf-8"),
+        })
+        if len(batch) >= batch_size:
+            db.execute(insert(RespondentRow), batch)
+            batch = []
+    if batch:
+        db.execute(insert(RespondentRow), batch)
+
+    values = {
+        "generation": generation,
+        "question_count": len(questions),
+        "respondent_count": len(matrix),
+        "built_at": datetime.utcnow(),
+    }
+    materialization = db.get(ResponseMaterialization, survey_id)
+    if materialization is None:
+        db.add(ResponseMaterialization(survey_id=survey_id, **values))
+    else:
+        for field, value in values.items():
+            setattr(materialization, field, value)
+    db.flush()
+    return len(matrix)
+
+
+def materialize_stale_surveys(db: Session) -> Dict[str, int]:
+    """Rebuild the respondent rows of every stale survey, committing after each one.
+
+    Returns the number of respondents written per rebuilt survey.
+    """
+    written = {}
+    for survey_id in stale_survey_ids(db):
+        written[survey_id] = materialize_survey(db, survey_id)
+        db.commit()
+    return written
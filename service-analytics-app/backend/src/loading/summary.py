@@ -0,0 +1,78 @@
+"""
+Counters collected while loading responses.
+"""
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Set
+from src.logger import logger
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+
+def peak_memory_mb() -> float:
+    """Peak resident set size of the current process in megabytes."""
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+@dataclass
+class LoadSummary:
+    """Row counts and throughput of a single response load."""
+
+    rows: int = 0
+    respondents_added: int = 0
+    text_responses_added: int = 0
+    choice_responses_added: int = 0
+    text_responses_updated: int = 0
+    choice_responses_updated: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+    finished_at: float = 0.0
+    batches: int = 0
+    batches_skipped: int = 0
+    rows_skipped: int = 0
+    peak_memory_mb: float = 0.0
+    surveys_changed: Set[str] = field(default_factory=set)
+
+    @property
+    def responses_added(self) -> int:
+        return self.text_responses_added + self.choice_responses_added
+
+    @property
+    def responses_updated(self) -> int:
+        return self.text_responses_updated + self.choice_responses_updated
+
+    @property
+    def elapsed(self) -> float:
+        end = self.finished_at or time.perf_counter()
+        return end - self.started_at
+
+    @property
+    def rows_per_second(self) -> float:
+        elapsed = self.elapsed
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+    def finish(self) -> None:
+        self.finished_at = time.perf_counter()
+        self.peak_memory_mb = peak_memory_mb()
+
+    def log(self) -> None:
+        """Write the summary to the log."""
+        logger.info(f"\n=== Loading Summary ===")
+        logger.info(f"Total rows in Excel: {self.rows + self.rows_skipped}")
+        logger.info(f"Unique respondents created: {self.respondents_added}")
+        logger.info(f"Text responses added: {self.text_responses_added}")
+        logger.info(f"Choice responses added: {self.choice_responses_added}")
+        logger.info(f"Total responses added: {self.responses_added}")
+        logger.info(f"Responses updated (changed answer or order): {self.responses_updated}")
+        logger.info(f"Batches written: {self.batches}")
+        logger.info(f"Batches skipped (unchanged): {self.batches_skipped} ({self.rows_skipped} rows)")
+        logger.info(f"Elapsed: {self.elapsed:.2f}s ({self.rows_per_second:,.0f} rows/s)")
+        logger.info(f"Peak memory: {self.peak_memory_mb:.1f} MB")
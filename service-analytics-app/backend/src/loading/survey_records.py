@@ -0,0 +1,115 @@
+"""
+Survey definition XML parsed into plain question and answer option records.
+
+Parsing does not touch the database, so files can be parsed in a process pool
+while a single writer upserts the resulting records.
+"""
+import os
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from sqlalchemy.orm import Session
+from src.models import Survey, Question, QuestionType, AnswerOption
+from .upsert import upsert_rows
+
+QUESTION_TYPE_MAP = {1: QuestionType.TEXT, 2: QuestionType.SINGLE, 3: QuestionType.MULTIPLE}
+
+
+class SurveyRecords(NamedTuple):
+    """Rows of one survey ready to be upserted."""
+
+    survey_id: str
+    questions: List[Dict[str, Any]]
+    answer_options: List[Dict[str, Any]]
+
+
+def _index_survey_xml(xml_path: Path) -> Tuple[List[ET.Element], Dict[str, List[ET.Element]]]:
+    """Collect question elements and a categories-by-question-id index in one pass.
+
+    Only ``question`` children of the first ``questions`` element are taken, and
+    the first ``categories`` element wins for a repeated id, which mirrors the
+    ``find`` lookups of the original parser.
+    """
+    question_elems: List[ET.Element] = []
+    categories_by_id: Dict[str, List[ET.Element]] = {}
+    questions_elem: Optional[ET.Element] = None
+    stack: List[ET.Element] = []
+
+    for event, elem in ET.iterparse(xml_path, events=("start", "end")):
+        if event == "start":
+            if elem.tag == "questions" and questions_elem is None and stack:
+                questions_elem = elem
+            stack.append(elem)
+            continue
+
+        stack.pop()
+        if elem.tag == "question" and stack and stack[-1] is questions_elem:
+            question_elems.append(elem)
+        elif elem.tag == "categories" and stack:
+            categories_id = elem.get("id")
+            if categories_id not in categories_by_id:
+                categories_by_id[categories_id] = elem.findall("category")
+            elem.clear()
+
+    return question_elems, categories_by_id
+
+
+def read_survey_records(xml_path: Path, survey_id: Optional[str] = None) -> SurveyRecords:
+    """Parse a survey XML file into question and answer option rows.
+
+    Repeated question or option ids keep the first ``survey_id``/``question_id``
+    and the last name, text, code and label, like consecutive upserts would.
+    """
+    survey_id = survey_id or Path(xml_path).stem
+    question_elems, categories_by_id = _index_survey_xml(xml_path)
+
+    questions: Dict[str, Dict[str, Any]] = {}
+    answer_options: Dict[str, Dict[str, Any]] = {}
+
+    for question_elem in question_elems:
+        question_id = question_elem.get("id")
+        question_type = int(question_elem.get("type"))
+        name_elem = question_elem.find("name")
+        text_elem = question_elem.find("text")
+
+        question = questions.setdefault(question_id, {"id": question_id, "survey_id": survey_id})
+        question["name"] = name_elem.text if name_elem is not None else ""
+        question["text"] = text_elem.text if text_elem is not None else ""
+        question["type"] = QUESTION_TYPE_MAP.get(question_type, QuestionType.TEXT)
+
+        if question_type in [2, 3]:
+            for category_elem in categories_by_id.get(question_id, []):
+                option_id = category_elem.get("id")
+                option = answer_options.setdefault(
+                    option_id, {"id": option_id, "question_id": question_id}
+                )
+                option["code"] = int(category_elem.get("code"))
+                option["label"] = category_elem.text if category_elem.text else ""
+
+    return SurveyRecords(survey_id, list(questions.values()), list(answer_options.values()))
+
+
+def iter_survey_records(xml_files: Sequence[Path], workers: int = 1) -> Iterator[SurveyRecords]:
+    """Parse survey files, in a process pool when ``workers`` > 1, in input order."""
+    if workers <= 1 or len(xml_files) <= 1:
+        yield from map(read_survey_records, xml_files)
+        return
+
+    chunksize = max(1, len(xml_files) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(read_survey_records, xml_files, chunksize=chunksize)
+
+
+def write_survey_records(db: Session, records: SurveyRecords) -> None:
+    """Upsert the survey, its questions and answer options with bulk statements."""
+    upsert_rows(db, Survey, [{"id": records.survey_id}], ["id"])
+    upsert_rows(db, Question, records.questions, ["id"], ["name", "text", "type"])
+    upsert_rows(db, AnswerOption, records.answer_options, ["id"], ["code", "label"])
+
+
+def resolve_workers(workers: Optional[int]) -> int:
+    """Translate a configured worker count (0 or None means one per CPU)."""
+    if not workers:
+        return os.cpu_count() or 1
+    return max(1, workers)
@@ -0,0 +1,65 @@
+"""
+Dialect-aware bulk upsert helper.
+"""
+from typing import Any, Dict, List, Sequence
+from sqlalchemy import insert, select, update, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+UPSERT_CHUNK_SIZE = 5_000
+
+DIALECT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def upsert_rows(
+    db: Session,
+    model: Any,
+    rows: List[Dict[str, Any]],
+    index_elements: Sequence[str],
+    update_columns: Sequence[str] = ()
+) -> None:
+    """Insert rows, updating ``update_columns`` of rows whose key already exists.
+
+    PostgreSQL and SQLite use ``INSERT ... ON CONFLICT``; other backends fall
+    back to one key lookup per chunk followed by bulk insert and bulk update,
+    which requires ``index_elements`` to be the primary key.
+    """
+    if not rows:
+        return
+
+    table = model.__table__
+    dialect_insert = DIALECT_INSERTS.get(db.get_bind().dialect.name)
+
+    for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        chunk = rows[start:start + UPSERT_CHUNK_SIZE]
+
+        if dialect_insert is not None:
+            stmt = dialect_insert(table)
+            if update_columns:
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=list(index_elements),
+                    set_={column: stmt.excluded[column] for column in update_columns},
+                )
+            else:
+                stmt = stmt.on_conflict_do_nothing(index_elements=list(index_elements))
+            db.execute(stmt, chunk)
+            continue
+
+        key_columns = [table.c[name] for name in index_elements]
+        chunk_keys = [tuple(row[name] for name in index_elements) for row in chunk]
+        existing = set(db.execute(select(*key_columns).where(tuple_(*key_columns).in_(chunk_keys))))
+
+        new_rows = [row for row, key in zip(chunk, chunk_keys) if key not in existing]
+        if new_rows:
+            db.execute(insert(table), new_rows)
+
+        if update_columns:
+            changed_rows = [
+                {name: row[name] for name in (*index_elements, *update_columns)}
+                for row, key in zip(chunk, chunk_keys) if key in existing
+            ]
+            if changed_rows:
+                db.execute(update(model), changed_rows)
@@ -1,17 +1,34 @@
-"""Модуль для настройки логирования"""
+"""Модуль для настройки логирования
+
+Обработчик логгера только кладёт запись в очередь (``QueueHandler``): сообщение
+форматируется и пишется в stdout в фоновом потоке ``QueueListener``. Сообщения
+передаются с аргументами (``logger.debug("Found %d rows", n)``) и собираются
+только для записей, которые будут записаны. Для отдельных логгеров можно задать
+долю сохраняемых записей (``LOG_SAMPLE_RATES``) и ограничение частоты
+(``LOG_RATE_LIMITS``).
+"""
+import atexit
 import logging
+import os
+import queue
+import random
 import sys
 import json
+import threading
+import time
 from datetime import datetime
-from typing import Any, Dict
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Mapping, Optional, Tuple
 from .settings import settings
 
+APP_LOGGER_NAME = "notification_service"
+
 
 class JsonFormatter(logging.Formatter):
     """JSON форматтер для логов"""
     def format(self, record: logging.LogRecord) -> str:
         log_object: Dict[str, Any] = {
-            "timestamp": datetime.now().isoformat() + "Z",
+            "timestamp": datetime.fromtimestamp(record.created).isoformat() + "Z",
             "level": record.levelname,
             "message": record.getMessage(),
             "logger": record.name,
@@ -23,6 +40,9 @@ class JsonFormatter(logging.Formatter):
         if hasattr(record, "extra"):
             log_object.update(record.extra)
 
+        if getattr(record, "suppressed", 0):
+            log_object["suppressed"] = record.suppressed
+
         if record.exc_info:
             log_object["exception"] = self.formatException(record.exc_info)
 
@@ -32,22 +52,142 @@ class JsonFormatter(logging.Formatter):
 class TextFormatter(logging.Formatter):
     """Текстовый форматтер для логов"""
     def format(self, record: logging.LogRecord) -> str:
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-settings.MILLISECONDS_TO_TRIM]
+        timestamp = datetime.fromtimestamp(record.created).strftime(
+            "%Y-%m-%d %H:%M:%S.%f"
+        )[:-settings.MILLISECONDS_TO_TRIM]
         level = record.levelname
         message = record.getMessage()
         logger_name = record.name
 
         log_message = f"{timestamp} [{level}] {logger_name}: {message}"
 
+        if getattr(record, "suppressed", 0):
+            log_message += f" (пропущено записей: {record.suppressed})"
+
         if record.exc_info:
             log_message += f"\n{self.formatException(record.exc_info)}"
 
         return log_message
 
 
+class LoggerRules:
+    """Значения настроек по имени логгера; дочерние логгеры наследуют значение родителя"""
+    def __init__(self, values: Mapping[str, float]):
+        self.values = dict(values)
+        self.resolved: Dict[str, Optional[float]] = {}
+
+    def get(self, name: str) -> Optional[float]:
+        if name not in self.resolved:
+            key = name
+            while key not in self.values and "." in key:
+                key = key.rsplit(".", 1)[0]
+            self.resolved[name] = self.values.get(key)
+        return self.resolved[name]
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает заданную долю записей ниже WARNING; WARNING и выше пишутся всегда"""
+    def __init__(self, rates: Mapping[str, float]):
+        super().__init__()
+        self.rates = LoggerRules(rates)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(record.name)
+        return rate is None or random.random() < rate
+
+
+class RateLimitFilter(logging.Filter):
+    """Не больше заданного числа записей в секунду на логгер (token bucket).
+
+    Число отброшенных записей добавляется к следующей записанной записи логгера
+    (поле ``suppressed``).
+    """
+    def __init__(self, limits: Mapping[str, float]):
+        super().__init__()
+        self.limits = LoggerRules(limits)
+        self.buckets: Dict[str, Tuple[float, float, int]] = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        limit = self.limits.get(record.name)
+        if limit is None:
+            return True
+        now = time.monotonic()
+        with self.lock:
+            tokens, updated, suppressed = self.buckets.get(record.name, (max(limit, 1.0), now, 0))
+            tokens = min(max(limit, 1.0), tokens + (now - updated) * limit)
+            if tokens < 1:
+                self.buckets[record.name] = (tokens, now, suppressed + 1)
+                return False
+            self.buckets[record.name] = (tokens - 1, now, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class BackgroundQueueHandler(QueueHandler):
+    """Кладёт записи в очередь фонового потока, не форматируя их.
+
+    Записи уходят в очередь как есть, поэтому аргументы сообщения не должны
+    изменяться после вызова логгера. При переполнении очереди записи
+    отбрасываются (счётчик ``dropped``). После остановки фонового потока и в
+    процессе, порождённом через fork, записи пишутся синхронно.
+    """
+    def __init__(self, record_queue: queue.Queue, target: logging.Handler):
+        super().__init__(record_queue)
+        self.target = target
+        self.pid = os.getpid()
+        self.synchronous = False
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.synchronous or os.getpid() != self.pid:
+            self.target.handle(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: Optional[QueueListener] = None
+
+
+def stop_logging() -> None:
+    """Дописать записи из очереди и остановить фоновый поток"""
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    listener.stop()
+    for handler in logging.getLogger(APP_LOGGER_NAME).handlers:
+        if not isinstance(handler, BackgroundQueueHandler):
+            continue
+        handler.synchronous = True
+        if handler.dropped:
+            handler.target.handle(logging.makeLogRecord({
+                "name": APP_LOGGER_NAME,
+                "levelno": logging.WARNING,
+                "levelname": "WARNING",
+                "msg": "Log queue overflow: %d records dropped",
+                "args": (handler.dropped,),
+            }))
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Дочерний логгер приложения (``notification_service.<name>``) для настроек по логгерам"""
+    return logging.getLogger(f"{APP_LOGGER_NAME}.{name}")
+
+
 def setup_logger() -> logging.Logger:
     """Настройка логгера приложения"""
-    logger = logging.getLogger("notification_service")
+    global _listener
+    logger = logging.getLogger(APP_LOGGER_NAME)
 
     log_level = getattr(logging, settings.LOG_LEVEL.upper())
     logger.setLevel(log_level)
@@ -63,7 +203,20 @@ def setup_logger() -> logging.Logger:
         )
 
     handler.setFormatter(formatter)
-    logger.addHandler(handler)
+
+    if settings.LOG_QUEUE_ENABLED:
+        logger_handler: logging.Handler = BackgroundQueueHandler(queue.Queue(settings.LOG_QUEUE_SIZE), handler)
+        _listener = QueueListener(logger_handler.queue, handler)
+        _listener.start()
+        atexit.register(stop_logging)
+    else:
+        logger_handler = handler
+
+    if settings.LOG_SAMPLE_RATES:
+        logger_handler.addFilter(SamplingFilter(settings.LOG_SAMPLE_RATES))
+    if settings.LOG_RATE_LIMITS:
+        logger_handler.addFilter(RateLimitFilter(settings.LOG_RATE_LIMITS))
+    logger.addHandler(logger_handler)
 
     logging.getLogger("uvicorn").handlers = []
     logging.getLogger("uvicorn.access").handlers = []
@@ -4,8 +4,12 @@ FastAPI application main file.
 import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .routers import surveys, answer_options
-from .models import Base, engine
+from sqlalchemy.engine import Engine
+from .routers import surveys, answer_options, cache, metrics
+from .models import engine, dispose_async_engine, upgrade_database
+from .services.concurrency import configure_concurrency
+from .services.metrics import MetricsMiddleware, instrument_engine
+from .settings import settings
 
 app = FastAPI(
     title="Survey Analytics API",
@@ -28,16 +32,35 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+
+# Every engine, including the async one created on first use, counts the queries of requests.
+instrument_engine(Engine)
 
 
 @app.on_event("startup")
 def on_startup() -> None:
-    """Ensure database tables exist on startup."""
-    Base.metadata.create_all(bind=engine)
+    """Bring the database schema to the latest migration on startup."""
+    if settings.DB_MIGRATE_ON_STARTUP:
+        upgrade_database(engine)
+
+
+@app.on_event("startup")
+async def configure_limits() -> None:
+    """Apply the thread pool and response concurrency limits."""
+    configure_concurrency()
+
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    """Close the async database connections."""
+    await dispose_async_engine()
 
 
 app.include_router(surveys.router)
 app.include_router(answer_options.router)
+app.include_router(cache.router)
+app.include_router(metrics.router)
 
 
 @app.get("/")
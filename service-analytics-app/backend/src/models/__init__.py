@@ -1,15 +1,26 @@
-from .base import Base, engine, get_db, SessionLocal
+from .base import Base, engine, get_db, SessionLocal, get_async_db, get_async_engine, dispose_async_engine
 from .survey import Survey
 from .question import Question, QuestionType
 from .respondent import Respondent
 from .answer_option import AnswerOption
 from .response import TextResponse, ChoiceResponse
+from .load_manifest import LoadManifestEntry
+from .data_generation import DataGeneration
+from .respondent_row import RespondentRow
+from .response_materialization import ResponseMaterialization
+from .question_pair_test import QuestionPairTest
+from .pair_test_run import PairTestRun
+from .text_search import TEXT_SEARCH_TABLE, ensure_text_search_index, ts_config
+from .migrations import upgrade_database
 
 __all__ = [
     "Base",
     "engine",
     "get_db",
     "SessionLocal",
+    "get_async_db",
+    "get_async_engine",
+    "dispose_async_engine",
     "Survey",
     "Question",
     "Respondent",
@@ -17,4 +28,14 @@ __all__ = [
     "TextResponse",
     "ChoiceResponse",
     "QuestionType",
+    "LoadManifestEntry",
+    "DataGeneration",
+    "RespondentRow",
+    "ResponseMaterialization",
+    "QuestionPairTest",
+    "PairTestRun",
+    "TEXT_SEARCH_TABLE",
+    "ensure_text_search_index",
+    "ts_config",
+    "upgrade_database",
 ]
@@ -1,8 +1,11 @@
 from sqlalchemy import create_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
-from typing import Generator
+from typing import AsyncGenerator, Generator, Optional
+from src.settings import settings
 
 DATABASE_URL = os.getenv(
     "DATABASE_URL",
@@ -14,6 +17,49 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def async_database_url(url: str) -> str:
+    """URL of the same database for the async driver (asyncpg for PostgreSQL, aiosqlite for SQLite)."""
+    scheme, separator, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + separator + rest
+
+
+_async_engine: Optional[AsyncEngine] = None
+_async_sessionmaker: Optional[async_sessionmaker] = None
+
+
+def get_async_engine() -> AsyncEngine:
+    """Async engine, created on first use so the sync loader does not need the async drivers."""
+    global _async_engine, _async_sessionmaker
+    if _async_engine is None:
+        _async_engine = create_async_engine(
+            settings.ASYNC_DATABASE_URL or async_database_url(DATABASE_URL),
+            pool_pre_ping=True,
+            # aiosqlite defaults to NullPool, which opens a connection (and its thread) per session
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+        )
+        _async_sessionmaker = async_sessionmaker(
+            _async_engine, autoflush=False, expire_on_commit=False
+        )
+    return _async_engine
+
+
+async def dispose_async_engine() -> None:
+    """Close the connections of the async engine."""
+    global _async_engine, _async_sessionmaker
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _async_sessionmaker = None
+
 
 def get_db() -> Generator:
     """Dependency for getting database session"""
@@ -22,3 +68,10 @@ def get_db() -> Generator:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """Dependency for getting async database session"""
+    get_async_engine()
+    async with _async_sessionmaker() as db:
+        yield db
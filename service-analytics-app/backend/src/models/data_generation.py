@@ -0,0 +1,11 @@
+from datetime import datetime
+from sqlalchemy import Column, String, Integer, DateTime
+from .base import Base
+
+
+class DataGeneration(Base):
+    __tablename__ = "data_generations"
+
+    survey_id = Column(String(50), primary_key=True, index=True)
+    generation = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
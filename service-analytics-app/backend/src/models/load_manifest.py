@@ -0,0 +1,12 @@
+from datetime import datetime
+from sqlalchemy import Column, String, Integer, DateTime
+from .base import Base
+
+
+class LoadManifestEntry(Base):
+    __tablename__ = "load_manifest"
+
+    key = Column(String(500), primary_key=True, index=True)
+    content_hash = Column(String(64), nullable=False)
+    row_count = Column(Integer, nullable=True)
+    loaded_at = Column(DateTime, nullable=False, default=datetime.utcnow)
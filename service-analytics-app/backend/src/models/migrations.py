@@ -0,0 +1,31 @@
+"""
+Versioned schema migrations (Alembic scripts in ``backend/migrations``).
+
+``upgrade_database`` brings a database to the latest revision; it is what the
+application, the loader and the CLIs run instead of ``create_all``. A database
+created by ``create_all`` before migrations existed has no ``alembic_version``
+and is upgraded from the start: the initial revision only creates the tables
+and indexes it lacks.
+"""
+from pathlib import Path
+from typing import Optional
+from alembic import command
+from alembic.config import Config
+from sqlalchemy.engine import Connection, Engine
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+
+def alembic_config(connection: Optional[Connection] = None) -> Config:
+    """Alembic configuration of the backend, bound to ``connection`` if given."""
+    config = Config(str(BACKEND_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(BACKEND_DIR / "migrations"))
+    if connection is not None:
+        config.attributes["connection"] = connection
+    return config
+
+
+def upgrade_database(bind: Engine, revision: str = "head") -> None:
+    """Apply the migrations up to ``revision``."""
+    with bind.begin() as connection:
+        command.upgrade(alembic_config(connection), revision)
@@ -0,0 +1,17 @@
+from datetime import datetime
+from sqlalchemy import Column, String, Integer, Float, DateTime
+from .base import Base
+
+
+class PairTestRun(Base):
+    """Data generation a survey's ``question_pair_tests`` were computed from."""
+
+    __tablename__ = "pair_test_runs"
+
+    survey_id = Column(String(50), primary_key=True, index=True)
+    generation = Column(Integer, nullable=False)
+    question_count = Column(Integer, nullable=False)
+    pair_count = Column(Integer, nullable=False)
+    respondent_count = Column(Integer, nullable=False)
+    seconds = Column(Float, nullable=False)
+    built_at = Column(DateTime, nullable=False, default=datetime.utcnow)
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, Integer, Float
+from .base import Base
+
+
+class QuestionPairTest(Base):
+    """Chi-square test of independence of two coded questions of a survey."""
+
+    __tablename__ = "question_pair_tests"
+
+    survey_id = Column(String(50), primary_key=True)
+    row_question_id = Column(String(100), primary_key=True)
+    column_question_id = Column(String(100), primary_key=True)
+    respondents = Column(Integer, nullable=False)
+    observations = Column(Integer, nullable=False)
+    chi_square = Column(Float, nullable=False)
+    dof = Column(Integer, nullable=False)
+    p_value = Column(Float, nullable=True)
+    cramers_v = Column(Float, nullable=True)
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, String, Text, Integer
+from .base import Base
+
+
+class RespondentRow(Base):
+    """Denormalized responses of one respondent in one survey, built at load time."""
+
+    __tablename__ = "respondent_rows"
+
+    survey_id = Column(String(50), primary_key=True)
+    respondent_id = Column(String(100), primary_key=True)
+    position = Column(Integer, nullable=False)
+    cells = Column(Text, nullable=False)
@@ -1,10 +1,20 @@
-from sqlalchemy import Column, String, Text, Integer, ForeignKey
+from sqlalchemy import Column, String, Text, Integer, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from .base import Base
 
 
 class TextResponse(Base):
     __tablename__ = "text_responses"
+    __table_args__ = (
+        Index("ix_text_responses_survey_respondent", "survey_id", "respondent_id"),
+        # One answer per respondent and question: reads filter on the leading columns,
+        # the loader inserts with ON CONFLICT on all of them.
+        Index(
+            "uq_text_responses_survey_question_respondent",
+            "survey_id", "question_id", "respondent_id",
+            unique=True,
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     respondent_id = Column(String(100), ForeignKey("respondents.id"), nullable=False)
@@ -19,6 +29,14 @@ class TextResponse(Base):
 
 class ChoiceResponse(Base):
     __tablename__ = "choice_responses"
+    __table_args__ = (
+        Index("ix_choice_responses_survey_respondent", "survey_id", "respondent_id"),
+        Index(
+            "uq_choice_responses_survey_question_respondent_option",
+            "survey_id", "question_id", "respondent_id", "answer_option_id",
+            unique=True,
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     respondent_id = Column(String(100), ForeignKey("respondents.id"), nullable=False)
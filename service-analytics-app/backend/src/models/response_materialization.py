@@ -0,0 +1,15 @@
+from datetime import datetime
+from sqlalchemy import Column, String, Integer, DateTime
+from .base import Base
+
+
+class ResponseMaterialization(Base):
+    """Data generation a survey's ``respondent_rows`` were built from."""
+
+    __tablename__ = "response_materializations"
+
+    survey_id = Column(String(50), primary_key=True, index=True)
+    generation = Column(Integer, nullable=False)
+    question_count = Column(Integer, nullable=False)
+    respondent_count = Column(Integer, nullable=False)
+    built_at = Column(DateTime, nullable=False, default=datetime.utcnow)
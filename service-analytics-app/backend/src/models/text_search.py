@@ -0,0 +1,84 @@
+"""
+Full-text index of the text answers.
+
+PostgreSQL gets a GIN index on ``to_tsvector`` of ``text_responses.text``.
+SQLite gets an FTS5 table over ``text_responses`` (external content, kept in
+sync by triggers) that also indexes the question id, so a search is scoped to
+a question inside the index. Other databases and SQLite builds without FTS5
+have no database index; search then uses an in-memory index. The index is
+created by the initial schema migration.
+"""
+import re
+from sqlalchemy import literal_column
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import OperationalError
+from src.logger import logger
+from src.settings import settings
+
+TEXT_SEARCH_TABLE = "text_responses_fts"
+TEXT_SEARCH_INDEX = "ix_text_responses_text_search"
+
+FTS5_STATEMENTS = [
+    f"""CREATE VIRTUAL TABLE {TEXT_SEARCH_TABLE} USING fts5(
+        text, question_id,
+        content='text_responses', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER text_responses_fts_insert AFTER INSERT ON text_responses BEGIN
+        INSERT INTO {TEXT_SEARCH_TABLE}(rowid, text, question_id) VALUES (new.id, new.text, new.question_id);
+    END""",
+    f"""CREATE TRIGGER text_responses_fts_delete AFTER DELETE ON text_responses BEGIN
+        INSERT INTO {TEXT_SEARCH_TABLE}({TEXT_SEARCH_TABLE}, rowid, text, question_id)
+        VALUES ('delete', old.id, old.text, old.question_id);
+    END""",
+    f"""CREATE TRIGGER text_responses_fts_update AFTER UPDATE ON text_responses BEGIN
+        INSERT INTO {TEXT_SEARCH_TABLE}({TEXT_SEARCH_TABLE}, rowid, text, question_id)
+        VALUES ('delete', old.id, old.text, old.question_id);
+        INSERT INTO {TEXT_SEARCH_TABLE}(rowid, text, question_id) VALUES (new.id, new.text, new.question_id);
+    END""",
+    # Index the rows that existed before the table was created.
+    f"INSERT INTO {TEXT_SEARCH_TABLE}({TEXT_SEARCH_TABLE}) VALUES ('rebuild')",
+]
+
+
+def ts_config():
+    """``'<TEXT_SEARCH_CONFIG>'::regconfig`` as a literal, so queries match the index expression."""
+    if not re.fullmatch(r"\w+", settings.TEXT_SEARCH_CONFIG):
+        raise ValueError(f"Invalid text search configuration: {settings.TEXT_SEARCH_CONFIG!r}")
+    return literal_column(f"'{settings.TEXT_SEARCH_CONFIG}'::regconfig")
+
+
+def ensure_text_search_index(connection: Connection) -> None:
+    """Create the database's full-text index of text answers if it is missing."""
+    if settings.TEXT_SEARCH_BACKEND == "memory":
+        return
+
+    if connection.dialect.name == "postgresql":
+        connection.exec_driver_sql(
+            f"CREATE INDEX IF NOT EXISTS {TEXT_SEARCH_INDEX} ON text_responses "
+            f"USING gin (to_tsvector({ts_config()}, text))"
+        )
+    elif connection.dialect.name == "sqlite":
+        exists = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE name = ?", (TEXT_SEARCH_TABLE,)
+        ).first()
+        if exists:
+            return
+        try:
+            connection.exec_driver_sql(FTS5_STATEMENTS[0])
+        except OperationalError as e:
+            logger.warning(f"SQLite without FTS5 ({e}), text search uses the in-memory index")
+            return
+        logger.info("Building the FTS5 index of text answers...")
+        for statement in FTS5_STATEMENTS[1:]:
+            connection.exec_driver_sql(statement)
+
+
+def drop_text_search_index(connection: Connection) -> None:
+    """Drop the full-text index of text answers and, on SQLite, its triggers."""
+    if connection.dialect.name == "postgresql":
+        connection.exec_driver_sql(f"DROP INDEX IF EXISTS {TEXT_SEARCH_INDEX}")
+    elif connection.dialect.name == "sqlite":
+        for trigger in ("insert", "delete", "update"):
+            connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS text_responses_fts_{trigger}")
+        connection.exec_driver_sql(f"DROP TABLE IF EXISTS {TEXT_SEARCH_TABLE}")
@@ -0,0 +1,21 @@
+"""
+API routes for the response result cache.
+"""
+from typing import Any, Dict
+from fastapi import APIRouter
+from src.services.result_cache import result_cache
+from src.services.segment_index import segment_indexes
+
+router = APIRouter(prefix="/api/cache", tags=["cache"])
+
+
+@router.get("/stats")
+def get_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters and occupancy of this worker's result cache."""
+    return result_cache.stats()
+
+
+@router.get("/segment-index")
+def get_segment_index_stats() -> Dict[str, Any]:
+    """Memory use of this worker's respondent bitmap indexes, per survey."""
+    return segment_indexes.stats()
@@ -0,0 +1,14 @@
+"""
+Prometheus endpoint with the request metrics of this worker.
+"""
+from fastapi import APIRouter
+from fastapi.responses import Response
+from src.services.metrics import PROMETHEUS_MEDIA_TYPE, request_metrics
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", response_class=Response, responses={200: {"content": {PROMETHEUS_MEDIA_TYPE: {}}}})
+def get_metrics() -> Response:
+    """Latency, response size, SQL query and row counts and stage timings per route, in Prometheus text format."""
+    return Response(request_metrics.render(), media_type=PROMETHEUS_MEDIA_TYPE)
@@ -1,10 +1,11 @@
 """
 API routes for surveys and responses.
 """
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List, Dict, Any, Optional
-from src.models import get_db, Survey, Question, QuestionType
+from fastapi import APIRouter, Depends, Header, Query
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from src.models import get_async_db
 from src.schemas import (
     Survey as SurveySchema,
     Question as QuestionSchema,
@@ -12,65 +13,284 @@ from src.schemas import (
     ValidateQuestionsResponse,
     GetResponsesRequest,
     GetResponsesResponse,
-    RespondentResponseData,
-    ResponseData,
+    ResponseFormat,
+    ExportFormat,
+    QuestionDistribution,
+    DistributionsResponse,
+    CrosstabResponse,
+    TextSearchResponse,
+    PairTestsResponse,
 )
 from src.logger import logger
-from src.services.survey_service import SurveyService
-from src.services.response_service import ResponseService
+from src.services.survey_service import AsyncSurveyService
+from src.services.async_response_service import AsyncResponseService
+from src.services.distribution_service import DistributionService
+from src.services.exporters import EXPORT_MEDIA_TYPES
+from src.services.crosstab_service import CrosstabService
+from src.services.pair_test_service import PairTestService
+from src.services.segment_service import SegmentService, parse_segment_filter
+from src.services.text_search_service import TextSearchService
+from src.services.response_encoders import (
+    ARROW_STREAM_MEDIA_TYPE,
+    NDJSON_MEDIA_TYPE,
+    RESPONSE_MEDIA_TYPES,
+    encode_response_page,
+    iter_ndjson,
+)
+from src.services.response_matrix import ResponseMatrix
 
 router = APIRouter(prefix="/api/surveys", tags=["surveys"])
 
+FILTER_DESCRIPTION = (
+    "Respondent filter as JSON or an expression such as `Q2:3 AND (Q4:1,5 OR NOT Q1)`"
+)
+
 
 @router.get("/", response_model=List[SurveySchema])
-def get_surveys(db: Session = Depends(get_db)) -> List[SurveySchema]:
+async def get_surveys(db: AsyncSession = Depends(get_async_db)) -> List[SurveySchema]:
     """Get all surveys."""
-    survey_service = SurveyService(db)
-    return survey_service.get_all_surveys()
+    survey_service = AsyncSurveyService(db)
+    return await survey_service.get_all_surveys()
 
 
 @router.get("/{survey_id}/questions", response_model=List[QuestionSchema])
-def get_survey_questions(survey_id: str, db: Session = Depends(get_db)) -> List[QuestionSchema]:
+async def get_survey_questions(survey_id: str, db: AsyncSession = Depends(get_async_db)) -> List[QuestionSchema]:
     """Get all questions for a survey."""
-    survey_service = SurveyService(db)
-    return survey_service.get_survey_questions(survey_id)
+    survey_service = AsyncSurveyService(db)
+    return await survey_service.get_survey_questions(survey_id)
 
 
 @router.post("/validate-questions", response_model=ValidateQuestionsResponse)
-def validate_questions(
+async def validate_questions(
     request: ValidateQuestionsRequest, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> ValidateQuestionsResponse:
     """Validate that question IDs (by name) belong to the specified survey."""
-    survey_service = SurveyService(db)
-    return survey_service.validate_questions(request)
+    survey_service = AsyncSurveyService(db)
+    return await survey_service.validate_questions(request)
+
+
+@router.get("/{survey_id}/questions/{question_name}/distribution", response_model=QuestionDistribution)
+async def get_question_distribution(
+    survey_id: str,
+    question_name: str,
+    segment: Optional[str] = Query(default=None, alias="filter", description=FILTER_DESCRIPTION),
+    db: AsyncSession = Depends(get_async_db)
+) -> QuestionDistribution:
+    """Counts and percentages per answer code of one question (by name)."""
+    segment_filter = parse_segment_filter(segment) if segment else None
+    distribution_service = DistributionService(db)
+    return await distribution_service.get_distribution(survey_id, question_name, segment_filter)
+
+
+@router.get("/{survey_id}/distributions", response_model=DistributionsResponse)
+async def get_question_distributions(
+    survey_id: str,
+    questions: Optional[str] = Query(default=None, description="Comma-separated question names; all if omitted"),
+    segment: Optional[str] = Query(default=None, alias="filter", description=FILTER_DESCRIPTION),
+    db: AsyncSession = Depends(get_async_db)
+) -> DistributionsResponse:
+    """Distributions of many questions in one request."""
+    question_names = [name.strip() for name in questions.split(",") if name.strip()] if questions else None
+    segment_filter = parse_segment_filter(segment) if segment else None
+    distribution_service = DistributionService(db)
+    return DistributionsResponse(
+        survey_id=survey_id,
+        distributions=await distribution_service.get_distributions(survey_id, question_names, segment_filter),
+    )
+
+
+@router.get("/{survey_id}/crosstab", response_model=CrosstabResponse)
+async def get_crosstab(
+    survey_id: str,
+    rows: str = Query(description="Question name of the table rows"),
+    columns: str = Query(description="Question name of the table columns"),
+    db: AsyncSession = Depends(get_async_db)
+) -> CrosstabResponse:
+    """Respondent counts of two SINGLE/MULTIPLE questions with row/column percentages and totals."""
+    crosstab_service = CrosstabService(db)
+    return await crosstab_service.get_crosstab(survey_id, rows, columns)
+
+
+@router.get("/{survey_id}/pair-tests", response_model=PairTestsResponse)
+async def get_pair_tests(
+    survey_id: str,
+    max_p: Optional[float] = Query(default=None, ge=0, le=1, description="Only pairs with a p-value up to this"),
+    limit: Optional[int] = Query(default=None, ge=1),
+    db: AsyncSession = Depends(get_async_db)
+) -> PairTestsResponse:
+    """Chi-square tests of all SINGLE/MULTIPLE question pairs, most significant first."""
+    pair_test_service = PairTestService(db)
+    return await pair_test_service.get_pair_tests(survey_id, max_p, limit)
+
+
+@router.get("/{survey_id}/questions/{question_name}/search", response_model=TextSearchResponse)
+async def search_text_answers(
+    survey_id: str,
+    question_name: str,
+    q: str = Query(description="Words that every answer must contain (as word prefixes)"),
+    limit: int = Query(default=50, ge=1, le=500),
+    after: Optional[int] = Query(default=None, description="next_cursor of the previous page"),
+    db: AsyncSession = Depends(get_async_db)
+) -> TextSearchResponse:
+    """Text answers of a TEXT question matching a query, with highlighted snippets."""
+    text_search_service = TextSearchService(db)
+    return await text_search_service.search(survey_id, question_name, q, limit, after)
+
+
+def wants_ndjson(accept: Optional[str]) -> bool:
+    """Whether the client asked for newline-delimited JSON."""
+    return bool(accept) and NDJSON_MEDIA_TYPE in accept
+
+
+async def stream_responses(response_service: AsyncResponseService, request: GetResponsesRequest) -> StreamingResponse:
+    """Stream respondents as NDJSON lines; the request is validated before streaming starts.
 
+    A filtered request is assembled as one page first, since the rows of a
+    segment are not contiguous on the server-side cursor.
+    """
+    if request.filter is not None:
+        page = await response_service.get_response_page(request)
+        return StreamingResponse(iter_ndjson([page.matrix], request.question_ids), media_type=NDJSON_MEDIA_TYPE)
 
-@router.post("/responses", response_model=GetResponsesResponse)
-def get_responses(
+    questions = await response_service.resolve_questions(request)
+    chunks = response_service.iter_ndjson(
+        questions, request.question_ids, after=request.after, limit=request.limit
+    )
+    return StreamingResponse(chunks, media_type=NDJSON_MEDIA_TYPE)
+
+
+async def render_responses(
+    response_service: AsyncResponseService,
+    request: GetResponsesRequest,
+    response_format: ResponseFormat,
+    accept: Optional[str]
+):
+    """Answer a responses request in the representation the client asked for.
+
+    Every format, the default rows included, is encoded in a worker thread, so
+    large payloads do not hold up the event loop.
+    """
+    if wants_ndjson(accept):
+        return await stream_responses(response_service, request)
+    return Response(
+        await response_service.get_encoded_responses(request, response_format),
+        media_type=RESPONSE_MEDIA_TYPES[response_format],
+    )
+
+
+RESPONSES_CONTENT = {
+    200: {
+        "content": {
+            NDJSON_MEDIA_TYPE: {},
+            ARROW_STREAM_MEDIA_TYPE: {},
+        },
+        "description": "Rows (default), columnar JSON (`format=columnar`), Arrow IPC stream "
+                       "(`format=arrow`) or NDJSON (`Accept: application/x-ndjson`)",
+    },
+}
+
+
+@router.post("/responses", response_model=GetResponsesResponse, responses=RESPONSES_CONTENT)
+async def get_responses(
     request: GetResponsesRequest,
-    db: Session = Depends(get_db)
-) -> GetResponsesResponse:
-    """Get responses for specified questions (by name) in a survey."""
-    logger.debug(f"=== Request for survey {request.survey_id}, questions: {request.question_ids} ===")
+    response_format: ResponseFormat = Query(default=ResponseFormat.ROWS, alias="format"),
+    accept: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get responses for specified questions (by name) in a survey.
 
-    response_service = ResponseService(db)
-    return response_service.get_responses_for_questions(request)
+    ``limit``/``after`` page through respondents in ``respondent_id`` order;
+    pass the returned ``next_cursor`` as ``after`` to get the next page.
+    With ``Accept: application/x-ndjson`` respondents are streamed one per line.
+    Rows are encoded without building response models.
+    ``format=columnar`` returns ``ColumnarResponsesResponse`` (question header once,
+    one value list per question) and ``format=arrow`` an Arrow IPC stream.
+    ``filter`` keeps only the respondents matching a ``SegmentFilter``.
+    """
+    logger.debug("=== Request for survey %s, questions: %s ===", request.survey_id, request.question_ids)
 
+    response_service = AsyncResponseService(db)
+    return await render_responses(response_service, request, response_format, accept)
 
-@router.get("/{survey_id}/all-responses", response_model=GetResponsesResponse)
-def get_all_responses(survey_id: str, db: Session = Depends(get_db)) -> GetResponsesResponse:
-    """Get all responses for all questions in a survey."""
-    survey_service = SurveyService(db)
-    questions = survey_service.get_survey_questions(survey_id)
+
+@router.get("/{survey_id}/all-responses", response_model=GetResponsesResponse, responses=RESPONSES_CONTENT)
+async def get_all_responses(
+    survey_id: str,
+    limit: Optional[int] = Query(default=None, ge=1),
+    after: Optional[str] = Query(default=None),
+    response_format: ResponseFormat = Query(default=ResponseFormat.ROWS, alias="format"),
+    segment: Optional[str] = Query(default=None, alias="filter", description=FILTER_DESCRIPTION),
+    accept: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get all responses for all questions in a survey.
+
+    ``limit``/``after``/``format`` and NDJSON streaming work as in ``POST /responses``.
+    """
+    segment_filter = parse_segment_filter(segment) if segment else None
+    survey_service = AsyncSurveyService(db)
+    questions = await survey_service.get_survey_questions(survey_id)
 
     if not questions:
+        if wants_ndjson(accept):
+            return StreamingResponse(iter(()), media_type=NDJSON_MEDIA_TYPE)
+        if response_format != ResponseFormat.ROWS:
+            return Response(
+                encode_response_page(ResponseMatrix([], [], {}), [], None, response_format),
+                media_type=RESPONSE_MEDIA_TYPES[response_format],
+            )
         return GetResponsesResponse(respondents=[])
 
     request = GetResponsesRequest(
         survey_id=survey_id,
-        question_ids=[q.name for q in questions]
+        question_ids=[q.name for q in questions],
+        limit=limit,
+        after=after,
+        filter=segment_filter
     )
 
-    response_service = ResponseService(db)
-    return response_service.get_responses_for_questions(request)
+    response_service = AsyncResponseService(db)
+    return await render_responses(response_service, request, response_format, accept)
+
+
+EXPORT_CONTENT = {
+    200: {
+        "content": {media_type: {} for media_type in EXPORT_MEDIA_TYPES.values()},
+        "description": "Survey responses as a CSV, XLSX or Parquet file",
+    },
+}
+
+
+@router.get("/{survey_id}/export", response_class=StreamingResponse, responses=EXPORT_CONTENT)
+async def export_responses(
+    survey_id: str,
+    export_format: ExportFormat = Query(default=ExportFormat.CSV, alias="format"),
+    questions: Optional[str] = Query(default=None, description="Comma-separated question names; all if omitted"),
+    segment: Optional[str] = Query(default=None, alias="filter", description=FILTER_DESCRIPTION),
+    db: AsyncSession = Depends(get_async_db)
+) -> StreamingResponse:
+    """Download the responses of a survey as a file, a respondent per row.
+
+    The file is streamed while the rows are read, ``EXPORT_CHUNK_SIZE`` response
+    rows at a time; ``questions`` limits and orders its columns, and ``filter``
+    keeps only the respondents matching a segment filter.
+    """
+    segment_filter = parse_segment_filter(segment) if segment else None
+    survey_service = AsyncSurveyService(db)
+    if questions:
+        question_names = [name.strip() for name in questions.split(",") if name.strip()]
+    else:
+        question_names = [q.name for q in await survey_service.get_survey_questions(survey_id)]
+
+    response_service = AsyncResponseService(db)
+    request = GetResponsesRequest(survey_id=survey_id, question_ids=question_names)
+    resolved = await response_service.resolve_questions(request)
+    respondent_segment = None
+    if segment_filter is not None:
+        respondent_segment = await SegmentService(db).get_segment(survey_id, segment_filter)
+    return StreamingResponse(
+        response_service.iter_export(resolved, question_names, export_format, segment=respondent_segment),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{survey_id}.{export_format.value}"'},
+    )
@@ -1,7 +1,8 @@
 """
 Pydantic schemas for API request/response validation.
 """
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
+from datetime import datetime
 from typing import List, Optional, Dict, Any
 from enum import Enum
 
@@ -12,6 +13,18 @@ class QuestionTypeEnum(str, Enum):
     MULTIPLE = "MULTIPLE"
 
 
+class ResponseFormat(str, Enum):
+    ROWS = "rows"
+    COLUMNAR = "columnar"
+    ARROW = "arrow"
+
+
+class ExportFormat(str, Enum):
+    CSV = "csv"
+    XLSX = "xlsx"
+    PARQUET = "parquet"
+
+
 class SurveyBase(BaseModel):
     id: str
 
@@ -63,9 +76,47 @@ class ValidateQuestionsResponse(BaseModel):
     errors: List[str] = []
 
 
+class SegmentFilter(BaseModel):
+    """Respondent filter: a condition on one question or an and/or/not combination of filters.
+
+    ``{"question": "Q4", "codes": [1, 5]}`` matches respondents who chose code 1
+    or 5 on Q4; without ``codes`` it matches respondents who answered Q4.
+    """
+    question: Optional[str] = None
+    codes: Optional[List[int]] = Field(default=None, min_length=1)
+    all_of: Optional[List["SegmentFilter"]] = Field(default=None, alias="and", min_length=1)
+    any_of: Optional[List["SegmentFilter"]] = Field(default=None, alias="or", min_length=1)
+    negated: Optional["SegmentFilter"] = Field(default=None, alias="not")
+
+    class Config:
+        populate_by_name = True
+
+    @model_validator(mode="after")
+    def check_one_kind(self) -> "SegmentFilter":
+        kinds = [self.question, self.all_of, self.any_of, self.negated]
+        if sum(kind is not None for kind in kinds) != 1:
+            raise ValueError("a filter needs exactly one of question, and, or, not")
+        if self.codes is not None and self.question is None:
+            raise ValueError("codes need a question")
+        return self
+
+    def question_names(self) -> List[str]:
+        """Names of the questions the filter refers to, in first-use order."""
+        if self.question is not None:
+            return [self.question]
+        parts = self.all_of or self.any_of or [self.negated]
+        return list(dict.fromkeys(name for part in parts for name in part.question_names()))
+
+    def cache_key(self) -> str:
+        return self.model_dump_json(by_alias=True, exclude_none=True)
+
+
 class GetResponsesRequest(BaseModel):
     survey_id: str
     question_ids: List[str]
+    limit: Optional[int] = Field(default=None, ge=1)
+    after: Optional[str] = None
+    filter: Optional[SegmentFilter] = None
 
 
 class ResponseData(BaseModel):
@@ -82,3 +133,93 @@ class RespondentResponseData(BaseModel):
 
 class GetResponsesResponse(BaseModel):
     respondents: List[RespondentResponseData]
+    next_cursor: Optional[str] = None
+
+
+class QuestionHeader(BaseModel):
+    question_id: str
+    question_name: str
+    question_type: str
+
+
+class ColumnarResponsesResponse(BaseModel):
+    questions: List[QuestionHeader]
+    respondent_ids: List[str]
+    values: List[List[Any]]
+    next_cursor: Optional[str] = None
+
+
+class AnswerFrequency(BaseModel):
+    code: int
+    label: str
+    count: int
+    percent: float
+    selection_percent: Optional[float] = None
+
+
+class QuestionDistribution(BaseModel):
+    question_id: str
+    question_name: str
+    question_type: str
+    respondents: int
+    selections: int
+    answers: List[AnswerFrequency]
+
+
+class DistributionsResponse(BaseModel):
+    survey_id: str
+    distributions: List[QuestionDistribution]
+
+
+class CrosstabAxis(BaseModel):
+    question_id: str
+    question_name: str
+    question_type: str
+    codes: List[int]
+    labels: List[str]
+
+
+class CrosstabResponse(BaseModel):
+    survey_id: str
+    rows: CrosstabAxis
+    columns: CrosstabAxis
+    counts: List[List[int]]
+    row_percent: List[List[float]]
+    column_percent: List[List[float]]
+    row_totals: List[int]
+    column_totals: List[int]
+    total: int
+
+
+class TextSearchHit(BaseModel):
+    response_id: int
+    respondent_id: str
+    snippet: str
+
+
+class TextSearchResponse(BaseModel):
+    survey_id: str
+    question_id: str
+    query: str
+    results: List[TextSearchHit]
+    next_cursor: Optional[int] = None
+
+
+class PairTestResult(BaseModel):
+    row_question: str
+    column_question: str
+    respondents: int
+    observations: int
+    chi_square: float
+    dof: int
+    p_value: Optional[float] = None
+    cramers_v: Optional[float] = None
+
+
+class PairTestsResponse(BaseModel):
+    survey_id: str
+    generation: int
+    computed_at: datetime
+    question_count: int
+    pair_count: int
+    results: List[PairTestResult]
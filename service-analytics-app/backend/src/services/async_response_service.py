@@ -0,0 +1,322 @@
+"""
+Response-related business logic on an async session.
+
+Mirrors :class:`~src.services.response_service.ResponseService`: queries are
+awaited on the async engine, while assembling and encoding matrices runs in
+worker threads under the response concurrency limit.
+"""
+import time
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.models import Question, ResponseMaterialization
+from src.schemas import ExportFormat, GetResponsesRequest, ResponseFormat
+from src.logger import get_logger
+from src.settings import settings
+from src.services.concurrency import run_in_worker
+from src.services.exporters import create_exporter, export_columns, log_export
+from src.services.metrics import stage
+from src.services.response_encoders import encode_response_page, iter_ndjson
+from src.services.response_matrix import ResponseMatrix, build_response_matrix
+from src.services.response_service import ResponsePage, ResponseQueries
+from src.services.segment_service import Segment, SegmentService
+
+logger = get_logger("responses")
+
+
+class AsyncResponseService(ResponseQueries):
+    """Service for response-related operations on an async session."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_encoded_responses(
+        self,
+        request: GetResponsesRequest,
+        response_format: ResponseFormat = ResponseFormat.ROWS
+    ) -> bytes:
+        """Responses encoded to bytes in ``response_format``.
+
+        ``ResponseFormat.ROWS`` gives the same JSON as the Pydantic response models.
+        """
+        page = await self.get_response_page(request)
+        with stage("encode"):
+            return await run_in_worker(
+                encode_response_page, page.matrix, request.question_ids, page.next_cursor, response_format
+            )
+
+    async def get_response_page(self, request: GetResponsesRequest) -> ResponsePage:
+        """Validate the request and assemble the page as ``ResponseService.get_response_page`` does.
+
+        With a ``filter`` only the matching respondents are returned, in
+        ``respondent_id`` order whether or not the request is paged.
+        """
+        with stage("validate"):
+            questions = await self.resolve_questions(request)
+        if not questions:
+            return await self._build_response_page(questions, request.limit, request.after, 0)
+
+        with stage("validate"):
+            generation = await self._data_generation(questions[0].survey_id)
+        segment = None
+        if request.filter is not None:
+            with stage("segment"):
+                segment = await SegmentService(self.db).get_segment(request.survey_id, request.filter, generation)
+        if not settings.RESULT_CACHE_ENABLED:
+            return await self._build_response_page(questions, request.limit, request.after, generation, segment)
+
+        key = self._cache_key(questions, request)
+        with stage("cache"):
+            page = await run_in_worker(self._cached_page, key, generation)
+        if page is not None:
+            return page
+
+        page = await self._build_response_page(questions, request.limit, request.after, generation, segment)
+        with stage("cache"):
+            await run_in_worker(self._store_page, key, generation, page)
+        return page
+
+    async def resolve_questions(self, request: GetResponsesRequest) -> List[Question]:
+        """Load the requested questions, raising 404/400 for an unknown survey or question."""
+        if await self.db.scalar(self._survey_statement(request)) is None:
+            raise HTTPException(status_code=404, detail="Survey not found")
+
+        questions = (await self.db.scalars(self._questions_statement(request))).all()
+        return self._checked_questions(request, questions)
+
+    async def iter_response_matrices(
+        self,
+        questions: List[Question],
+        chunk_size: Optional[int] = None,
+        after: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> AsyncIterator[ResponseMatrix]:
+        """Yield matrices of whole respondents as ``ResponseService.iter_response_matrices`` does.
+
+        Rows come from a server-side cursor; matrices are assembled in worker threads.
+        """
+        if not questions:
+            return
+
+        until = None
+        if limit is not None:
+            respondent_ids, _ = await self._respondent_page(questions, after, limit)
+            if not respondent_ids:
+                return
+            until = respondent_ids[-1]
+
+        chunk_size = chunk_size or settings.RESPONSES_STREAM_CHUNK_SIZE
+        result = await self.db.stream(
+            self._ordered_rows_statement(questions, after, until).execution_options(yield_per=chunk_size)
+        )
+
+        pending = None
+        async for partition in result.partitions():
+            with stage("assemble"):
+                complete, pending = await run_in_worker(self._split_partition, pending, partition)
+                matrix = None if complete is None else await run_in_worker(self._chunk_matrix, questions, complete)
+            if matrix is not None:
+                yield matrix
+
+        if pending is not None:
+            with stage("assemble"):
+                matrix = await run_in_worker(self._chunk_matrix, questions, pending)
+            yield matrix
+
+    async def iter_ndjson(
+        self,
+        questions: List[Question],
+        question_names: Sequence[str],
+        chunk_size: Optional[int] = None,
+        after: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        """Stream respondents as NDJSON, one chunk of whole respondents at a time."""
+        async for matrix in self.iter_response_matrices(questions, chunk_size, after, limit):
+            with stage("encode"):
+                data = await run_in_worker(self._encode_chunk, matrix, question_names)
+            if data:
+                yield data
+
+    async def iter_export(
+        self,
+        questions: List[Question],
+        question_names: Sequence[str],
+        export_format: ExportFormat,
+        chunk_size: Optional[int] = None,
+        segment: Optional[Segment] = None
+    ) -> AsyncIterator[bytes]:
+        """Stream the responses to the questions as a file in ``export_format``.
+
+        Chunks of ``EXPORT_CHUNK_SIZE`` response rows are written as they are read.
+        With a ``segment`` only its respondents are exported, in ``respondent_id``
+        order, ``RESPONDENT_ID_BATCH_SIZE`` respondents at a time.
+        """
+        started = time.perf_counter()
+        exporter = create_exporter(export_format, export_columns(questions, question_names))
+        if segment is not None:
+            matrices = self.iter_segment_matrices(questions, segment)
+        else:
+            matrices = self.iter_response_matrices(questions, chunk_size or settings.EXPORT_CHUNK_SIZE)
+        async for matrix in matrices:
+            with stage("encode"):
+                data = await run_in_worker(exporter.write, matrix)
+            if data:
+                yield data
+
+        remaining = exporter.finish()
+        while True:
+            with stage("encode"):
+                data = await run_in_worker(next, remaining, None)
+            if data is None:
+                break
+            yield data
+        log_export(questions, export_format, exporter.rows, time.perf_counter() - started)
+
+    async def iter_segment_matrices(self, questions: List[Question], segment: Segment) -> AsyncIterator[ResponseMatrix]:
+        """Yield matrices of the segment's respondents with rows for the questions, a batch of ids at a time."""
+        if not questions:
+            return
+
+        respondent_ids, _ = await run_in_worker(self._segment_page, questions, segment, None, None)
+        for batch in self._respondent_id_batches(respondent_ids):
+            yield await self._segment_matrix(questions, batch, segment.index.generation)
+
+    @staticmethod
+    def _encode_chunk(matrix: ResponseMatrix, question_names: Sequence[str]) -> bytes:
+        return b"".join(iter_ndjson([matrix], question_names))
+
+    async def _data_generation(self, survey_id: str) -> int:
+        """Current data generation of the survey (0 before the first versioned load)."""
+        return await self.db.scalar(self._data_generation_statement(survey_id)) or 0
+
+    async def _build_response_page(
+        self,
+        questions: List[Question],
+        limit: Optional[int],
+        after: Optional[str],
+        generation: int,
+        segment: Optional[Segment] = None
+    ) -> ResponsePage:
+        """Assemble the page from the materialized rows when they are current, else from the response tables."""
+        if segment is not None:
+            return await self._build_segment_page(questions, limit, after, generation, segment)
+
+        if await self._materialization_covers(questions, generation):
+            with stage("fetch"):
+                rows = (await self.db.execute(self._materialized_statement(questions, limit, after))).all()
+            with stage("assemble"):
+                return await run_in_worker(self._materialized_page, questions, rows, limit)
+
+        if limit is None and after is None:
+            text_rows, choice_rows = await self._fetch_response_rows(questions)
+            with stage("assemble"):
+                return ResponsePage(await run_in_worker(build_response_matrix, questions, text_rows, choice_rows))
+
+        respondent_ids, next_cursor = await self._respondent_page(questions, after, limit)
+        if not respondent_ids:
+            return ResponsePage(build_response_matrix(questions, [], []))
+
+        text_rows, choice_rows = await self._fetch_response_rows(
+            questions, after=after, until=respondent_ids[-1]
+        )
+        with stage("assemble"):
+            matrix = await run_in_worker(build_response_matrix, questions, text_rows, choice_rows, respondent_ids)
+        return ResponsePage(matrix, next_cursor)
+
+    async def _build_segment_page(
+        self,
+        questions: List[Question],
+        limit: Optional[int],
+        after: Optional[str],
+        generation: int,
+        segment: Segment
+    ) -> ResponsePage:
+        """Page of the segment's respondents; rows are read for the page's respondent ids.
+
+        The page is cut in code-point order of the ids (the segment index's
+        order), which the database collation may not share, so rows are
+        selected by id rather than by an id range.
+        """
+        respondent_ids, next_cursor = await run_in_worker(self._segment_page, questions, segment, after, limit)
+        return ResponsePage(await self._segment_matrix(questions, respondent_ids, generation), next_cursor)
+
+    async def _segment_matrix(
+        self,
+        questions: List[Question],
+        respondent_ids: List[str],
+        generation: int
+    ) -> ResponseMatrix:
+        """Matrix of the given respondents in that order, from the materialized rows when they are current."""
+        if not respondent_ids:
+            return build_response_matrix(questions, [], [])
+
+        if await self._materialization_covers(questions, generation):
+            rows = []
+            with stage("fetch"):
+                for batch in self._respondent_id_batches(respondent_ids):
+                    rows.extend((await self.db.execute(
+                        self._materialized_respondents_statement(questions, batch)
+                    )).all())
+            rows_by_id = {row.respondent_id: row for row in rows}
+            rows = [rows_by_id[respondent_id] for respondent_id in respondent_ids if respondent_id in rows_by_id]
+            with stage("assemble"):
+                page = await run_in_worker(self._materialized_page, questions, rows, None)
+            return page.matrix
+
+        text_rows, choice_rows = await self._fetch_response_rows(questions, respondent_ids=respondent_ids)
+        with stage("assemble"):
+            return await run_in_worker(build_response_matrix, questions, text_rows, choice_rows, respondent_ids)
+
+    async def _materialization_covers(self, questions: List[Question], generation: int) -> bool:
+        """Whether the request can be served from the materialized respondent rows."""
+        if not settings.MATERIALIZED_RESPONSES_ENABLED or not questions:
+            return False
+        materialization = await self.db.get(ResponseMaterialization, questions[0].survey_id)
+        return self._materialization_current(materialization, questions, generation)
+
+    async def _respondent_page(
+        self,
+        questions: List[Question],
+        after: Optional[str],
+        limit: Optional[int]
+    ) -> Tuple[List[str], Optional[str]]:
+        """Ids of the respondents following ``after`` and the cursor of the next page."""
+        if not questions:
+            return [], None
+
+        with stage("fetch"):
+            respondent_ids = (
+                await self.db.scalars(self._respondent_page_statement(questions, after, limit))
+            ).all()
+        return self._cut_page(respondent_ids, limit)
+
+    async def _fetch_response_rows(
+        self,
+        questions: List[Question],
+        after: Optional[str] = None,
+        until: Optional[str] = None,
+        respondent_ids: Optional[Sequence[str]] = None
+    ) -> Tuple[list, list]:
+        """Fetch raw text and choice rows of the questions, optionally of respondents in ``(after, until]``.
+
+        With ``respondent_ids`` only the rows of those respondents are read,
+        ``RESPONDENT_ID_BATCH_SIZE`` ids per statement.
+        """
+        if not questions:
+            return [], []
+
+        text_rows, choice_rows = [], []
+        batches = [None] if respondent_ids is None else self._respondent_id_batches(respondent_ids)
+        with stage("fetch"):
+            for batch in batches:
+                text_rows.extend((await self.db.execute(
+                    self._text_rows_statement(questions, after, until, batch)
+                )).all())
+                choice_rows.extend((await self.db.execute(
+                    self._choice_rows_statement(questions, after, until, batch)
+                )).all())
+
+        logger.debug("DEBUG: Found %d text responses and %d choice responses", len(text_rows), len(choice_rows))
+
+        return text_rows, choice_rows
@@ -0,0 +1,32 @@
+"""
+Concurrency limits of the async request handlers.
+
+Database access is async; CPU-bound work (assembling and encoding response
+matrices) runs in worker threads, at most ``RESPONSES_MAX_CONCURRENCY`` at a
+time, so hundreds of concurrent clients neither block the event loop nor
+start hundreds of assemblies at once.
+"""
+from functools import partial
+from typing import Any, Callable, Optional, TypeVar
+import anyio
+import anyio.to_thread
+from src.settings import settings
+
+T = TypeVar("T")
+
+_worker_limiter: Optional[anyio.CapacityLimiter] = None
+
+
+def configure_concurrency() -> None:
+    """Apply the configured limits; must be called from the running event loop."""
+    global _worker_limiter
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_SIZE
+    _worker_limiter = anyio.CapacityLimiter(settings.RESPONSES_MAX_CONCURRENCY)
+
+
+async def run_in_worker(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run CPU-bound ``func`` in a worker thread under the response concurrency limit."""
+    global _worker_limiter
+    if _worker_limiter is None:
+        _worker_limiter = anyio.CapacityLimiter(settings.RESPONSES_MAX_CONCURRENCY)
+    return await anyio.to_thread.run_sync(partial(func, *args, **kwargs), limiter=_worker_limiter)
@@ -0,0 +1,311 @@
+"""
+Crosstabs of two choice questions.
+
+Answers are encoded as dense integer arrays: respondents are factorized to
+``0..R-1`` and answer codes to option indexes ``0..K-1``. Two SINGLE
+questions are counted with one ``np.bincount`` over ``row * K + column``.
+When either question is MULTIPLE, each question's answers become distinct
+(respondent, option) pairs sorted by respondent; the pairs of the two
+questions are joined per respondent (every row option of a respondent with
+every column option of the same respondent, so a respondent falls into
+several cells) and counted with the same ``bincount``. Memory follows the
+number of answers rather than respondents × options, and the join runs in
+chunks. As in the response matrix, a SINGLE question counts the last answer of
+a respondent and rows of unknown answer options are ignored.
+
+The base of the table is the respondents who answered both questions.
+"""
+from typing import NamedTuple, Sequence, Tuple
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.models import AnswerOption, ChoiceResponse, DataGeneration, Question, QuestionType, Survey
+from src.schemas import CrosstabAxis, CrosstabResponse
+from src.settings import settings
+from src.services.concurrency import run_in_worker
+from src.services.response_matrix import QUESTION_TYPE_NAMES
+from src.services.result_cache import result_cache
+
+CROSSTAB_SCHEMA = pa.schema([
+    pa.field("row", pa.int64(), nullable=False),
+    pa.field("column", pa.int64(), nullable=False),
+    pa.field("count", pa.int64(), nullable=False),
+])
+
+PAIR_CHUNK_SIZE = 65_536
+
+
+class CodedAnswers(NamedTuple):
+    """Answers of one question as dense indexes, in answer order."""
+
+    respondents: np.ndarray
+    options: np.ndarray
+    option_count: int
+    single: bool
+
+
+class Crosstab(NamedTuple):
+    """Counts of a crosstab and its margins."""
+
+    counts: np.ndarray
+    row_totals: np.ndarray
+    column_totals: np.ndarray
+    total: int
+
+
+def encode_answers(
+    respondent_index: np.ndarray,
+    codes: np.ndarray,
+    option_codes: np.ndarray,
+    single: bool
+) -> CodedAnswers:
+    """Map answer codes to indexes of the sorted ``option_codes``."""
+    return CodedAnswers(
+        respondents=np.asarray(respondent_index, dtype=np.int64),
+        options=np.searchsorted(option_codes, codes).astype(np.int64),
+        option_count=len(option_codes),
+        single=single,
+    )
+
+
+def _single_choice(answers: CodedAnswers, respondent_count: int) -> np.ndarray:
+    """Option index per respondent (last answer wins), -1 if unanswered."""
+    choice = np.full(respondent_count, -1, dtype=np.int64)
+    # Fancy assignment keeps the last value written for a repeated index.
+    choice[answers.respondents] = answers.options
+    return choice
+
+
+def _answer_pairs(answers: CodedAnswers, respondent_count: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Distinct (respondent, option) pairs of the answers, sorted by respondent and option."""
+    if answers.single:
+        choice = _single_choice(answers, respondent_count)
+        respondents = np.flatnonzero(choice >= 0)
+        return respondents, choice[respondents]
+    option_count = max(answers.option_count, 1)
+    keys = np.unique(answers.respondents * option_count + answers.options)
+    return keys // option_count, keys % option_count
+
+
+def build_crosstab(rows: CodedAnswers, columns: CodedAnswers, respondent_count: int) -> Crosstab:
+    """Count respondents per (row option, column option) without looping over answers."""
+    if rows.single and columns.single:
+        row_choice = _single_choice(rows, respondent_count)
+        column_choice = _single_choice(columns, respondent_count)
+        both = (row_choice >= 0) & (column_choice >= 0)
+        cells = row_choice[both] * columns.option_count + column_choice[both]
+        counts = np.bincount(cells, minlength=rows.option_count * columns.option_count)
+        counts = counts.reshape(rows.option_count, columns.option_count)
+        return Crosstab(counts, counts.sum(axis=1), counts.sum(axis=0), int(both.sum()))
+
+    row_respondents, row_options = _answer_pairs(rows, respondent_count)
+    column_respondents, column_options = _answer_pairs(columns, respondent_count)
+    columns_per_respondent = np.bincount(column_respondents, minlength=respondent_count)
+    column_starts = np.cumsum(columns_per_respondent) - columns_per_respondent
+    both = (np.bincount(row_respondents, minlength=respondent_count) > 0) & (columns_per_respondent > 0)
+
+    cell_count = rows.option_count * columns.option_count
+    counts = np.zeros(cell_count, dtype=np.int64)
+    for start in range(0, len(row_respondents), PAIR_CHUNK_SIZE):
+        respondents = row_respondents[start:start + PAIR_CHUNK_SIZE]
+        # Each row pair is repeated once per column pair of its respondent.
+        repeats = columns_per_respondent[respondents]
+        offsets = np.arange(repeats.sum()) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+        paired_columns = column_options[np.repeat(column_starts[respondents], repeats) + offsets]
+        paired_rows = np.repeat(row_options[start:start + PAIR_CHUNK_SIZE], repeats)
+        counts += np.bincount(paired_rows * columns.option_count + paired_columns, minlength=cell_count)
+
+    return Crosstab(
+        counts.reshape(rows.option_count, columns.option_count),
+        np.bincount(row_options[both[row_respondents]], minlength=rows.option_count),
+        np.bincount(column_options[both[column_respondents]], minlength=columns.option_count),
+        int(both.sum()),
+    )
+
+
+def crosstab_table(crosstab: Crosstab) -> pa.Table:
+    """Long table of a crosstab: a row per cell, then the margins and the total with index -1."""
+    row_count, column_count = crosstab.counts.shape
+    rows = np.concatenate([
+        np.repeat(np.arange(row_count), column_count), np.arange(row_count), np.full(column_count, -1), [-1],
+    ])
+    columns = np.concatenate([
+        np.tile(np.arange(column_count), row_count), np.full(row_count, -1), np.arange(column_count), [-1],
+    ])
+    counts = np.concatenate([
+        crosstab.counts.ravel(), crosstab.row_totals, crosstab.column_totals, [crosstab.total],
+    ])
+    return pa.Table.from_arrays(
+        [pa.array(values.astype(np.int64)) for values in (rows, columns, counts)],
+        schema=CROSSTAB_SCHEMA,
+    )
+
+
+def crosstab_from_table(table: pa.Table, row_count: int, column_count: int) -> Crosstab:
+    """Inverse of :func:`crosstab_table`."""
+    rows, columns, counts = (table.column(name).to_numpy() for name in ("row", "column", "count"))
+    cells = (rows >= 0) & (columns >= 0)
+    row_margin = (rows >= 0) & (columns < 0)
+    column_margin = (rows < 0) & (columns >= 0)
+
+    matrix = np.zeros((row_count, column_count), dtype=np.int64)
+    matrix[rows[cells], columns[cells]] = counts[cells]
+    row_totals = np.zeros(row_count, dtype=np.int64)
+    row_totals[rows[row_margin]] = counts[row_margin]
+    column_totals = np.zeros(column_count, dtype=np.int64)
+    column_totals[columns[column_margin]] = counts[column_margin]
+    total = counts[(rows < 0) & (columns < 0)]
+    return Crosstab(matrix, row_totals, column_totals, int(total[0]) if len(total) else 0)
+
+
+def _percentages(counts: np.ndarray, totals: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        shares = np.where(totals > 0, 100 * counts / totals, 0.0)
+    return np.round(shares, 2)
+
+
+def crosstab_response(
+    survey_id: str,
+    row_axis: CrosstabAxis,
+    column_axis: CrosstabAxis,
+    crosstab: Crosstab
+) -> CrosstabResponse:
+    """Counts with row percentages (of the row total) and column percentages (of the column total)."""
+    return CrosstabResponse(
+        survey_id=survey_id,
+        rows=row_axis,
+        columns=column_axis,
+        counts=crosstab.counts.tolist(),
+        row_percent=_percentages(crosstab.counts, crosstab.row_totals[:, None]).tolist(),
+        column_percent=_percentages(crosstab.counts, crosstab.column_totals[None, :]).tolist(),
+        row_totals=crosstab.row_totals.tolist(),
+        column_totals=crosstab.column_totals.tolist(),
+        total=crosstab.total,
+    )
+
+
+def answers_statement(survey_id: str, question_ids: Sequence[str]):
+    """Choice rows of the questions as (question id, respondent id, code), in answer order."""
+    return (
+        select(ChoiceResponse.question_id, ChoiceResponse.respondent_id, AnswerOption.code)
+        .join(AnswerOption, AnswerOption.id == ChoiceResponse.answer_option_id)
+        .where(ChoiceResponse.survey_id == survey_id, ChoiceResponse.question_id.in_(question_ids))
+        .order_by(ChoiceResponse.id)
+    )
+
+
+def crosstab_from_rows(
+    answer_rows: Sequence,
+    row_question: Question,
+    column_question: Question,
+    row_codes: Sequence[int],
+    column_codes: Sequence[int]
+) -> Crosstab:
+    """Encode the rows of :func:`answers_statement` and build the crosstab."""
+    # Column lists are much cheaper to build from result rows than a DataFrame.
+    question_index, question_ids = pd.factorize(np.array([row[0] for row in answer_rows], dtype=object))
+    respondent_index, respondent_ids = pd.factorize(np.array([row[1] for row in answer_rows], dtype=object))
+    codes = np.fromiter((row[2] for row in answer_rows), dtype=np.int64, count=len(answer_rows))
+    question_positions = {question_id: i for i, question_id in enumerate(question_ids)}
+
+    def coded(question: Question, option_codes: Sequence[int]) -> CodedAnswers:
+        mask = question_index == question_positions.get(question.id, -1)
+        return encode_answers(
+            respondent_index[mask],
+            codes[mask],
+            np.asarray(option_codes, dtype=np.int64),
+            question.type == QuestionType.SINGLE,
+        )
+
+    return build_crosstab(coded(row_question, row_codes), coded(column_question, column_codes), len(respondent_ids))
+
+
+class CrosstabService:
+    """Crosstabs of question pairs, on an async session."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_crosstab(self, survey_id: str, row_name: str, column_name: str) -> CrosstabResponse:
+        """Crosstab of two SINGLE/MULTIPLE questions (by name) of a survey."""
+        if await self.db.get(Survey, survey_id) is None:
+            raise HTTPException(status_code=404, detail="Survey not found")
+
+        questions = (await self.db.scalars(
+            select(Question).where(Question.survey_id == survey_id, Question.name.in_([row_name, column_name]))
+        )).all()
+        question_name_map = {q.name: q for q in questions}
+        not_found = [name for name in dict.fromkeys([row_name, column_name]) if name not in question_name_map]
+        if not_found:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Questions not found in survey: {', '.join(not_found)}"
+            )
+        row_question, column_question = question_name_map[row_name], question_name_map[column_name]
+        text_questions = [q.name for q in (row_question, column_question) if q.type == QuestionType.TEXT]
+        if text_questions:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Crosstabs need SINGLE or MULTIPLE questions: {', '.join(dict.fromkeys(text_questions))}"
+            )
+
+        row_axis = await self._axis(row_question)
+        column_axis = await self._axis(column_question)
+        crosstab = await self._crosstab(survey_id, row_question, column_question, row_axis, column_axis)
+        return crosstab_response(survey_id, row_axis, column_axis, crosstab)
+
+    async def _axis(self, question: Question) -> CrosstabAxis:
+        options = (await self.db.execute(
+            select(AnswerOption.code, AnswerOption.label)
+            .where(AnswerOption.question_id == question.id)
+            .order_by(AnswerOption.code)
+        )).all()
+        return CrosstabAxis(
+            question_id=question.name,
+            question_name=question.name,
+            question_type=QUESTION_TYPE_NAMES.get(question.type, "TEXT"),
+            codes=[code for code, _ in options],
+            labels=[label for _, label in options],
+        )
+
+    async def _crosstab(
+        self,
+        survey_id: str,
+        row_question: Question,
+        column_question: Question,
+        row_axis: CrosstabAxis,
+        column_axis: CrosstabAxis
+    ) -> Crosstab:
+        """Crosstab from the result cache, computed and cached on a miss."""
+        if not settings.RESULT_CACHE_ENABLED:
+            return await self._compute(survey_id, row_question, column_question, row_axis, column_axis)
+
+        key = ("crosstab", survey_id, row_question.name, column_question.name)
+        generation = await self.db.scalar(
+            select(DataGeneration.generation).where(DataGeneration.survey_id == survey_id)
+        ) or 0
+        table = await run_in_worker(result_cache.get, key, generation)
+        if table is not None:
+            return crosstab_from_table(table, len(row_axis.codes), len(column_axis.codes))
+
+        crosstab = await self._compute(survey_id, row_question, column_question, row_axis, column_axis)
+        await run_in_worker(result_cache.put, key, generation, crosstab_table(crosstab))
+        return crosstab
+
+    async def _compute(
+        self,
+        survey_id: str,
+        row_question: Question,
+        column_question: Question,
+        row_axis: CrosstabAxis,
+        column_axis: CrosstabAxis
+    ) -> Crosstab:
+        answer_rows = (await self.db.execute(
+            answers_statement(survey_id, list(dict.fromkeys([row_question.id, column_question.id])))
+        )).all()
+        return await run_in_worker(
+            crosstab_from_rows, answer_rows, row_question, column_question, row_axis.codes, column_axis.codes
+        )
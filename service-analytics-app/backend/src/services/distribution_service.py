@@ -0,0 +1,284 @@
+"""
+Answer frequency distributions of survey questions.
+
+Counts are aggregated with ``GROUP BY`` in the database. A respondent counts
+once per answer code and, for SINGLE questions, only with the last answer
+given, as in the response matrix. For MULTIPLE questions the number of
+selections (respondent × code pairs) and of answering respondents differ.
+Results are cached per survey data generation in the result cache as small
+Arrow tables. Distributions of a respondent segment are counted on the
+segment bitmap index instead of in the database.
+"""
+from typing import Dict, List, NamedTuple, Optional, Sequence
+import numpy as np
+import pyarrow as pa
+from fastapi import HTTPException
+from sqlalchemy import and_, distinct, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.models import AnswerOption, ChoiceResponse, DataGeneration, Question, QuestionType, Survey, TextResponse
+from src.schemas import AnswerFrequency, QuestionDistribution, SegmentFilter
+from src.settings import settings
+from src.services.concurrency import run_in_worker
+from src.services.response_matrix import QUESTION_TYPE_NAMES
+from src.services.result_cache import result_cache
+from src.services.segment_index import SurveyIndex
+from src.services.segment_service import SegmentService
+
+DISTRIBUTION_SCHEMA = pa.schema([
+    pa.field("question_name", pa.string(), nullable=False),
+    pa.field("code", pa.int64()),
+    pa.field("label", pa.string()),
+    pa.field("count", pa.int64(), nullable=False),
+    pa.field("respondents", pa.int64(), nullable=False),
+])
+
+
+class OptionCount(NamedTuple):
+    """Respondents who chose an answer option."""
+
+    question_id: str
+    code: int
+    label: str
+    count: int
+
+
+def _percent(part: int, whole: int) -> float:
+    return round(100 * part / whole, 2) if whole else 0.0
+
+
+def distribution_table(
+    questions: Sequence[Question],
+    option_counts: Sequence,
+    respondent_counts: Dict[str, int]
+) -> pa.Table:
+    """Long table of the distributions: a row per answer option, one row with a null code
+    for questions without options. ``respondents`` repeats the question's answering respondents."""
+    options_by_question: Dict[str, list] = {}
+    for row in option_counts:
+        options_by_question.setdefault(row.question_id, []).append(row)
+
+    columns = {field.name: [] for field in DISTRIBUTION_SCHEMA}
+    for question in questions:
+        respondents = respondent_counts.get(question.id, 0)
+        for option in options_by_question.get(question.id) or [None]:
+            columns["question_name"].append(question.name)
+            columns["code"].append(option.code if option else None)
+            columns["label"].append(option.label if option else None)
+            columns["count"].append(option.count if option else 0)
+            columns["respondents"].append(respondents)
+    return pa.Table.from_pydict(columns, schema=DISTRIBUTION_SCHEMA)
+
+
+def segment_distribution_table(
+    questions: Sequence[Question],
+    options: Sequence,
+    index: SurveyIndex,
+    segment: np.ndarray
+) -> pa.Table:
+    """:func:`distribution_table` of the respondents in the ``segment`` bitmap of ``index``.
+
+    ``options`` are ``(question id, code, label)`` rows of the questions' answer options.
+    """
+    question_bitmaps = {q.id: index.questions[q.name] for q in questions}
+    option_counts = []
+    for question_id, code, label in options:
+        option = question_bitmaps[question_id].options.get(code)
+        count = index.count(option & segment) if option is not None else 0
+        option_counts.append(OptionCount(question_id, code, label, count))
+    respondent_counts = {
+        question_id: index.count(bitmaps.answered & segment) for question_id, bitmaps in question_bitmaps.items()
+    }
+    return distribution_table(questions, option_counts, respondent_counts)
+
+
+def distributions_from_table(questions: Sequence[Question], table: pa.Table) -> List[QuestionDistribution]:
+    """:class:`QuestionDistribution` of each question from :func:`distribution_table`."""
+    rows_by_question: Dict[str, list] = {}
+    for row in table.to_pylist():
+        rows_by_question.setdefault(row["question_name"], []).append(row)
+
+    distributions = []
+    for question in questions:
+        question_type = QUESTION_TYPE_NAMES.get(question.type, "TEXT")
+        rows = [row for row in rows_by_question.get(question.name, []) if row["code"] is not None]
+        respondents = rows_by_question[question.name][0]["respondents"]
+        selections = sum(row["count"] for row in rows) if question_type != "TEXT" else respondents
+        distributions.append(QuestionDistribution(
+            question_id=question.name,
+            question_name=question.name,
+            question_type=question_type,
+            respondents=respondents,
+            selections=selections,
+            answers=[
+                AnswerFrequency(
+                    code=row["code"],
+                    label=row["label"],
+                    count=row["count"],
+                    percent=_percent(row["count"], respondents),
+                    selection_percent=(
+                        _percent(row["count"], selections) if question_type == "MULTIPLE" else None
+                    ),
+                )
+                for row in rows
+            ],
+        ))
+    return distributions
+
+
+class DistributionService:
+    """Frequency distributions of questions, on an async session."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_distribution(
+        self,
+        survey_id: str,
+        question_name: str,
+        segment_filter: Optional[SegmentFilter] = None
+    ) -> QuestionDistribution:
+        """Distribution of one question, 404 for an unknown survey or question."""
+        await self._check_survey(survey_id)
+        question = await self.db.scalar(
+            select(Question).where(Question.survey_id == survey_id, Question.name == question_name)
+        )
+        if question is None:
+            raise HTTPException(status_code=404, detail="Question not found")
+        return (await self._distributions(survey_id, [question], segment_filter))[0]
+
+    async def get_distributions(
+        self,
+        survey_id: str,
+        question_names: Optional[List[str]] = None,
+        segment_filter: Optional[SegmentFilter] = None
+    ) -> List[QuestionDistribution]:
+        """Distributions of the named questions in request order, or of every question of the survey.
+
+        With ``segment_filter`` only the matching respondents are counted.
+        """
+        await self._check_survey(survey_id)
+        query = select(Question).where(Question.survey_id == survey_id)
+        if question_names:
+            query = query.where(Question.name.in_(question_names))
+        questions = (await self.db.scalars(query)).all()
+
+        if question_names:
+            question_name_map = {q.name: q for q in questions}
+            not_found = [name for name in question_names if name not in question_name_map]
+            if not_found:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Questions not found in survey: {', '.join(not_found)}"
+                )
+            questions = [question_name_map[name] for name in dict.fromkeys(question_names)]
+
+        if not questions:
+            return []
+        return await self._distributions(survey_id, questions, segment_filter)
+
+    async def _check_survey(self, survey_id: str) -> None:
+        if await self.db.get(Survey, survey_id) is None:
+            raise HTTPException(status_code=404, detail="Survey not found")
+
+    async def _distributions(
+        self,
+        survey_id: str,
+        questions: List[Question],
+        segment_filter: Optional[SegmentFilter] = None
+    ) -> List[QuestionDistribution]:
+        """Distributions from the result cache, computed and cached on a miss."""
+        generation = await self.db.scalar(
+            select(DataGeneration.generation).where(DataGeneration.survey_id == survey_id)
+        ) or 0
+        if not settings.RESULT_CACHE_ENABLED:
+            table = await self._table(survey_id, questions, segment_filter, generation)
+            return await run_in_worker(distributions_from_table, questions, table)
+
+        key = (
+            "distribution",
+            survey_id,
+            tuple(sorted(q.name for q in questions)),
+            segment_filter.cache_key() if segment_filter is not None else None,
+        )
+        table = await run_in_worker(result_cache.get, key, generation)
+        if table is None:
+            table = await self._table(survey_id, questions, segment_filter, generation)
+            await run_in_worker(result_cache.put, key, generation, table)
+        return await run_in_worker(distributions_from_table, questions, table)
+
+    async def _table(
+        self,
+        survey_id: str,
+        questions: List[Question],
+        segment_filter: Optional[SegmentFilter],
+        generation: int
+    ) -> pa.Table:
+        if segment_filter is None:
+            return await self._distribution_table(survey_id, questions)
+
+        index, segment = await SegmentService(self.db).get_segment(survey_id, segment_filter, generation)
+        options = (await self.db.execute(
+            select(AnswerOption.question_id, AnswerOption.code, AnswerOption.label)
+            .where(AnswerOption.question_id.in_([q.id for q in questions]))
+            .order_by(AnswerOption.question_id, AnswerOption.code)
+        )).all()
+        return await run_in_worker(segment_distribution_table, questions, options, index, segment)
+
+    async def _distribution_table(self, survey_id: str, questions: List[Question]) -> pa.Table:
+        """Aggregate the counts of the questions in three ``GROUP BY`` queries."""
+        question_uuids = [q.id for q in questions]
+        single_uuids = [q.id for q in questions if q.type == QuestionType.SINGLE]
+
+        # A SINGLE answer given more than once counts with its last row.
+        latest_single = (
+            select(func.max(ChoiceResponse.id))
+            .join(AnswerOption, AnswerOption.id == ChoiceResponse.answer_option_id)
+            .where(ChoiceResponse.survey_id == survey_id, ChoiceResponse.question_id.in_(single_uuids))
+            .group_by(ChoiceResponse.respondent_id, ChoiceResponse.question_id)
+        )
+
+        # Respondents per (question, option), then joined to every option so unchosen ones count 0.
+        chosen = (
+            select(
+                ChoiceResponse.question_id,
+                ChoiceResponse.answer_option_id,
+                func.count(distinct(ChoiceResponse.respondent_id)).label("count"),
+            )
+            .where(
+                ChoiceResponse.survey_id == survey_id,
+                ChoiceResponse.question_id.in_(question_uuids),
+                or_(ChoiceResponse.question_id.notin_(single_uuids), ChoiceResponse.id.in_(latest_single)),
+            )
+            .group_by(ChoiceResponse.question_id, ChoiceResponse.answer_option_id)
+            .subquery()
+        )
+        option_counts = (await self.db.execute(
+            select(
+                AnswerOption.question_id,
+                AnswerOption.code,
+                AnswerOption.label,
+                func.coalesce(chosen.c.count, 0).label("count"),
+            )
+            .outerjoin(chosen, and_(
+                chosen.c.answer_option_id == AnswerOption.id,
+                chosen.c.question_id == AnswerOption.question_id,
+            ))
+            .where(AnswerOption.question_id.in_(question_uuids))
+            .order_by(AnswerOption.question_id, AnswerOption.code)
+        )).all()
+
+        choice_respondents = await self.db.execute(
+            select(ChoiceResponse.question_id, func.count(distinct(ChoiceResponse.respondent_id)))
+            .join(AnswerOption, AnswerOption.id == ChoiceResponse.answer_option_id)
+            .where(ChoiceResponse.survey_id == survey_id, ChoiceResponse.question_id.in_(question_uuids))
+            .group_by(ChoiceResponse.question_id)
+        )
+        text_respondents = await self.db.execute(
+            select(TextResponse.question_id, func.count(distinct(TextResponse.respondent_id)))
+            .where(TextResponse.survey_id == survey_id, TextResponse.question_id.in_(question_uuids))
+            .group_by(TextResponse.question_id)
+        )
+        respondent_counts = dict(choice_respondents.all())
+        respondent_counts.update(text_respondents.all())
+
+        return distribution_table(questions, option_counts, respondent_counts)
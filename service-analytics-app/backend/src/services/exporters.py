@@ -0,0 +1,215 @@
+"""
+File exports of the respondent × question matrix: CSV, XLSX and Parquet.
+
+An exporter takes the matrix in chunks of whole respondents (as read from a
+server-side cursor) and returns the bytes of the file produced so far, so an
+export streams with memory bounded by one chunk:
+
+- CSV: a header, then a line per respondent;
+- XLSX: an openpyxl write-only workbook, whose rows go to a temporary file;
+  the archive is only complete when the workbook is saved, so its bytes come
+  out at the end, read back from a temporary file;
+- Parquet: one row group per chunk, with the column types of the Arrow
+  encoding (MULTIPLE answers as lists of codes).
+
+In CSV and XLSX a MULTIPLE cell holds its codes joined by ``;``; unanswered
+cells are empty.
+"""
+import csv
+import io
+import tempfile
+from typing import Any, Dict, Iterator, List, Sequence, Type
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+from src.logger import logger
+from src.models import Question
+from src.schemas import ExportFormat
+from src.services.response_encoders import arrow_table
+from src.services.response_matrix import QUESTION_TYPE_NAMES, QuestionColumn, ResponseMatrix
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.CSV: "text/csv",
+    ExportFormat.XLSX: "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ExportFormat.PARQUET: "application/vnd.apache.parquet",
+}
+
+MULTIPLE_SEPARATOR = ";"
+# Data rows per XLSX sheet: the Excel limit minus the header row.
+XLSX_SHEET_ROWS = 1_048_575
+FILE_READ_SIZE = 1024 * 1024
+
+
+def export_columns(questions: Sequence[Question], question_names: Sequence[str]) -> List[QuestionColumn]:
+    """Columns of the export: the requested questions (by name) in request order, each once."""
+    by_name = {q.name: q for q in questions}
+    return [
+        QuestionColumn(by_name[name].id, name, QUESTION_TYPE_NAMES.get(by_name[name].type, "TEXT"))
+        for name in dict.fromkeys(question_names) if name in by_name
+    ]
+
+
+def log_export(questions: Sequence[Question], export_format: ExportFormat, rows: int, seconds: float) -> None:
+    """Log the size and throughput of a finished export."""
+    survey_id = questions[0].survey_id if questions else "-"
+    logger.info(
+        f"Exported {rows} respondents of survey {survey_id} as {export_format.value} "
+        f"in {seconds:.2f}s ({rows / max(seconds, 1e-9):.0f} rows/s)"
+    )
+
+
+def _cell(question_type: str, value: Any) -> Any:
+    if value is None:
+        return None
+    if question_type == "MULTIPLE":
+        return MULTIPLE_SEPARATOR.join(str(code) for code in value)
+    return value
+
+
+def _rows(matrix: ResponseMatrix, questions: Sequence[QuestionColumn]) -> Iterator[List[Any]]:
+    """Rows ``[respondent_id, cell, ...]`` of the matrix in question order."""
+    columns = [
+        [_cell(question.type, value) for value in matrix.columns[question.name]]
+        for question in questions
+    ]
+    for row in zip(matrix.respondent_ids, *columns):
+        yield list(row)
+
+
+class _ChunkSink:
+    """Write-only file object whose written bytes are taken with :meth:`drain`."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class ResponseExporter:
+    """Writer of one export file; ``write`` each chunk, then iterate ``finish``."""
+
+    def __init__(self, questions: Sequence[QuestionColumn]):
+        self.questions = list(questions)
+        self.rows = 0
+
+    def write(self, matrix: ResponseMatrix) -> bytes:
+        """Add the respondents of the chunk; returns the file bytes ready so far."""
+        raise NotImplementedError
+
+    def finish(self) -> Iterator[bytes]:
+        """Remaining bytes of the file."""
+        raise NotImplementedError
+
+
+class CsvExporter(ResponseExporter):
+
+    def __init__(self, questions: Sequence[QuestionColumn]):
+        super().__init__(questions)
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer, lineterminator="\n")
+        self.writer.writerow(["respondent_id"] + [q.name for q in self.questions])
+
+    def write(self, matrix: ResponseMatrix) -> bytes:
+        self.writer.writerows(_rows(matrix, self.questions))
+        self.rows += len(matrix)
+        data = self.buffer.getvalue().encode("utf-8")
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return data
+
+    def finish(self) -> Iterator[bytes]:
+        data = self.buffer.getvalue().encode("utf-8")
+        if data:
+            yield data
+
+
+class XlsxExporter(ResponseExporter):
+
+    def __init__(self, questions: Sequence[QuestionColumn]):
+        super().__init__(questions)
+        self.workbook = Workbook(write_only=True)
+        self.sheet = None
+        self.sheet_rows = XLSX_SHEET_ROWS
+
+    def _next_sheet(self) -> None:
+        title = "responses" if self.sheet is None else f"responses_{len(self.workbook.worksheets) + 1}"
+        self.sheet = self.workbook.create_sheet(title)
+        self.sheet.append(["respondent_id"] + [q.name for q in self.questions])
+        self.sheet_rows = 0
+
+    def write(self, matrix: ResponseMatrix) -> bytes:
+        for row in _rows(matrix, self.questions):
+            if self.sheet_rows >= XLSX_SHEET_ROWS:
+                self._next_sheet()
+            self.sheet.append(row)
+            self.sheet_rows += 1
+        self.rows += len(matrix)
+        return b""
+
+    def finish(self) -> Iterator[bytes]:
+        if self.sheet is None:
+            self._next_sheet()
+        with tempfile.TemporaryFile() as archive:
+            self.workbook.save(archive)
+            archive.seek(0)
+            while True:
+                data = archive.read(FILE_READ_SIZE)
+                if not data:
+                    break
+                yield data
+
+
+class ParquetExporter(ResponseExporter):
+
+    def __init__(self, questions: Sequence[QuestionColumn]):
+        super().__init__(questions)
+        self.names = [q.name for q in self.questions]
+        empty = ResponseMatrix([], self.questions, {q.name: np.empty(0, dtype=object) for q in self.questions})
+        self.schema = arrow_table(empty, self.names).schema
+        self.sink = _ChunkSink()
+        # pyarrow wraps plain Python file objects itself, but then aborts at exit; wrap explicitly.
+        self.writer = pq.ParquetWriter(pa.PythonFile(self.sink, mode="w"), self.schema)
+
+    def write(self, matrix: ResponseMatrix) -> bytes:
+        if len(matrix):
+            self.writer.write_table(arrow_table(matrix, self.names).cast(self.schema))
+        self.rows += len(matrix)
+        return self.sink.drain()
+
+    def finish(self) -> Iterator[bytes]:
+        self.writer.close()
+        data = self.sink.drain()
+        if data:
+            yield data
+
+
+EXPORTERS: Dict[ExportFormat, Type[ResponseExporter]] = {
+    ExportFormat.CSV: CsvExporter,
+    ExportFormat.XLSX: XlsxExporter,
+    ExportFormat.PARQUET: ParquetExporter,
+}
+
+
+def create_exporter(export_format: ExportFormat, questions: Sequence[QuestionColumn]) -> ResponseExporter:
+    """Exporter of the format for the questions, in column order."""
+    return EXPORTERS[export_format](questions)
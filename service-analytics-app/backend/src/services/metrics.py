@@ -0,0 +1,307 @@
+"""
+Per-request performance metrics, exposed in the Prometheus text format.
+
+:class:`MetricsMiddleware` times each HTTP request and records its status and
+response size under the route template (``/api/surveys/{survey_id}/...``), so
+the number of series stays bounded. While a request runs, its
+:class:`RequestStats` sits in a context variable, which worker threads and
+SQLAlchemy's async greenlets inherit:
+
+- engine event hooks (:func:`instrument_engine`) count the statements it runs
+  and the rows fetched from their results, and time statement execution as the
+  ``db`` stage;
+- services time their phases (fetch, assemble, encode, ...) with :func:`stage`.
+
+Outside a request (loaders, CLIs) the hooks and stage timers do nothing.
+Metrics are kept per process, like the result cache.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from src.logger import logger
+from src.settings import settings
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = tuple(float(4 ** power) for power in range(4, 15))  # 256 B .. 256 MiB
+QUERY_BUCKETS = (0.0, 1.0, 2.0, 5.0, 10.0, 20.0, 50.0, 100.0)
+ROW_BUCKETS = (0.0, 10.0, 100.0, 1e3, 1e4, 1e5, 1e6, 1e7)
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class RequestStats:
+    """Counters of one request, updated from the event loop, worker threads and engine hooks."""
+
+    def __init__(self):
+        self.queries = 0
+        self.rows = 0
+        self.stages: Dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def add_stage(self, name: str, seconds: float) -> None:
+        with self.lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def add_rows(self, rows: int) -> None:
+        with self.lock:
+            self.rows += rows
+
+    def add_query(self) -> None:
+        with self.lock:
+            self.queries += 1
+
+
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Add the time spent in the block (or decorated function) to the current request's stage."""
+    stats = _current_request.get()
+    if stats is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.add_stage(name, time.perf_counter() - started)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set."""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # label values -> [count per bucket (last one +Inf)..., sum]
+        self.series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                bucket_labels = _labels(self.label_names, labels, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter per label set."""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.series: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, labels: Tuple[str, ...], value: float = 1) -> None:
+        self.series[labels] = self.series.get(labels, 0) + value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.series.items()):
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {_number(value)}")
+        return lines
+
+
+class RequestMetrics:
+    """Metrics of the HTTP requests served by this process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_progress = 0
+        self.duration = Histogram(
+            "http_request_duration_seconds", "Time from request start to the last response byte.",
+            ("method", "route", "status"), LATENCY_BUCKETS,
+        )
+        self.response_size = Histogram(
+            "http_response_size_bytes", "Response body size.", ("method", "route"), SIZE_BUCKETS,
+        )
+        self.queries = Histogram(
+            "http_request_db_queries", "SQL statements executed per request.", ("method", "route"), QUERY_BUCKETS,
+        )
+        self.rows = Histogram(
+            "http_request_db_rows", "Rows fetched from SQL results per request.", ("method", "route"), ROW_BUCKETS,
+        )
+        self.stages = Histogram(
+            "http_request_stage_seconds", "Time per named stage of a request (db, fetch, assemble, encode, ...).",
+            ("route", "stage"), LATENCY_BUCKETS,
+        )
+        self.queries_total = Counter(
+            "db_queries_total", "SQL statements executed by requests.", ("route",),
+        )
+        self.rows_total = Counter(
+            "db_rows_fetched_total", "Rows fetched from SQL results by requests.", ("route",),
+        )
+
+    def started(self) -> None:
+        with self.lock:
+            self.in_progress += 1
+
+    def finished(self, method: str, route: str, status: int, seconds: float, size: int, stats: RequestStats) -> None:
+        with self.lock:
+            self.in_progress -= 1
+            self.duration.observe((method, route, str(status)), seconds)
+            self.response_size.observe((method, route), size)
+            self.queries.observe((method, route), stats.queries)
+            self.rows.observe((method, route), stats.rows)
+            for name, stage_seconds in stats.stages.items():
+                self.stages.observe((route, name), stage_seconds)
+            self.queries_total.inc((route,), stats.queries)
+            self.rows_total.inc((route,), stats.rows)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self.lock:
+            lines = [
+                "# HELP http_requests_in_progress Requests being served.",
+                "# TYPE http_requests_in_progress gauge",
+                f"http_requests_in_progress {self.in_progress}",
+            ]
+            for metric in (
+                self.duration, self.response_size, self.queries, self.rows,
+                self.stages, self.queries_total, self.rows_total,
+            ):
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+request_metrics = RequestMetrics()
+
+
+def _counting(fetch: Callable, stats: RequestStats) -> Callable:
+    def counted(*args, **kwargs):
+        rows = fetch(*args, **kwargs)
+        if rows:
+            stats.add_rows(len(rows) if isinstance(rows, list) else 1)
+        return rows
+    return counted
+
+
+def _counting_iter(fetch_iter: Callable, stats: RequestStats) -> Callable:
+    def counted():
+        for row in fetch_iter():
+            stats.add_rows(1)
+            yield row
+    return counted
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    stats = _current_request.get()
+    if stats is not None:
+        stats.add_query()
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    stats = _current_request.get()
+    started = conn.info.get("metrics_started")
+    if stats is not None and started:
+        stats.add_stage("db", time.perf_counter() - started.pop())
+
+
+def _after_execute(conn, clauseelement, multiparams, params, execution_options, result) -> None:
+    """Count the rows fetched from the result, however it is consumed (all, iteration, partitions)."""
+    stats = _current_request.get()
+    if stats is None or not getattr(result, "returns_rows", False):
+        return
+    result._fetchone_impl = _counting(result._fetchone_impl, stats)
+    result._fetchmany_impl = _counting(result._fetchmany_impl, stats)
+    result._fetchall_impl = _counting(result._fetchall_impl, stats)
+    result._fetchiter_impl = _counting_iter(result._fetchiter_impl, stats)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Count and time the statements requests run on the engine (the ``sync_engine`` of an async one)."""
+    if event.contains(engine, "after_execute", _after_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "after_execute", _after_execute)
+
+
+def server_timing(stats: RequestStats) -> bytes:
+    """``Server-Timing`` header value with the stages timed so far."""
+    entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in stats.stages.items()]
+    entries.append(f'queries;desc="{stats.queries} queries, {stats.rows} rows"')
+    return ", ".join(entries).encode("latin-1")
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status, response size and query counts per route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current_request.set(stats)
+        started = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_with_metrics(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if settings.METRICS_SERVER_TIMING:
+                    message = dict(message)
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", server_timing(stats))]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        request_metrics.started()
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            _current_request.reset(token)
+            seconds = time.perf_counter() - started
+            route = getattr(scope.get("route"), "path", None) or UNMATCHED_ROUTE
+            request_metrics.finished(scope["method"], route, status, seconds, size, stats)
+            if settings.METRICS_SLOW_REQUEST_SECONDS and seconds >= settings.METRICS_SLOW_REQUEST_SECONDS:
+                logger.warning(
+                    "Slow request %s %s: %.3fs, status %d, %d bytes, %d queries, %d rows, stages %s",
+                    scope["method"], scope["path"], seconds, status, size, stats.queries, stats.rows,
+                    {name: round(value, 4) for name, value in stats.stages.items()},
+                )
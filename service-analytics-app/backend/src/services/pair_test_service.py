@@ -0,0 +1,146 @@
+"""
+Persisted chi-square tests of all question pairs of a survey.
+
+Reads return the stored results of the survey's current data generation. When
+they are missing or stale (the batch job has not run since the last load),
+the tests are computed once, stored, and served from the table afterwards.
+"""
+import asyncio
+import time
+from collections import defaultdict
+from typing import Dict, Optional
+from fastapi import HTTPException
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from src.logger import logger
+from src.models import DataGeneration, PairTestRun, Question, QuestionPairTest, Survey
+from src.schemas import PairTestResult, PairTestsResponse
+from src.settings import settings
+from src.loading.survey_records import resolve_workers
+from src.services.concurrency import run_in_worker
+from src.services.pair_tests import (
+    answer_options_statement,
+    choice_rows_statement,
+    coded_questions_statement,
+    compute_pair_tests,
+    option_lookups,
+    pair_test_rows,
+    run_values,
+)
+from src.services.segment_index import encode_choice_rows
+
+# Requests for a survey whose tests are being computed wait for that run.
+_run_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+
+class PairTestService:
+    """Pair tests of surveys, on an async session."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_pair_tests(
+        self,
+        survey_id: str,
+        max_p: Optional[float] = None,
+        limit: Optional[int] = None
+    ) -> PairTestsResponse:
+        """Tests of the survey's question pairs, most significant first."""
+        if await self.db.get(Survey, survey_id) is None:
+            raise HTTPException(status_code=404, detail="Survey not found")
+        run = await self.get_run(survey_id)
+
+        row_question, column_question = aliased(Question), aliased(Question)
+        statement = (
+            select(
+                row_question.name.label("row_question"),
+                column_question.name.label("column_question"),
+                QuestionPairTest.respondents,
+                QuestionPairTest.observations,
+                QuestionPairTest.chi_square,
+                QuestionPairTest.dof,
+                QuestionPairTest.p_value,
+                QuestionPairTest.cramers_v,
+            )
+            .join(row_question, row_question.id == QuestionPairTest.row_question_id)
+            .join(column_question, column_question.id == QuestionPairTest.column_question_id)
+            .where(QuestionPairTest.survey_id == survey_id)
+            .order_by(
+                QuestionPairTest.p_value.is_(None),
+                QuestionPairTest.p_value,
+                QuestionPairTest.chi_square.desc(),
+                row_question.name,
+                column_question.name,
+            )
+        )
+        if max_p is not None:
+            statement = statement.where(QuestionPairTest.p_value <= max_p)
+        if limit is not None:
+            statement = statement.limit(limit)
+        rows = (await self.db.execute(statement)).all()
+
+        return PairTestsResponse(
+            survey_id=survey_id,
+            generation=run.generation,
+            computed_at=run.built_at,
+            question_count=run.question_count,
+            pair_count=run.pair_count,
+            results=[PairTestResult(**row._mapping) for row in rows],
+        )
+
+    async def get_run(self, survey_id: str) -> PairTestRun:
+        """Run of the survey's current data generation, computing the tests if needed."""
+        generation = await self.db.scalar(
+            select(DataGeneration.generation).where(DataGeneration.survey_id == survey_id)
+        ) or 0
+        run = await self.db.get(PairTestRun, survey_id)
+        if run is not None and run.generation == generation:
+            return run
+        async with _run_locks[survey_id]:
+            run = await self.db.get(PairTestRun, survey_id, populate_existing=True)
+            if run is None or run.generation != generation:
+                run = await self._run(survey_id, generation)
+        return run
+
+    async def _run(self, survey_id: str, generation: int) -> PairTestRun:
+        """Compute and store the tests, reading choice rows from a server-side cursor."""
+        started = time.perf_counter()
+        questions = (await self.db.scalars(coded_questions_statement(survey_id))).all()
+        options = (await self.db.execute(answer_options_statement([q.id for q in questions]))).all()
+        question_positions, option_codes, question_codes = option_lookups(questions, options)
+
+        parts = []
+        connection = await self.db.connection()
+        result = await connection.stream(
+            choice_rows_statement(survey_id).execution_options(yield_per=settings.SEGMENT_INDEX_CHUNK_SIZE)
+        )
+        async for partition in result.partitions():
+            parts.append(await run_in_worker(encode_choice_rows, partition, question_positions, option_codes))
+        tests = await run_in_worker(
+            compute_pair_tests,
+            parts,
+            questions,
+            question_codes,
+            resolve_workers(settings.PAIR_TESTS_WORKERS),
+            settings.PAIR_TESTS_CHUNK_SIZE,
+        )
+
+        await self.db.execute(delete(QuestionPairTest).where(QuestionPairTest.survey_id == survey_id))
+        rows = pair_test_rows(survey_id, questions, tests)
+        if rows:
+            await self.db.execute(insert(QuestionPairTest), rows)
+        values = run_values(generation, questions, tests, started)
+        run = await self.db.get(PairTestRun, survey_id)
+        if run is None:
+            run = PairTestRun(survey_id=survey_id, **values)
+            self.db.add(run)
+        else:
+            for field, value in values.items():
+                setattr(run, field, value)
+        await self.db.commit()
+        logger.info(
+            f"Pair tests of survey {survey_id} (generation {generation}): {run.pair_count} pairs of "
+            f"{run.question_count} questions in {run.seconds:.2f}s"
+        )
+        return run
@@ -0,0 +1,333 @@
+"""
+Chi-square tests of independence for every pair of coded questions of a survey.
+
+Answers are encoded as one respondent × option indicator matrix ``A`` over all
+SINGLE/MULTIPLE questions (a SINGLE question counts the last answer of a
+respondent, as in the response matrix), followed by one "answered" column per
+question. The Gram matrix ``A.T @ A`` holds the contingency table of every
+question pair at once, and the number of respondents who answered both. It is
+additive over respondents, so respondent chunks are multiplied in a process
+pool and summed. The statistics of all pairs then come from a few matrix
+products over the tables, without a loop over pairs.
+
+A table involving a MULTIPLE question counts selections, so its test treats
+every selection as an observation. Options nobody chose within a pair's base
+are left out of that pair's degrees of freedom.
+"""
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from src.models import AnswerOption, ChoiceResponse, Question, QuestionType
+
+# Chunks are multiplied in float32, exact while a count stays below 2**24.
+MAX_CHUNK_SIZE = 1 << 24
+SF_EPSILON = 1e-14
+SF_MAX_ITERATIONS = 10_000
+SF_TINY = 1e-300
+
+
+class PairTests(NamedTuple):
+    """Test results of the pairs ``(row[k], column[k])`` of question positions, ``row < column``."""
+
+    row: np.ndarray
+    column: np.ndarray
+    respondents: np.ndarray
+    observations: np.ndarray
+    chi_square: np.ndarray
+    dof: np.ndarray
+    p_value: np.ndarray
+    cramers_v: np.ndarray
+    respondent_count: int
+
+
+def choice_rows_statement(survey_id: str):
+    """Choice rows of a survey as (question id, respondent id, answer option id), in answer order."""
+    return (
+        select(ChoiceResponse.question_id, ChoiceResponse.respondent_id, ChoiceResponse.answer_option_id)
+        .where(ChoiceResponse.survey_id == survey_id)
+        .order_by(ChoiceResponse.id)
+    )
+
+
+def coded_questions_statement(survey_id: str):
+    """SINGLE/MULTIPLE questions of a survey, in the order of their positions in the tests."""
+    return (
+        select(Question)
+        .where(Question.survey_id == survey_id, Question.type != QuestionType.TEXT)
+        .order_by(Question.id)
+    )
+
+
+def answer_options_statement(question_ids: Sequence[str]):
+    """Answer options of the questions as (question id, option id, code)."""
+    return (
+        select(AnswerOption.question_id, AnswerOption.id, AnswerOption.code)
+        .where(AnswerOption.question_id.in_(question_ids))
+    )
+
+
+def option_lookups(
+    questions: Sequence[Question],
+    options: Sequence
+) -> Tuple[Dict[str, int], Dict[str, int], List[List[int]]]:
+    """Question positions by id, codes by option id and the codes of each question,
+    from the rows of :func:`answer_options_statement`."""
+    question_positions = {q.id: i for i, q in enumerate(questions)}
+    option_codes = {option_id: code for _, option_id, code in options}
+    question_codes: List[List[int]] = [[] for _ in questions]
+    for question_id, _, code in options:
+        question_codes[question_positions[question_id]].append(code)
+    return question_positions, option_codes, question_codes
+
+
+def encode_indicator(
+    question_index: np.ndarray,
+    respondent_ids: np.ndarray,
+    codes: np.ndarray,
+    single: np.ndarray,
+    option_codes: Sequence[np.ndarray]
+) -> Tuple[np.ndarray, np.ndarray, int]:
+    """Nonzero ``(respondent, column)`` cells of the indicator matrix, sorted by respondent.
+
+    Inputs are the rows of ``encode_choice_rows``: question positions (-1 for
+    other questions), respondent ids and codes (-1 for unknown answer
+    options). Columns ``0..K-1`` are the options of the questions in position
+    order, each question's codes sorted; column ``K + q`` flags an answer to
+    question ``q``. Returns the cells and the respondent count.
+    """
+    question_count = len(option_codes)
+    option_count = sum(len(question_codes) for question_codes in option_codes)
+    keep = (question_index >= 0) & (codes >= 0)
+    respondents, unique_ids = pd.factorize(respondent_ids[keep])
+    questions, codes = question_index[keep], codes[keep]
+
+    # Columns by binary search over the (question, code) keys of all options.
+    stride = int(max([codes.max(initial=0)] + [c.max(initial=0) for c in option_codes])) + 1
+    option_keys = np.concatenate(
+        [q * stride + np.asarray(c, dtype=np.int64) for q, c in enumerate(option_codes)] or [np.empty(0, np.int64)]
+    )
+    keys = questions * stride + codes
+    columns = np.searchsorted(option_keys, keys)
+    known = columns < option_count
+    known[known] = option_keys[columns[known]] == keys[known]
+    respondents, questions, columns = respondents[known], questions[known], columns[known]
+
+    # A SINGLE question keeps the last answer of each respondent.
+    single_rows = np.flatnonzero(single[questions])[::-1]
+    _, last = np.unique(respondents[single_rows] * question_count + questions[single_rows], return_index=True)
+    rows = np.sort(np.concatenate([single_rows[last], np.flatnonzero(~single[questions])]))
+    respondents, questions, columns = respondents[rows], questions[rows], columns[rows]
+
+    respondents = np.concatenate([respondents, respondents])
+    columns = np.concatenate([columns, option_count + questions])
+    order = np.argsort(respondents, kind="stable")
+    return respondents[order], columns[order], len(unique_ids)
+
+
+def chunk_gram(respondents: np.ndarray, columns: np.ndarray, start: int, stop: int, width: int) -> np.ndarray:
+    """``A.T @ A`` of the indicator rows of respondents ``start..stop-1``."""
+    block = np.zeros((stop - start, width), dtype=np.float32)
+    block[respondents - start, columns] = 1.0
+    return np.rint(block.T @ block).astype(np.int64)
+
+
+def indicator_gram(
+    respondents: np.ndarray,
+    columns: np.ndarray,
+    respondent_count: int,
+    width: int,
+    workers: int = 1,
+    chunk_size: int = 20_000
+) -> np.ndarray:
+    """``A.T @ A`` summed over respondent chunks, in a process pool when ``workers`` > 1."""
+    chunk_size = max(1, min(chunk_size, MAX_CHUNK_SIZE))
+    starts = np.arange(0, respondent_count, chunk_size)
+    stops = np.minimum(starts + chunk_size, respondent_count)
+    bounds = np.searchsorted(respondents, np.append(starts, respondent_count))
+    chunks = [
+        (respondents[bounds[i]:bounds[i + 1]], columns[bounds[i]:bounds[i + 1]], int(start), int(stop), width)
+        for i, (start, stop) in enumerate(zip(starts, stops))
+    ]
+
+    gram = np.zeros((width, width), dtype=np.int64)
+    if workers <= 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            gram += chunk_gram(*chunk)
+        return gram
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+        for partial_gram in pool.map(chunk_gram, *zip(*chunks)):
+            gram += partial_gram
+    return gram
+
+
+def chi2_sf(statistic: np.ndarray, dof: np.ndarray) -> np.ndarray:
+    """Upper tail probability of the chi-square distribution, ``Q(dof / 2, statistic / 2)``.
+
+    The regularized incomplete gamma function is evaluated with its series
+    below ``a + 1`` and with its continued fraction (modified Lentz) above,
+    both on whole arrays. ``NaN`` where ``dof`` is not positive.
+    """
+    a = np.asarray(dof, dtype=np.float64) / 2
+    x = np.maximum(np.asarray(statistic, dtype=np.float64), 0.0) / 2
+    result = np.full(np.broadcast(a, x).shape, np.nan)
+    a, x = np.broadcast_arrays(a, x)
+    valid = a > 0
+    log_gamma = np.zeros_like(a)
+    log_gamma[valid] = [math.lgamma(value) for value in a[valid]]
+    with np.errstate(divide="ignore"):
+        log_prefix = a * np.log(x) - x - log_gamma
+
+    series = valid & (x < a + 1)
+    if series.any():
+        sa, sx = a[series], x[series]
+        term = 1.0 / sa
+        total = term.copy()
+        denominator = sa.copy()
+        for _ in range(SF_MAX_ITERATIONS):
+            denominator += 1
+            term *= sx / denominator
+            total += term
+            if np.all(term < total * SF_EPSILON):
+                break
+        result[series] = 1.0 - total * np.exp(log_prefix[series])
+
+    fraction = valid & ~series
+    if fraction.any():
+        fa, fx = a[fraction], x[fraction]
+        b = fx + 1 - fa
+        c = np.full_like(fx, 1 / SF_TINY)
+        d = 1 / b
+        h = d.copy()
+        for i in range(1, SF_MAX_ITERATIONS):
+            an = -i * (i - fa)
+            b += 2
+            d = an * d + b
+            d[np.abs(d) < SF_TINY] = SF_TINY
+            c = b + an / c
+            c[np.abs(c) < SF_TINY] = SF_TINY
+            d = 1 / d
+            delta = d * c
+            h *= delta
+            if np.all(np.abs(delta - 1) < SF_EPSILON):
+                break
+        result[fraction] = np.exp(log_prefix[fraction]) * h
+
+    return np.clip(result, 0.0, 1.0)
+
+
+def chi_square_tests(gram: np.ndarray, option_question: np.ndarray, question_count: int) -> PairTests:
+    """Tests of all question pairs from the Gram matrix of the indicator matrix.
+
+    ``option_question[a]`` is the question position of option column ``a``.
+    For options ``a`` and ``b`` of questions ``i`` and ``j``, the expected count
+    is ``S[a, j] * S[b, i] / N[i, j]``, where ``S[a, j]`` is the total of
+    option ``a`` in the table of ``i`` with ``j`` and ``N[i, j]`` the total of
+    that table.
+    """
+    option_count = len(option_question)
+    counts = gram[:option_count, :option_count].astype(np.float64)
+    membership = np.zeros((option_count, question_count))
+    membership[np.arange(option_count), option_question] = 1.0
+
+    totals = counts @ membership
+    observations = membership.T @ totals
+    cell_totals = totals[:, option_question]
+    cell_observations = observations[np.ix_(option_question, option_question)]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        expected = np.where(cell_observations > 0, cell_totals * cell_totals.T / cell_observations, 0.0)
+        contributions = np.where(expected > 0, (counts - expected) ** 2 / expected, 0.0)
+    chi_square = membership.T @ contributions @ membership
+    used_options = np.rint(membership.T @ (totals > 0)).astype(np.int64)
+    dof = np.maximum(used_options - 1, 0) * np.maximum(used_options.T - 1, 0)
+
+    row, column = np.triu_indices(question_count, 1)
+    pair_observations = np.rint(observations[row, column]).astype(np.int64)
+    pair_chi_square = chi_square[row, column]
+    pair_dof = dof[row, column]
+    smaller_side = np.minimum(used_options[row, column], used_options[column, row]) - 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cramers_v = np.where(
+            (pair_dof > 0) & (pair_observations > 0),
+            np.sqrt(pair_chi_square / (pair_observations * np.maximum(smaller_side, 1))),
+            np.nan,
+        )
+    return PairTests(
+        row=row,
+        column=column,
+        respondents=gram[option_count:, option_count:][row, column],
+        observations=pair_observations,
+        chi_square=pair_chi_square,
+        dof=pair_dof,
+        p_value=chi2_sf(pair_chi_square, pair_dof),
+        cramers_v=cramers_v,
+        respondent_count=0,
+    )
+
+
+def compute_pair_tests(
+    parts: Sequence[Tuple[np.ndarray, np.ndarray, np.ndarray]],
+    questions: Sequence[Question],
+    option_codes: Sequence[Sequence[int]],
+    workers: int = 1,
+    chunk_size: int = 20_000
+) -> PairTests:
+    """Tests of all pairs of ``questions`` from ``encode_choice_rows`` partitions.
+
+    Question positions in the partitions index ``questions``; ``option_codes``
+    are the answer codes of each question.
+    """
+    option_codes = [np.unique(np.asarray(codes, dtype=np.int64)) for codes in option_codes]
+    single = np.array([q.type == QuestionType.SINGLE for q in questions], dtype=bool)
+    respondents, columns, respondent_count = encode_indicator(
+        np.concatenate([part[0] for part in parts] or [np.empty(0, np.int64)]),
+        np.concatenate([part[1] for part in parts] or [np.empty(0, object)]),
+        np.concatenate([part[2] for part in parts] or [np.empty(0, np.int64)]),
+        single,
+        option_codes,
+    )
+    option_question = np.repeat(np.arange(len(questions)), [len(codes) for codes in option_codes])
+    width = len(option_question) + len(questions)
+    gram = indicator_gram(respondents, columns, respondent_count, width, workers, chunk_size)
+    return chi_square_tests(gram, option_question, len(questions))._replace(respondent_count=respondent_count)
+
+
+def pair_test_rows(survey_id: str, questions: Sequence[Question], tests: PairTests) -> List[Dict]:
+    """Rows of ``question_pair_tests`` for the results."""
+
+    def optional(value: float) -> Optional[float]:
+        return None if math.isnan(value) else float(value)
+
+    return [
+        {
+            "survey_id": survey_id,
+            "row_question_id": questions[row].id,
+            "column_question_id": questions[column].id,
+            "respondents": int(respondents),
+            "observations": int(observations),
+            "chi_square": float(chi_square),
+            "dof": int(dof),
+            "p_value": optional(p_value),
+            "cramers_v": optional(cramers_v),
+        }
+        for row, column, respondents, observations, chi_square, dof, p_value, cramers_v in zip(
+            tests.row, tests.column, tests.respondents, tests.observations,
+            tests.chi_square, tests.dof, tests.p_value, tests.cramers_v,
+        )
+    ]
+
+
+def run_values(generation: int, questions: Sequence[Question], tests: PairTests, started: float) -> Dict[str, Any]:
+    """Fields of the ``pair_test_runs`` entry of a computation started at ``started`` (perf counter)."""
+    return {
+        "generation": generation,
+        "question_count": len(questions),
+        "pair_count": len(tests.row),
+        "respondent_count": tests.respondent_count,
+        "seconds": time.perf_counter() - started,
+        "built_at": datetime.utcnow(),
+    }
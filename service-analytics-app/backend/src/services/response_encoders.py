@@ -0,0 +1,191 @@
+"""
+Wire encodings of response matrices.
+"""
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+import orjson
+import pyarrow as pa
+from src.schemas import ResponseFormat
+from src.services.response_matrix import QuestionColumn, ResponseMatrix, default_value
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+ARROW_VALUE_TYPES = {
+    "TEXT": pa.string(),
+    "SINGLE": pa.int64(),
+    "MULTIPLE": pa.list_(pa.int64()),
+}
+
+
+def _encoded_column(question: QuestionColumn, column) -> List[bytes]:
+    """``ResponseData`` JSON of every cell of a question column."""
+    dumps = orjson.dumps
+    prefix = (
+        b'{"question_id":' + dumps(question.name)
+        + b',"question_name":' + dumps(question.name)
+        + b',"question_type":' + dumps(question.type)
+        + b',"value":'
+    )
+    unanswered = prefix + dumps(default_value(question.type)) + b"}"
+    return [unanswered if value is None else prefix + dumps(value) + b"}" for value in column]
+
+
+def encode_respondents(matrix: ResponseMatrix, question_names: Sequence[str]) -> List[bytes]:
+    """``RespondentResponseData`` JSON of every respondent of the matrix.
+
+    Cells are encoded column by column with the key prefix of each question
+    encoded once, so no per-cell dicts or models are built. The bytes are the
+    same as FastAPI renders for the Pydantic models.
+    """
+    dumps = orjson.dumps
+    columns = [
+        _encoded_column(matrix.questions_by_name[name], matrix.columns[name])
+        for name in question_names if name in matrix.questions_by_name
+    ]
+    if not columns:
+        return [b'{"respondent_id":' + dumps(r) + b',"responses":[]}' for r in matrix.respondent_ids]
+    return [
+        b'{"respondent_id":' + dumps(respondent_id) + b',"responses":[' + b",".join(cells) + b"]}"
+        for respondent_id, cells in zip(matrix.respondent_ids, zip(*columns))
+    ]
+
+
+def encode_responses_json(
+    matrix: ResponseMatrix,
+    question_names: Sequence[str],
+    next_cursor: Optional[str] = None
+) -> bytes:
+    """``GetResponsesResponse`` JSON of the matrix."""
+    return (
+        b'{"respondents":[' + b",".join(encode_respondents(matrix, question_names))
+        + b'],"next_cursor":' + orjson.dumps(next_cursor) + b"}"
+    )
+
+
+def _distinct_questions(matrix: ResponseMatrix, question_names: Sequence[str]) -> List[QuestionColumn]:
+    """Questions of the matrix in request order, each once."""
+    return [
+        matrix.questions_by_name[name]
+        for name in dict.fromkeys(question_names) if name in matrix.questions_by_name
+    ]
+
+
+def encode_columnar_json(
+    matrix: ResponseMatrix,
+    question_names: Sequence[str],
+    next_cursor: Optional[str] = None
+) -> bytes:
+    """``ColumnarResponsesResponse`` JSON: a question header, respondent ids and a value list per question."""
+    questions = _distinct_questions(matrix, question_names)
+    values = []
+    for question in questions:
+        unanswered = default_value(question.type)
+        values.append([unanswered if value is None else value for value in matrix.columns[question.name]])
+    return orjson.dumps({
+        "questions": [
+            {"question_id": q.name, "question_name": q.name, "question_type": q.type}
+            for q in questions
+        ],
+        "respondent_ids": matrix.respondent_ids,
+        "values": values,
+        "next_cursor": next_cursor,
+    })
+
+
+def arrow_table(
+    matrix: ResponseMatrix,
+    question_names: Sequence[str],
+    next_cursor: Optional[str] = None
+) -> pa.Table:
+    """Arrow table with a ``respondent_id`` column and one typed column per question.
+
+    Unanswered cells are nulls. Each question column carries its type and
+    database id in the field metadata; the cursor of the next page is stored
+    in the schema metadata.
+    """
+    questions = _distinct_questions(matrix, question_names)
+    fields = [pa.field("respondent_id", pa.string(), nullable=False)]
+    arrays = [pa.array(matrix.respondent_ids, type=pa.string())]
+    for question in questions:
+        value_type = ARROW_VALUE_TYPES[question.type]
+        metadata = {"question_type": question.type, "question_uuid": question.id}
+        fields.append(pa.field(question.name, value_type, metadata=metadata))
+        arrays.append(pa.array(matrix.columns[question.name], type=value_type))
+
+    metadata = {"next_cursor": next_cursor} if next_cursor is not None else None
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields, metadata=metadata))
+
+
+def _object_column(column: pa.ChunkedArray) -> np.ndarray:
+    """Object array of Python values with ``None`` for nulls."""
+    if pa.types.is_list(column.type):
+        return np.fromiter(column.to_pylist(), dtype=object, count=len(column))
+    values = np.full(len(column), None, dtype=object)
+    valid = column.is_valid().to_numpy(zero_copy_only=False)
+    values[valid] = column.drop_null().to_numpy(zero_copy_only=False).astype(object)
+    return values
+
+
+def matrix_from_arrow(table: pa.Table) -> Tuple[ResponseMatrix, Optional[str]]:
+    """Inverse of :func:`arrow_table`: the matrix and the next-page cursor."""
+    questions = []
+    columns = {}
+    for field, column in zip(table.schema, table.columns):
+        if field.name == "respondent_id":
+            continue
+        metadata = field.metadata or {}
+        questions.append(QuestionColumn(
+            metadata.get(b"question_uuid", b"").decode(),
+            field.name,
+            metadata[b"question_type"].decode(),
+        ))
+        columns[field.name] = _object_column(column)
+
+    cursor = (table.schema.metadata or {}).get(b"next_cursor")
+    matrix = ResponseMatrix(table.column("respondent_id").to_pylist(), questions, columns)
+    return matrix, cursor.decode() if cursor is not None else None
+
+
+def encode_arrow(
+    matrix: ResponseMatrix,
+    question_names: Sequence[str],
+    next_cursor: Optional[str] = None
+) -> bytes:
+    """Arrow IPC stream of :func:`arrow_table`."""
+    table = arrow_table(matrix, question_names, next_cursor)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+RESPONSE_ENCODERS: Dict[ResponseFormat, Callable[..., bytes]] = {
+    ResponseFormat.ROWS: encode_responses_json,
+    ResponseFormat.COLUMNAR: encode_columnar_json,
+    ResponseFormat.ARROW: encode_arrow,
+}
+
+RESPONSE_MEDIA_TYPES = {
+    ResponseFormat.ROWS: "application/json",
+    ResponseFormat.COLUMNAR: "application/json",
+    ResponseFormat.ARROW: ARROW_STREAM_MEDIA_TYPE,
+}
+
+
+def encode_response_page(
+    matrix: ResponseMatrix,
+    question_names: Sequence[str],
+    next_cursor: Optional[str],
+    response_format: ResponseFormat
+) -> bytes:
+    """Encode a page of responses in the requested wire format."""
+    return RESPONSE_ENCODERS[response_format](matrix, question_names, next_cursor)
+
+
+def iter_ndjson(matrices: Iterable[ResponseMatrix], question_names: Sequence[str]) -> Iterator[bytes]:
+    """Yield one JSON line per respondent, one matrix chunk at a time."""
+    for matrix in matrices:
+        lines = encode_respondents(matrix, question_names)
+        if lines:
+            yield b"\n".join(lines) + b"\n"
@@ -0,0 +1,198 @@
+"""
+Columnar assembly of the respondent × question response table.
+"""
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+import numpy as np
+import pandas as pd
+from src.models import Question, QuestionType
+
+QUESTION_TYPE_NAMES = {
+    QuestionType.TEXT: "TEXT",
+    QuestionType.SINGLE: "SINGLE",
+    QuestionType.MULTIPLE: "MULTIPLE",
+}
+
+TEXT_ROW_COLUMNS = ["respondent_id", "question_id", "text"]
+CHOICE_ROW_COLUMNS = ["respondent_id", "question_id", "code", "response_order"]
+
+
+class QuestionColumn(NamedTuple):
+    """Question of a response matrix column."""
+
+    id: str
+    name: str
+    type: str
+
+
+def default_value(question_type: str) -> Any:
+    """Value of a cell the respondent did not answer."""
+    return [] if question_type == "MULTIPLE" else ""
+
+
+class ResponseMatrix:
+    """Response values of respondents (rows) for questions (columns).
+
+    ``columns`` maps a question name to an object array aligned with
+    ``respondent_ids``; ``None`` marks an unanswered cell.
+    """
+
+    def __init__(
+        self,
+        respondent_ids: List[str],
+        questions: List[QuestionColumn],
+        columns: Dict[str, np.ndarray]
+    ):
+        self.respondent_ids = respondent_ids
+        self.questions = questions
+        self.columns = columns
+        self.questions_by_name = {q.name: q for q in questions}
+
+    def __len__(self) -> int:
+        return len(self.respondent_ids)
+
+    def value(self, question_name: str, row: int) -> Any:
+        """Cell value with unanswered cells replaced by the question's default."""
+        value = self.columns[question_name][row]
+        if value is None:
+            return default_value(self.questions_by_name[question_name].type)
+        return value
+
+    def iter_rows(self, question_names: Sequence[str]):
+        """Yield ``(respondent_id, [(question, value), ...])`` in row order."""
+        selected = [
+            (self.questions_by_name[name], self.columns[name])
+            for name in question_names if name in self.questions_by_name
+        ]
+        for row, respondent_id in enumerate(self.respondent_ids):
+            cells = []
+            for question, column in selected:
+                value = column[row]
+                cells.append((question, default_value(question.type) if value is None else value))
+            yield respondent_id, cells
+
+
+def _question_codes(question_ids: pd.Series, position_by_id: Dict[str, int]) -> np.ndarray:
+    """Column positions of question ids (-1 for ids outside the matrix)."""
+    return question_ids.map(position_by_id).fillna(-1).astype(np.int64).to_numpy()
+
+
+def _group_bounds(*keys: np.ndarray) -> np.ndarray:
+    """Start offsets of runs of equal keys in sorted arrays, plus the end offset."""
+    size = len(keys[0])
+    changed = np.zeros(max(size - 1, 0), dtype=bool)
+    for key in keys:
+        changed |= key[1:] != key[:-1]
+    return np.concatenate(([0], np.flatnonzero(changed) + 1, [size]))
+
+
+def _row_frame(rows: Union[pd.DataFrame, Sequence[tuple]], columns: List[str]) -> pd.DataFrame:
+    """Frame of raw rows with a fresh index; frames are taken as they are."""
+    if isinstance(rows, pd.DataFrame):
+        return rows[columns].reset_index(drop=True)
+    return pd.DataFrame.from_records(rows, columns=columns)
+
+
+def build_response_matrix(
+    questions: Sequence[Question],
+    text_rows: Union[pd.DataFrame, Sequence[Tuple[str, str, str]]],
+    choice_rows: Union[pd.DataFrame, Sequence[Tuple[str, str, Optional[int], Optional[int]]]],
+    respondent_order: Optional[Sequence[str]] = None
+) -> ResponseMatrix:
+    """Pivot raw response rows into a :class:`ResponseMatrix`.
+
+    Respondents appear in the order they first occur in ``text_rows`` followed
+    by ``choice_rows``, or in ``respondent_order`` when it is given (rows of
+    other respondents are then ignored). A TEXT cell keeps the first text, a
+    SINGLE cell the last code, and a MULTIPLE cell its distinct codes sorted by
+    ``response_order``. Choice rows without a code only register the respondent.
+    """
+    columns_meta = [
+        QuestionColumn(q.id, q.name, QUESTION_TYPE_NAMES.get(q.type, "TEXT")) for q in questions
+    ]
+    position_by_id = {q.id: i for i, q in enumerate(columns_meta)}
+
+    texts = _row_frame(text_rows, TEXT_ROW_COLUMNS)
+    choices = _row_frame(choice_rows, CHOICE_ROW_COLUMNS)
+
+    all_respondents = np.concatenate(
+        [texts["respondent_id"].to_numpy(object), choices["respondent_id"].to_numpy(object)]
+    )
+    if respondent_order is None:
+        respondent_rows, respondent_ids = pd.factorize(all_respondents)
+    else:
+        respondent_ids = pd.Index(respondent_order, dtype=object)
+        respondent_rows = respondent_ids.get_indexer(all_respondents)
+    size = len(respondent_ids)
+
+    cells = [np.full(size, None, dtype=object) for _ in columns_meta]
+
+    texts["row"] = respondent_rows[:len(texts)]
+    choices["row"] = respondent_rows[len(texts):]
+    texts = texts[texts["row"] >= 0]
+
+    if not texts.empty:
+        texts["col"] = _question_codes(texts["question_id"], position_by_id)
+        texts = texts[texts["col"] >= 0].drop_duplicates(["row", "col"], keep="first")
+        for col, group in texts.groupby("col", sort=False):
+            cells[col][group["row"].to_numpy()] = group["text"].tolist()
+
+    choices = choices[choices["code"].notna() & (choices["row"] >= 0)]
+    if not choices.empty:
+        choices = choices.assign(
+            col=_question_codes(choices["question_id"], position_by_id),
+            code=choices["code"].astype(np.int64),
+        )
+        choices = choices[choices["col"] >= 0]
+        is_single = np.array([q.type == "SINGLE" for q in columns_meta], dtype=bool)[choices["col"].to_numpy()]
+
+        single = choices[is_single].drop_duplicates(["row", "col"], keep="last")
+        for col, group in single.groupby("col", sort=False):
+            cells[col][group["row"].to_numpy()] = group["code"].tolist()
+
+        multiple = (
+            choices[~is_single]
+            .sort_values(["row", "col", "response_order"], kind="stable")
+            .drop_duplicates(["row", "col", "code"], keep="first")
+        )
+        if not multiple.empty:
+            rows = multiple["row"].to_numpy()
+            cols = multiple["col"].to_numpy()
+            codes = multiple["code"].tolist()
+            bounds = _group_bounds(rows, cols)
+            for start, end in zip(bounds[:-1], bounds[1:]):
+                cells[cols[start]][rows[start]] = codes[start:end]
+
+    return ResponseMatrix(
+        respondent_ids=respondent_ids.tolist(),
+        questions=columns_meta,
+        columns={q.name: cells[i] for i, q in enumerate(columns_meta)},
+    )
+
+
+def matrix_from_cells(
+    questions: Sequence[Question],
+    respondent_ids: List[str],
+    cells: Sequence[Dict[str, Any]]
+) -> ResponseMatrix:
+    """Matrix of respondents given as dicts of answered cells keyed by question name.
+
+    Cells of questions outside ``questions`` are ignored.
+    """
+    columns_meta = [
+        QuestionColumn(q.id, q.name, QUESTION_TYPE_NAMES.get(q.type, "TEXT")) for q in questions
+    ]
+    values = {q.name: [None] * len(respondent_ids) for q in columns_meta}
+    for row, respondent_cells in enumerate(cells):
+        for name, value in respondent_cells.items():
+            column = values.get(name)
+            if column is not None:
+                column[row] = value
+
+    return ResponseMatrix(
+        respondent_ids=list(respondent_ids),
+        questions=columns_meta,
+        columns={
+            name: np.fromiter(column, dtype=object, count=len(column))
+            for name, column in values.items()
+        },
+    )
@@ -1,104 +1,74 @@
 """
 Response-related business logic.
 """
+from sqlalchemy import Integer, Text, cast, literal, null, select, union, union_all
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any, Optional, Tuple
+import logging
+import time
+from typing import Hashable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+import orjson
+import pandas as pd
 from fastapi import HTTPException
 from src.models import (
-    Survey, Question, QuestionType,
-    TextResponse, ChoiceResponse, AnswerOption
+    Survey, Question,
+    TextResponse, ChoiceResponse, AnswerOption,
+    DataGeneration, RespondentRow, ResponseMaterialization
 )
 from src.schemas import (
+    ExportFormat,
     GetResponsesRequest,
     GetResponsesResponse,
     RespondentResponseData,
     ResponseData,
+    ResponseFormat,
 )
-from src.logger import logger
-
+from src.logger import get_logger
+from src.settings import settings
+from src.services.exporters import create_exporter, export_columns, log_export
+from src.services.metrics import stage
+from src.services.response_encoders import arrow_table, encode_response_page, matrix_from_arrow
+from src.services.response_matrix import (
+    CHOICE_ROW_COLUMNS,
+    TEXT_ROW_COLUMNS,
+    ResponseMatrix,
+    build_response_matrix,
+    matrix_from_cells,
+)
+from src.services.result_cache import result_cache
 
-class ResponseDataBuilder:
-    """Helper class for building response data."""
+logger = get_logger("responses")
 
-    @staticmethod
-    def build_single_choice_value(
-        question_name: str,
-        question_type: str,
-        answer_option: Optional[AnswerOption]
-    ) -> Any:
-        """Build value for single choice question."""
-        if answer_option:
-            return answer_option.code
-        logger.warning(f"DEBUG - WARNING: SINGLE question {question_name} has None value")
-        return ""
+ORDERED_ROW_COLUMNS = ["respondent_id", "question_id", "kind", "row_id", "text", "code", "response_order"]
+# Respondent ids bound in one ``IN (...)`` list; keeps statements under the bind-parameter limits.
+RESPONDENT_ID_BATCH_SIZE = 10_000
 
-    @staticmethod
-    def build_multiple_choice_values(
-        choice_responses_for_question: List[ChoiceResponse],
-        db: Session
-    ) -> List[int]:
-        """Build values for multiple choice question from ChoiceResponse objects."""
-        codes_with_orders = []
 
-        for cr in choice_responses_for_question:
-            answer_option = db.query(AnswerOption).filter(
-                AnswerOption.id == cr.answer_option_id
-            ).first()
+class ResponsePage(NamedTuple):
+    """Matrix of one page of respondents and the cursor of the next page."""
 
-            if answer_option:
-                codes_with_orders.append((cr.response_order, answer_option.code))
+    matrix: ResponseMatrix
+    next_cursor: Optional[str] = None
 
-        return ResponseDataBuilder._process_multiple_choice_orders(codes_with_orders)
 
-    @staticmethod
-    def build_multiple_choice_values_from_orders(order_info: List[Tuple[int, int]]) -> List[int]:
-        """Build values for multiple choice question from order information."""
-        return ResponseDataBuilder._process_multiple_choice_orders(order_info)
+class ResponseQueries:
+    """Statements and result handling shared by the sync and async response services."""
 
     @staticmethod
-    def _process_multiple_choice_orders(codes_with_orders: List[Tuple[int, int]]) -> List[int]:
-        """Process multiple choice orders to sort and deduplicate."""
-        seen_codes = set()
-        sorted_codes = []
-
-        for order, code in sorted(codes_with_orders, key=lambda x: x[0]):
-            if code not in seen_codes:
-                sorted_codes.append(code)
-                seen_codes.add(code)
-
-        return sorted_codes
+    def _survey_statement(request: GetResponsesRequest):
+        return select(Survey.id).where(Survey.id == request.survey_id)
 
     @staticmethod
-    def get_default_value_for_question(question_type: QuestionType) -> Any:
-        """Get default value based on question type."""
-        if question_type == QuestionType.TEXT:
-            return ""
-        elif question_type == QuestionType.SINGLE:
-            return ""
-        else:
-            return []
-
-
-class ResponseService:
-    """Service for response-related operations."""
-
-    def __init__(self, db: Session):
-        self.db = db
-        self.data_builder = ResponseDataBuilder()
-
-    def get_responses_for_questions(self, request: GetResponsesRequest) -> GetResponsesResponse:
-        """Get responses for specified questions (by name) in a survey."""
-
-        survey = self.db.query(Survey).filter(Survey.id == request.survey_id).first()
-        if not survey:
-            raise HTTPException(status_code=404, detail="Survey not found")
-
-        questions = self.db.query(Question).filter(
+    def _questions_statement(request: GetResponsesRequest):
+        return select(Question).where(
             Question.survey_id == request.survey_id,
             Question.name.in_(request.question_ids)
-        ).all()
+        )
 
-        logger.debug(f"DEBUG: Found {len(questions)} questions by name")
+    @staticmethod
+    def _checked_questions(request: GetResponsesRequest, questions: List[Question]) -> List[Question]:
+        """Raise 400 unless every requested question was found."""
+        logger.debug("DEBUG: Found %d questions by name", len(questions))
 
         question_name_map = {q.name: q for q in questions}
         not_found = [q_name for q_name in request.question_ids if q_name not in question_name_map]
@@ -108,225 +78,527 @@ class ResponseService:
                 detail=f"Questions not found in survey: {', '.join(not_found)}"
             )
 
-        respondent_data = self._process_responses(questions)
+        return questions
 
-        respondents_list = self._build_respondents_list(
-            respondent_data,
-            request.question_ids,
-            question_name_map
+    @staticmethod
+    def _cache_key(questions: List[Question], request: GetResponsesRequest) -> Tuple[Hashable, ...]:
+        """Result cache key: survey, distinct question names (sorted), page parameters and filter."""
+        return (
+            questions[0].survey_id,
+            tuple(sorted({q.name for q in questions})),
+            request.limit,
+            request.after,
+            request.filter.cache_key() if request.filter is not None else None,
         )
 
-        self._log_sample_response(respondents_list)
+    @staticmethod
+    def _cached_page(key: Tuple[Hashable, ...], generation: int) -> Optional[ResponsePage]:
+        """Page stored in the result cache at ``generation``, or ``None``."""
+        table = result_cache.get(key, generation)
+        if table is None:
+            return None
+        return ResponsePage(*matrix_from_arrow(table))
 
-        return GetResponsesResponse(respondents=respondents_list)
+    @staticmethod
+    def _store_page(key: Tuple[Hashable, ...], generation: int, page: ResponsePage) -> None:
+        result_cache.put(key, generation, arrow_table(page.matrix, key[1], page.next_cursor))
 
-    def _process_responses(self, questions: List[Question]) -> Dict[str, Dict[str, Dict[str, Any]]]:
-        """Process text and choice responses for questions."""
-        if not questions:
-            return {}
+    @staticmethod
+    def _data_generation_statement(survey_id: str):
+        return select(DataGeneration.generation).where(DataGeneration.survey_id == survey_id)
 
+    @staticmethod
+    def _materialization_current(
+        materialization: Optional[ResponseMaterialization],
+        questions: List[Question],
+        generation: int
+    ) -> bool:
+        """Whether the materialized rows are at ``generation`` and the request spans every question.
+
+        A request for part of the questions leaves out respondents without rows
+        for them, which the materialized rows cannot tell, so it takes the live path.
+        """
+        return (
+            materialization is not None
+            and materialization.generation == generation
+            and materialization.question_count == len({q.id for q in questions})
+        )
+
+    @staticmethod
+    def _materialized_statement(questions: List[Question], limit: Optional[int], after: Optional[str]):
+        """Respondent rows of a page; without paging in the order of the live path at build time."""
+        query = select(RespondentRow.respondent_id, RespondentRow.cells).where(
+            RespondentRow.survey_id == questions[0].survey_id
+        )
+        if limit is None and after is None:
+            return query.order_by(RespondentRow.position)
+        if after is not None:
+            query = query.where(RespondentRow.respondent_id > after)
+        query = query.order_by(RespondentRow.respondent_id)
+        if limit is not None:
+            query = query.limit(limit + 1)
+        return query
+
+    @staticmethod
+    def _materialized_respondents_statement(questions: List[Question], respondent_ids: Sequence[str]):
+        """Respondent rows of the given respondents, in no particular order."""
+        return select(RespondentRow.respondent_id, RespondentRow.cells).where(
+            RespondentRow.survey_id == questions[0].survey_id,
+            RespondentRow.respondent_id.in_(respondent_ids)
+        )
+
+    @staticmethod
+    def _materialized_page(questions: List[Question], rows: Sequence, limit: Optional[int]) -> ResponsePage:
+        """Page assembled from fetched respondent rows (at most ``limit + 1`` of them)."""
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = rows[-1].respondent_id
+
+        logger.debug("DEBUG: Read %d materialized respondent rows", len(rows))
+
+        return ResponsePage(
+            matrix_from_cells(
+                questions,
+                [row.respondent_id for row in rows],
+                [orjson.loads(row.cells) for row in rows],
+            ),
+            next_cursor,
+        )
+
+    @staticmethod
+    def _respondent_page_statement(questions: List[Question], after: Optional[str], limit: Optional[int]):
+        """Ids of the respondents following ``after``, one more than ``limit``.
+
+        Each branch of the union is limited on its own, so with an index on
+        ``respondent_id`` the query reads about ``limit`` rows however deep the page is.
+        """
         question_uuids = [q.id for q in questions]
         survey_id = questions[0].survey_id
+        fetch = None if limit is None else limit + 1
 
-        text_responses = self.db.query(TextResponse).filter(
-            TextResponse.survey_id == survey_id,
-            TextResponse.question_id.in_(question_uuids)
-        ).all()
+        def respondent_ids_of(model):
+            query = select(model.respondent_id).where(
+                model.survey_id == survey_id,
+                model.question_id.in_(question_uuids)
+            )
+            if after is not None:
+                query = query.where(model.respondent_id > after)
+            return query.distinct().order_by(model.respondent_id).limit(fetch).subquery()
 
-        choice_responses = self.db.query(ChoiceResponse).filter(
-            ChoiceResponse.survey_id == survey_id,
-            ChoiceResponse.question_id.in_(question_uuids)
-        ).all()
+        text_ids = respondent_ids_of(TextResponse)
+        choice_ids = respondent_ids_of(ChoiceResponse)
+        ids = union(
+            select(text_ids.c.respondent_id),
+            select(choice_ids.c.respondent_id)
+        ).subquery()
 
-        logger.debug(f"DEBUG: Found {len(text_responses)} text responses and {len(choice_responses)} choice responses")
+        return select(ids.c.respondent_id).order_by(ids.c.respondent_id).limit(fetch)
 
-        respondent_data: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    @staticmethod
+    def _segment_page(
+        questions: List[Question],
+        segment,
+        after: Optional[str],
+        limit: Optional[int]
+    ) -> Tuple[List[str], Optional[str]]:
+        """Ids of the segment's respondents with rows for the questions following ``after``,
+        in ``respondent_id`` order, and the cursor of the next page."""
+        index, bitmap = segment
+        respondent_ids = index.respondents(bitmap & index.present_in([q.name for q in questions]))
+        if after is not None:
+            respondent_ids = respondent_ids[np.searchsorted(respondent_ids, after, side="right"):]
+        if limit is not None:
+            respondent_ids = respondent_ids[:limit + 1]
+        return ResponseQueries._cut_page(respondent_ids.tolist(), limit)
 
-        self._process_text_responses(text_responses, questions, respondent_data)
+    @staticmethod
+    def _cut_page(respondent_ids: List[str], limit: Optional[int]) -> Tuple[List[str], Optional[str]]:
+        """Trim fetched ids to ``limit`` and derive the cursor of the next page."""
+        if limit is not None and len(respondent_ids) > limit:
+            respondent_ids = respondent_ids[:limit]
+            return respondent_ids, respondent_ids[-1]
+        return respondent_ids, None
 
-        self._process_choice_responses(choice_responses, questions, respondent_data)
+    @staticmethod
+    def _respondent_range(model, after: Optional[str], until: Optional[str]) -> list:
+        """Conditions restricting rows of ``model`` to respondents in ``(after, until]``."""
+        conditions = []
+        if after is not None:
+            conditions.append(model.respondent_id > after)
+        if until is not None:
+            conditions.append(model.respondent_id <= until)
+        return conditions
 
-        self._post_process_multiple_choice_responses(respondent_data)
+    @staticmethod
+    def _respondent_conditions(
+        model,
+        after: Optional[str],
+        until: Optional[str],
+        respondent_ids: Optional[Sequence[str]]
+    ) -> list:
+        """Conditions of :meth:`_respondent_range`, plus membership in ``respondent_ids`` if given."""
+        conditions = ResponseQueries._respondent_range(model, after, until)
+        if respondent_ids is not None:
+            conditions.append(model.respondent_id.in_(respondent_ids))
+        return conditions
 
-        return respondent_data
+    @staticmethod
+    def _respondent_id_batches(respondent_ids: Sequence[str]) -> Iterator[Sequence[str]]:
+        """Consecutive slices of at most ``RESPONDENT_ID_BATCH_SIZE`` ids."""
+        for start in range(0, len(respondent_ids), RESPONDENT_ID_BATCH_SIZE):
+            yield respondent_ids[start:start + RESPONDENT_ID_BATCH_SIZE]
 
-    def _process_text_responses(
+    def _ordered_rows_statement(
         self,
-        text_responses: List[TextResponse],
         questions: List[Question],
-        respondent_data: Dict[str, Dict[str, Dict[str, Any]]]
-    ) -> None:
-        """Process text responses."""
-        for tr in text_responses:
-            respondent_id = tr.respondent_id
-            if respondent_id not in respondent_data:
-                respondent_data[respondent_id] = {}
-
-            question = next((q for q in questions if q.id == tr.question_id), None)
-            if not question:
-                continue
-
-            question_name = question.name
-
-            if question_name not in respondent_data[respondent_id]:
-                respondent_data[respondent_id][question_name] = {
-                    "question_id": question_name,
-                    "question_name": question.name,
-                    "question_type": "TEXT",
-                    "value": tr.text
-                }
-
-    def _process_choice_responses(
+        after: Optional[str] = None,
+        until: Optional[str] = None
+    ):
+        """Text and choice rows of the questions in one statement ordered by respondent."""
+        question_uuids = [q.id for q in questions]
+        survey_id = questions[0].survey_id
+
+        texts = select(
+            TextResponse.respondent_id.label("respondent_id"),
+            TextResponse.question_id.label("question_id"),
+            literal(0).label("kind"),
+            TextResponse.id.label("row_id"),
+            TextResponse.text.label("text"),
+            cast(null(), Integer).label("code"),
+            cast(null(), Integer).label("response_order"),
+        ).where(
+            TextResponse.survey_id == survey_id,
+            TextResponse.question_id.in_(question_uuids),
+            *self._respondent_range(TextResponse, after, until)
+        )
+
+        choices = select(
+            ChoiceResponse.respondent_id,
+            ChoiceResponse.question_id,
+            literal(1),
+            ChoiceResponse.id,
+            cast(null(), Text),
+            AnswerOption.code,
+            ChoiceResponse.response_order,
+        ).outerjoin(
+            AnswerOption, AnswerOption.id == ChoiceResponse.answer_option_id
+        ).where(
+            ChoiceResponse.survey_id == survey_id,
+            ChoiceResponse.question_id.in_(question_uuids),
+            *self._respondent_range(ChoiceResponse, after, until)
+        )
+
+        rows = union_all(texts, choices)
+        columns = rows.selected_columns
+        return rows.order_by(columns.respondent_id, columns.kind, columns.row_id)
+
+    @staticmethod
+    def _split_partition(
+        pending: Optional[pd.DataFrame],
+        partition: Sequence[tuple]
+    ) -> Tuple[Optional[pd.DataFrame], pd.DataFrame]:
+        """Rows of the whole respondents read so far, and the rows of the last one.
+
+        Rows of the last respondent may continue in the next partition, so they
+        are held back until it arrives.
+        """
+        frame = pd.DataFrame({
+            name: np.array(values, dtype=object)
+            for name, values in zip(ORDERED_ROW_COLUMNS, zip(*partition))
+        })
+        if pending is not None:
+            frame = pd.concat([pending, frame], ignore_index=True)
+
+        respondent_ids = frame["respondent_id"].to_numpy()
+        cut = int(np.argmax(respondent_ids == respondent_ids[-1]))
+        return (frame.iloc[:cut] if cut else None), frame.iloc[cut:]
+
+    @staticmethod
+    def _chunk_matrix(questions: List[Question], rows: pd.DataFrame) -> ResponseMatrix:
+        """Assemble a matrix from ordered rows keeping the respondents in row order."""
+        is_text = rows["kind"].to_numpy() == 0
+        return build_response_matrix(
+            questions,
+            rows.loc[is_text, TEXT_ROW_COLUMNS],
+            rows.loc[~is_text, CHOICE_ROW_COLUMNS],
+            pd.unique(rows["respondent_id"]),
+        )
+
+    def _text_rows_statement(
         self,
-        choice_responses: List[ChoiceResponse],
         questions: List[Question],
-        respondent_data: Dict[str, Dict[str, Dict[str, Any]]]
-    ) -> None:
-        """Process choice responses."""
-        for cr in choice_responses:
-            respondent_id = cr.respondent_id
-            if respondent_id not in respondent_data:
-                respondent_data[respondent_id] = {}
-
-            question = next((q for q in questions if q.id == cr.question_id), None)
-            if not question:
-                continue
-
-            question_name = question.name
-            answer_option = self.db.query(AnswerOption).filter(
-                AnswerOption.id == cr.answer_option_id
-            ).first()
-
-            if not answer_option:
-                continue
+        after: Optional[str] = None,
+        until: Optional[str] = None,
+        respondent_ids: Optional[Sequence[str]] = None
+    ):
+        return select(TextResponse.respondent_id, TextResponse.question_id, TextResponse.text).where(
+            TextResponse.survey_id == questions[0].survey_id,
+            TextResponse.question_id.in_([q.id for q in questions]),
+            *self._respondent_conditions(TextResponse, after, until, respondent_ids)
+        )
 
-            logger.debug(
-                f"DEBUG - Processing: respondent={respondent_id}, question={question_name}, "
-                f"type={question.type}, code={answer_option.code}"
+    def _choice_rows_statement(
+        self,
+        questions: List[Question],
+        after: Optional[str] = None,
+        until: Optional[str] = None,
+        respondent_ids: Optional[Sequence[str]] = None
+    ):
+        return (
+            select(
+                ChoiceResponse.respondent_id,
+                ChoiceResponse.question_id,
+                AnswerOption.code,
+                ChoiceResponse.response_order,
+            )
+            .outerjoin(AnswerOption, AnswerOption.id == ChoiceResponse.answer_option_id)
+            .where(
+                ChoiceResponse.survey_id == questions[0].survey_id,
+                ChoiceResponse.question_id.in_([q.id for q in questions]),
+                *self._respondent_conditions(ChoiceResponse, after, until, respondent_ids)
             )
+        )
 
-            if question_name not in respondent_data[respondent_id]:
-                question_type_str = "SINGLE" if question.type == QuestionType.SINGLE else "MULTIPLE"
-                initial_value = [] if question.type == QuestionType.MULTIPLE else None
 
-                respondent_data[respondent_id][question_name] = {
-                    "question_id": question_name,
-                    "question_name": question.name,
-                    "question_type": question_type_str,
-                    "value": initial_value,
-                    "_orders": [] if question.type == QuestionType.MULTIPLE else None
-                }
+class ResponseService(ResponseQueries):
+    """Service for response-related operations."""
 
-            current_response = respondent_data[respondent_id][question_name]
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_responses_for_questions(self, request: GetResponsesRequest) -> GetResponsesResponse:
+        """Get responses for specified questions (by name) in a survey."""
+        page = self.get_response_page(request)
+
+        with stage("models"):
+            respondents_list = self._build_respondents_list(page.matrix, request.question_ids)
+
+        self._log_sample_response(respondents_list)
 
-            if question.type == QuestionType.SINGLE:
-                current_response["value"] = answer_option.code
-                logger.debug(f"DEBUG - Set SINGLE value: {question_name} = {answer_option.code}")
-            else:
-                if "_orders" in current_response and current_response["_orders"] is not None:
-                    current_response["_orders"].append((cr.response_order, answer_option.code))
+        return GetResponsesResponse(respondents=respondents_list, next_cursor=page.next_cursor)
 
-    def _post_process_multiple_choice_responses(
+    def get_encoded_responses(
         self,
-        respondent_data: Dict[str, Dict[str, Dict[str, Any]]]
-    ) -> None:
-        """Post-process multiple choice responses to order and deduplicate."""
-        for respondent_id, responses_dict in respondent_data.items():
-            for question_name, response_data in responses_dict.items():
-                if response_data.get("question_type") == "MULTIPLE" and "_orders" in response_data:
-                    order_info = response_data["_orders"]
-                    if order_info:
-                        sorted_codes = self.data_builder.build_multiple_choice_values_from_orders(order_info)
-                        response_data["value"] = sorted_codes
-                    del response_data["_orders"]
+        request: GetResponsesRequest,
+        response_format: ResponseFormat = ResponseFormat.ROWS
+    ) -> bytes:
+        """Responses encoded straight to bytes in ``response_format``.
+
+        ``ResponseFormat.ROWS`` gives the same JSON as :meth:`get_responses_for_questions`.
+        """
+        page = self.get_response_page(request)
+        with stage("encode"):
+            return encode_response_page(page.matrix, request.question_ids, page.next_cursor, response_format)
+
+    def get_response_page(self, request: GetResponsesRequest) -> ResponsePage:
+        """Validate the request and assemble the respondent × question matrix.
+
+        With ``limit`` or ``after`` the matrix holds the respondents following
+        ``after`` in ``respondent_id`` order, at most ``limit`` of them, and
+        ``next_cursor`` is set while more respondents remain. Pages are cached
+        per survey data generation, keyed by the set of requested questions,
+        and are read from the materialized respondent rows while those are current.
+        Respondent filters need the segment index and are served by
+        :class:`~src.services.async_response_service.AsyncResponseService` only.
+        """
+        if request.filter is not None:
+            raise HTTPException(status_code=400, detail="Respondent filters are not supported here")
+        with stage("validate"):
+            questions = self.resolve_questions(request)
+        if not questions:
+            return self._build_response_page(questions, request.limit, request.after, 0)
+
+        with stage("validate"):
+            generation = self._data_generation(questions[0].survey_id)
+        if not settings.RESULT_CACHE_ENABLED:
+            return self._build_response_page(questions, request.limit, request.after, generation)
+
+        key = self._cache_key(questions, request)
+        with stage("cache"):
+            page = self._cached_page(key, generation)
+        if page is not None:
+            return page
+
+        page = self._build_response_page(questions, request.limit, request.after, generation)
+        with stage("cache"):
+            self._store_page(key, generation, page)
+        return page
+
+    def _data_generation(self, survey_id: str) -> int:
+        """Current data generation of the survey (0 before the first versioned load)."""
+        return self.db.scalar(self._data_generation_statement(survey_id)) or 0
+
+    def assemble_matrix(self, questions: List[Question]) -> ResponseMatrix:
+        """Assemble the matrix of all respondents from the response tables."""
+        text_rows, choice_rows = self._fetch_response_rows(questions)
+        with stage("assemble"):
+            return build_response_matrix(questions, text_rows, choice_rows)
+
+    def _build_response_page(
+        self,
+        questions: List[Question],
+        limit: Optional[int],
+        after: Optional[str],
+        generation: int
+    ) -> ResponsePage:
+        """Assemble the page from the materialized rows when they are current, else from the response tables."""
+        if self._materialization_covers(questions, generation):
+            with stage("fetch"):
+                rows = self.db.execute(self._materialized_statement(questions, limit, after)).all()
+            with stage("assemble"):
+                return self._materialized_page(questions, rows, limit)
+
+        if limit is None and after is None:
+            return ResponsePage(self.assemble_matrix(questions))
+
+        respondent_ids, next_cursor = self._respondent_page(questions, after, limit)
+        if not respondent_ids:
+            return ResponsePage(build_response_matrix(questions, [], []))
+
+        text_rows, choice_rows = self._fetch_response_rows(
+            questions, after=after, until=respondent_ids[-1]
+        )
+        with stage("assemble"):
+            matrix = build_response_matrix(questions, text_rows, choice_rows, respondent_ids)
+        return ResponsePage(matrix, next_cursor)
+
+    def _materialization_covers(self, questions: List[Question], generation: int) -> bool:
+        """Whether the request can be served from the materialized respondent rows."""
+        if not settings.MATERIALIZED_RESPONSES_ENABLED or not questions:
+            return False
+        materialization = self.db.get(ResponseMaterialization, questions[0].survey_id)
+        return self._materialization_current(materialization, questions, generation)
+
+    def resolve_questions(self, request: GetResponsesRequest) -> List[Question]:
+        """Load the requested questions, raising 404/400 for an unknown survey or question."""
+        if self.db.scalar(self._survey_statement(request)) is None:
+            raise HTTPException(status_code=404, detail="Survey not found")
 
-    def _build_respondents_list(
+        questions = self.db.scalars(self._questions_statement(request)).all()
+        return self._checked_questions(request, questions)
+
+    def iter_response_matrices(
         self,
-        respondent_data: Dict[str, Dict[str, Dict[str, Any]]],
-        requested_question_ids: List[str],
-        question_name_map: Dict[str, Question]
-    ) -> List[RespondentResponseData]:
-        """Build list of RespondentResponseData objects."""
-        respondents_list = []
+        questions: List[Question],
+        chunk_size: Optional[int] = None,
+        after: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> Iterator[ResponseMatrix]:
+        """Stream response rows ordered by respondent and yield matrices of whole respondents.
+
+        Rows are read from a server-side cursor ``chunk_size`` at a time, so
+        memory stays bounded by the chunk rather than the survey size.
+        ``after`` and ``limit`` select a page as in :meth:`get_response_page`.
+        """
+        if not questions:
+            return
 
-        for respondent_id, responses_dict in respondent_data.items():
-            responses_list = self._build_responses_for_respondent(
-                respondent_id, responses_dict, requested_question_ids, question_name_map
-            )
+        until = None
+        if limit is not None:
+            respondent_ids, _ = self._respondent_page(questions, after, limit)
+            if not respondent_ids:
+                return
+            until = respondent_ids[-1]
 
-            respondents_list.append(RespondentResponseData(
-                respondent_id=respondent_id,
-                responses=responses_list
-            ))
+        chunk_size = chunk_size or settings.RESPONSES_STREAM_CHUNK_SIZE
+        result = self.db.execute(
+            self._ordered_rows_statement(questions, after, until).execution_options(yield_per=chunk_size)
+        )
 
-        return respondents_list
+        pending = None
+        for partition in result.partitions():
+            complete, pending = self._split_partition(pending, partition)
+            if complete is not None:
+                yield self._chunk_matrix(questions, complete)
 
-    def _build_responses_for_respondent(
+        if pending is not None:
+            yield self._chunk_matrix(questions, pending)
+
+    def iter_export(
         self,
-        respondent_id: str,
-        responses_dict: Dict[str, Dict[str, Any]],
-        requested_question_ids: List[str],
-        question_name_map: Dict[str, Question]
-    ) -> List[ResponseData]:
-        """Build responses for a single respondent."""
-        responses_list = []
-
-        for q_name in requested_question_ids:
-            if q_name in responses_dict:
-                response_data = responses_dict[q_name].copy()
-                clean_data = self._clean_response_data(response_data, respondent_id, q_name)
-                responses_list.append(ResponseData(**clean_data))
-            else:
-                question = question_name_map.get(q_name)
-                if question:
-                    default_value = self.data_builder.get_default_value_for_question(question.type)
-                    question_type_str = self._get_question_type_string(question.type)
-
-                    responses_list.append(ResponseData(
-                        question_id=q_name,
-                        question_name=question.name,
-                        question_type=question_type_str,
-                        value=default_value
-                    ))
+        questions: List[Question],
+        question_names: Sequence[str],
+        export_format: ExportFormat,
+        chunk_size: Optional[int] = None
+    ) -> Iterator[bytes]:
+        """Yield the responses to the questions as a file in ``export_format``, chunk by chunk."""
+        started = time.perf_counter()
+        exporter = create_exporter(export_format, export_columns(questions, question_names))
+        for matrix in self.iter_response_matrices(questions, chunk_size or settings.EXPORT_CHUNK_SIZE):
+            data = exporter.write(matrix)
+            if data:
+                yield data
+        yield from exporter.finish()
+        log_export(questions, export_format, exporter.rows, time.perf_counter() - started)
+
+    def _respondent_page(
+        self,
+        questions: List[Question],
+        after: Optional[str],
+        limit: Optional[int]
+    ) -> Tuple[List[str], Optional[str]]:
+        """Ids of the respondents following ``after`` and the cursor of the next page."""
+        if not questions:
+            return [], None
 
-        return responses_list
+        with stage("fetch"):
+            respondent_ids = self.db.execute(
+                self._respondent_page_statement(questions, after, limit)
+            ).scalars().all()
+        return self._cut_page(respondent_ids, limit)
 
-    def _clean_response_data(
+    def _fetch_response_rows(
         self,
-        response_data: Dict[str, Any],
-        respondent_id: str,
-        question_name: str
-    ) -> Dict[str, Any]:
-        """Clean and validate response data."""
-        if response_data["question_type"] == "SINGLE" and response_data["value"] is None:
-            response_data["value"] = ""
-            logger.warning(f"DEBUG - WARNING: SINGLE question {question_name} has None value for respondent {respondent_id}")
-
-        return {
-            "question_id": response_data["question_id"],
-            "question_name": response_data["question_name"],
-            "question_type": response_data["question_type"],
-            "value": response_data["value"]
-        }
-
-    def _get_question_type_string(self, question_type: QuestionType) -> str:
-        """Convert QuestionType enum to string."""
-        if question_type == QuestionType.TEXT:
-            return "TEXT"
-        elif question_type == QuestionType.SINGLE:
-            return "SINGLE"
-        else:
-            return "MULTIPLE"
+        questions: List[Question],
+        after: Optional[str] = None,
+        until: Optional[str] = None
+    ) -> Tuple[List[Tuple[str, str, str]], List[Tuple[str, str, Optional[int], Optional[int]]]]:
+        """Fetch raw text and choice rows of the questions, optionally of respondents in ``(after, until]``."""
+        if not questions:
+            return [], []
+
+        with stage("fetch"):
+            text_rows = self.db.execute(self._text_rows_statement(questions, after, until)).all()
+            choice_rows = self.db.execute(self._choice_rows_statement(questions, after, until)).all()
+
+        logger.debug("DEBUG: Found %d text responses and %d choice responses", len(text_rows), len(choice_rows))
+
+        return text_rows, choice_rows
+
+    def _build_respondents_list(
+        self,
+        matrix: ResponseMatrix,
+        requested_question_ids: List[str]
+    ) -> List[RespondentResponseData]:
+        """Build list of RespondentResponseData objects."""
+        return [
+            RespondentResponseData(
+                respondent_id=respondent_id,
+                responses=[
+                    ResponseData(
+                        question_id=question.name,
+                        question_name=question.name,
+                        question_type=question.type,
+                        value=value
+                    )
+                    for question, value in cells
+                ]
+            )
+            for respondent_id, cells in matrix.iter_rows(requested_question_ids)
+        ]
 
     def _log_sample_response(self, respondents_list: List[RespondentResponseData]) -> None:
         """Log sample response for debugging."""
-        if not respondents_list:
+        if not respondents_list or not logger.isEnabledFor(logging.DEBUG):
             return
 
-        logger.debug(f"\n=== DEBUG: SAMPLE RESPONSE DATA ===")
+        logger.debug("\n=== DEBUG: SAMPLE RESPONSE DATA ===")
         sample = respondents_list[0]
-        logger.info(f"First respondent: {sample.respondent_id}")
+        logger.debug("First respondent: %s", sample.respondent_id)
         for resp in sample.responses:
-            logger.info(f"  - {resp.question_name} ({resp.question_type}): {resp.value} (type: {type(resp.value)})")
+            logger.debug(
+                "  - %s (%s): %s (type: %s)", resp.question_name, resp.question_type, resp.value, type(resp.value)
+            )
 
-        logger.debug(f"=== DEBUG END: Returning data for {len(respondents_list)} respondents ===")
+        logger.debug("=== DEBUG END: Returning data for %d respondents ===", len(respondents_list))
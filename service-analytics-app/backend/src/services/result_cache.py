@@ -0,0 +1,141 @@
+"""
+Versioned cache of assembled response results.
+
+Entries are Arrow tables keyed by a request key and the survey's data
+generation, so a load that bumps the generation makes older entries
+unreachable. The in-process tier is an LRU bounded by entry count and by
+total bytes; the optional on-disk tier (Arrow IPC files in a shared
+directory) lets every worker process reuse results computed by another.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Hashable, Optional, Tuple
+import pyarrow as pa
+from src.logger import logger
+from src.settings import settings
+
+
+class ResultCache:
+    """Two-tier (memory, then disk) cache of Arrow tables."""
+
+    def __init__(self, max_bytes: int, max_entries: int, cache_dir: Optional[Path] = None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self._entries: "OrderedDict[Tuple[Hashable, int], pa.Table]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, generation: int) -> Optional[pa.Table]:
+        """Cached table of ``key`` at ``generation``, or ``None``."""
+        with self._lock:
+            table = self._entries.get((key, generation))
+            if table is not None:
+                self._entries.move_to_end((key, generation))
+                self.hits += 1
+                return table
+
+        table = self._read_disk(key, generation)
+        with self._lock:
+            if table is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._store(key, generation, table)
+        return table
+
+    def put(self, key: Hashable, generation: int, table: pa.Table) -> None:
+        """Store the table in memory and, when configured, on disk."""
+        with self._lock:
+            self._store(key, generation, table)
+        self._write_disk(key, generation, table)
+
+    def clear(self) -> None:
+        """Drop all in-memory entries (the disk tier is left alone)."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current occupancy."""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "disk_tier": str(self.cache_dir) if self.cache_dir else None,
+            }
+
+    def _store(self, key: Hashable, generation: int, table: pa.Table) -> None:
+        """Insert into the LRU, replacing other generations of the key, and evict
+        the least recently used entries over the limits."""
+        if table.nbytes > self.max_bytes or self.max_entries <= 0:
+            return
+        for entry_key in [k for k in self._entries if k[0] == key]:
+            self._bytes -= self._entries.pop(entry_key).nbytes
+        self._entries[(key, generation)] = table
+        self._bytes += table.nbytes
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self.evictions += 1
+
+    @staticmethod
+    def _digest(key: Hashable) -> str:
+        return hashlib.sha256(repr(key).encode("utf-8")).hexdigest()[:32]
+
+    def _disk_path(self, key: Hashable, generation: int) -> Path:
+        return self.cache_dir / f"{self._digest(key)}-g{generation}.arrow"
+
+    def _read_disk(self, key: Hashable, generation: int) -> Optional[pa.Table]:
+        if self.cache_dir is None:
+            return None
+        path = self._disk_path(key, generation)
+        if not path.exists():
+            return None
+        try:
+            with pa.memory_map(str(path), "r") as source:
+                return pa.ipc.open_file(source).read_all()
+        except (OSError, pa.ArrowInvalid) as e:
+            logger.warning(f"Unreadable result cache file {path}: {e}")
+            return None
+
+    def _write_disk(self, key: Hashable, generation: int, table: pa.Table) -> None:
+        """Write atomically and remove files of older generations of the same key."""
+        if self.cache_dir is None:
+            return
+        path = self._disk_path(key, generation)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with pa.OSFile(str(tmp_path), "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(tmp_path, path)
+            for stale in self.cache_dir.glob(f"{self._digest(key)}-g*.arrow"):
+                if stale != path:
+                    stale.unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning(f"Could not write result cache file {path}: {e}")
+            tmp_path.unlink(missing_ok=True)
+
+
+result_cache = ResultCache(
+    max_bytes=settings.RESULT_CACHE_MAX_BYTES,
+    max_entries=settings.RESULT_CACHE_MAX_ENTRIES,
+    cache_dir=Path(settings.RESULT_CACHE_DIR) if settings.RESULT_CACHE_DIR else None,
+)
@@ -0,0 +1,275 @@
+"""
+In-memory bitmap index of survey respondents per answer option.
+
+For every survey the index keeps the sorted respondent ids and, per question,
+packed bitmaps (``np.packbits``, one bit per respondent) of the respondents
+with a row for the question, of those with a known answer and, for choice
+questions, of those per answer code. A SINGLE question counts the last answer
+of a respondent and a MULTIPLE question every selected code, as in the
+response matrix. Filters combine bitmaps with bitwise AND/OR/NOT.
+
+An index is built for one data generation of one survey; a load that bumps
+the generation of a survey rebuilds only that survey's index. Indexes are
+kept per process, least recently used first out over ``SEGMENT_INDEX_MAX_BYTES``.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from src.models import Question, QuestionType
+from src.schemas import SegmentFilter
+from src.services.response_matrix import QUESTION_TYPE_NAMES
+from src.settings import settings
+
+POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+class QuestionBitmaps(NamedTuple):
+    """Bitmaps of one question."""
+
+    type: str
+    present: np.ndarray
+    answered: np.ndarray
+    options: Dict[int, np.ndarray]
+
+
+class SurveyIndex:
+    """Respondent bitmaps of one survey at one data generation."""
+
+    def __init__(
+        self,
+        survey_id: str,
+        generation: int,
+        respondent_ids: np.ndarray,
+        questions: Dict[str, QuestionBitmaps],
+        build_seconds: float = 0.0
+    ):
+        self.survey_id = survey_id
+        self.generation = generation
+        self.respondent_ids = respondent_ids
+        self.questions = questions
+        self.build_seconds = build_seconds
+        self.everyone = np.packbits(np.ones(len(respondent_ids), dtype=bool))
+
+    def __len__(self) -> int:
+        return len(self.respondent_ids)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the respondent ids and the distinct bitmaps."""
+        bitmaps = {id(self.everyone): self.everyone}
+        for question in self.questions.values():
+            for bitmap in (question.present, question.answered, *question.options.values()):
+                bitmaps[id(bitmap)] = bitmap
+        return self.respondent_ids.nbytes + sum(bitmap.nbytes for bitmap in bitmaps.values())
+
+    @property
+    def bitmap_count(self) -> int:
+        return sum(
+            len(question.options) + (1 if question.answered is question.present else 2)
+            for question in self.questions.values()
+        )
+
+    def empty(self) -> np.ndarray:
+        return np.zeros_like(self.everyone)
+
+    def evaluate(self, segment_filter: SegmentFilter) -> np.ndarray:
+        """Bitmap of the respondents matching the filter.
+
+        A condition without codes matches the respondents who answered the
+        question; unknown codes match nobody. Questions must be in the index.
+        """
+        if segment_filter.question is not None:
+            question = self.questions[segment_filter.question]
+            if segment_filter.codes is None:
+                return question.answered
+            bitmap = self.empty()
+            for code in segment_filter.codes:
+                option = question.options.get(code)
+                if option is not None:
+                    bitmap = bitmap | option
+            return bitmap
+        if segment_filter.all_of is not None:
+            bitmap = self.everyone
+            for part in segment_filter.all_of:
+                bitmap = bitmap & self.evaluate(part)
+            return bitmap
+        if segment_filter.any_of is not None:
+            bitmap = self.empty()
+            for part in segment_filter.any_of:
+                bitmap = bitmap | self.evaluate(part)
+            return bitmap
+        # Padding bits past the last respondent stay zero.
+        return ~self.evaluate(segment_filter.negated) & self.everyone
+
+    def present_in(self, question_names: Sequence[str]) -> np.ndarray:
+        """Bitmap of the respondents with a row for any of the questions."""
+        bitmap = self.empty()
+        for name in question_names:
+            bitmap = bitmap | self.questions[name].present
+        return bitmap
+
+    @staticmethod
+    def count(bitmap: np.ndarray) -> int:
+        return int(POPCOUNT[bitmap].sum(dtype=np.int64))
+
+    def respondents(self, bitmap: np.ndarray) -> np.ndarray:
+        """Sorted ids of the respondents in the bitmap."""
+        return self.respondent_ids[np.unpackbits(bitmap, count=len(self.respondent_ids)).view(bool)]
+
+
+def _bitmap(positions: np.ndarray, size: int) -> np.ndarray:
+    flags = np.zeros(size, dtype=bool)
+    flags[positions] = True
+    return np.packbits(flags)
+
+
+def build_survey_index(
+    survey_id: str,
+    generation: int,
+    questions: Sequence[Question],
+    choice_parts: Sequence[Tuple[np.ndarray, np.ndarray, np.ndarray]],
+    text_parts: Sequence[Tuple[np.ndarray, np.ndarray]]
+) -> SurveyIndex:
+    """Index of the survey from encoded response rows.
+
+    ``choice_parts`` are ``(question position, respondent id, code)`` arrays in
+    row id order with code -1 for an unknown answer option; ``text_parts`` are
+    ``(question position, respondent id)`` arrays. Question positions index
+    ``questions``.
+    """
+    started = time.perf_counter()
+    choice_questions = np.concatenate([part[0] for part in choice_parts] or [np.empty(0, np.int64)])
+    choice_respondents = np.concatenate([part[1] for part in choice_parts] or [np.empty(0, object)])
+    codes = np.concatenate([part[2] for part in choice_parts] or [np.empty(0, np.int64)])
+    text_questions = np.concatenate([part[0] for part in text_parts] or [np.empty(0, np.int64)])
+    text_respondents = np.concatenate([part[1] for part in text_parts] or [np.empty(0, object)])
+
+    positions, unique_ids = pd.factorize(np.concatenate([choice_respondents, text_respondents]))
+    # Rank the factorized ids so that bit i is the i-th respondent id in sort order.
+    unique_ids = np.asarray(unique_ids, dtype=str)
+    order = np.argsort(unique_ids, kind="stable")
+    respondent_ids = unique_ids[order]
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    positions = rank[positions]
+    size = len(respondent_ids)
+    choice_positions, text_positions = positions[:len(codes)], positions[len(codes):]
+
+    choice_order = np.argsort(choice_questions, kind="stable")
+    choice_bounds = np.searchsorted(choice_questions[choice_order], np.arange(len(questions) + 1))
+    text_order = np.argsort(text_questions, kind="stable")
+    text_bounds = np.searchsorted(text_questions[text_order], np.arange(len(questions) + 1))
+
+    bitmaps: Dict[str, QuestionBitmaps] = {}
+    for i, question in enumerate(questions):
+        question_type = QUESTION_TYPE_NAMES.get(question.type, "TEXT")
+        if question_type == "TEXT":
+            rows = text_order[text_bounds[i]:text_bounds[i + 1]]
+            present = _bitmap(text_positions[rows], size)
+            bitmaps[question.name] = QuestionBitmaps(question_type, present, present, {})
+            continue
+
+        rows = choice_order[choice_bounds[i]:choice_bounds[i + 1]]
+        respondents, question_codes = choice_positions[rows], codes[rows]
+        present = _bitmap(respondents, size)
+        known = question_codes >= 0
+        respondents, question_codes = respondents[known], question_codes[known]
+        if question.type == QuestionType.SINGLE:
+            # Fancy assignment keeps the last code written for a respondent.
+            last = np.full(size, -1, dtype=np.int64)
+            last[respondents] = question_codes
+            respondents = np.flatnonzero(last >= 0)
+            question_codes = last[respondents]
+
+        options = {
+            int(code): _bitmap(respondents[question_codes == code], size)
+            for code in np.unique(question_codes)
+        }
+        bitmaps[question.name] = QuestionBitmaps(question_type, present, _bitmap(respondents, size), options)
+
+    return SurveyIndex(survey_id, generation, respondent_ids, bitmaps, time.perf_counter() - started)
+
+
+def encode_choice_rows(
+    rows: Sequence,
+    question_positions: Dict[str, int],
+    option_codes: Dict[str, int]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Arrays of a partition of ``(question id, respondent id, answer option id)`` rows
+    for :func:`build_survey_index`; option ids missing from ``option_codes`` get code -1."""
+    return (
+        np.fromiter((question_positions.get(row[0], -1) for row in rows), dtype=np.int64, count=len(rows)),
+        np.array([row[1] for row in rows], dtype=object),
+        np.fromiter((option_codes.get(row[2], -1) for row in rows), dtype=np.int64, count=len(rows)),
+    )
+
+
+def encode_text_rows(rows: Sequence, question_positions: Dict[str, int]) -> Tuple[np.ndarray, np.ndarray]:
+    """Arrays of a partition of ``(question id, respondent id)`` rows for :func:`build_survey_index`."""
+    return (
+        np.fromiter((question_positions.get(row[0], -1) for row in rows), dtype=np.int64, count=len(rows)),
+        np.array([row[1] for row in rows], dtype=object),
+    )
+
+
+class SegmentIndexRegistry:
+    """Survey indexes of this process, bounded by total bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._indexes: "OrderedDict[str, SurveyIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.evictions = 0
+
+    def get(self, survey_id: str, generation: int) -> Optional[SurveyIndex]:
+        """Index of the survey at ``generation``, or ``None``."""
+        with self._lock:
+            index = self._indexes.get(survey_id)
+            if index is None or index.generation != generation:
+                return None
+            self._indexes.move_to_end(survey_id)
+            return index
+
+    def put(self, index: SurveyIndex) -> None:
+        """Store the index, replacing the survey's previous one, and evict over the limit."""
+        with self._lock:
+            self.builds += 1
+            self._indexes[index.survey_id] = index
+            self._indexes.move_to_end(index.survey_id)
+            while len(self._indexes) > 1 and sum(i.nbytes for i in self._indexes.values()) > self.max_bytes:
+                self._indexes.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._indexes.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Memory use per survey and in total."""
+        with self._lock:
+            surveys: List[Dict[str, Any]] = [
+                {
+                    "survey_id": index.survey_id,
+                    "generation": index.generation,
+                    "respondents": len(index),
+                    "questions": len(index.questions),
+                    "bitmaps": index.bitmap_count,
+                    "bytes": index.nbytes,
+                    "build_seconds": round(index.build_seconds, 3),
+                }
+                for index in self._indexes.values()
+            ]
+            return {
+                "surveys": surveys,
+                "bytes": sum(survey["bytes"] for survey in surveys),
+                "max_bytes": self.max_bytes,
+                "builds": self.builds,
+                "evictions": self.evictions,
+            }
+
+
+segment_indexes = SegmentIndexRegistry(max_bytes=settings.SEGMENT_INDEX_MAX_BYTES)
@@ -0,0 +1,210 @@
+"""
+Respondent segments: filters evaluated on the bitmap index.
+
+Request bodies take a :class:`~src.schemas.SegmentFilter`. Query strings take
+the same filter as JSON or as an expression such as ``Q2:3 AND (Q4:1,5 OR NOT Q1)``:
+``NAME:CODES`` matches respondents who chose one of the codes, a bare ``NAME``
+those who answered the question, and AND binds tighter than OR.
+"""
+import asyncio
+import re
+import time
+from collections import defaultdict
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+import numpy as np
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.logger import logger
+from src.models import AnswerOption, ChoiceResponse, DataGeneration, Question, TextResponse
+from src.schemas import SegmentFilter
+from src.settings import settings
+from src.services.concurrency import run_in_worker
+from src.services.segment_index import (
+    SurveyIndex,
+    build_survey_index,
+    encode_choice_rows,
+    encode_text_rows,
+    segment_indexes,
+)
+
+FILTER_TOKEN = re.compile(r"\(|\)|[^\s()]+")
+
+# Requests for a survey whose index is being built wait for that build.
+_build_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+
+class Segment(NamedTuple):
+    """Bitmap of the respondents matching a filter and the index it refers to."""
+
+    index: SurveyIndex
+    bitmap: np.ndarray
+
+
+def parse_segment_filter(text: str) -> SegmentFilter:
+    """Filter from a query string (JSON or an expression), 400 if it is invalid."""
+    text = text.strip()
+    try:
+        if text.startswith("{"):
+            return SegmentFilter.model_validate_json(text)
+        tokens = FILTER_TOKEN.findall(text)
+        segment_filter, position = _parse_or(tokens, 0)
+        if position < len(tokens):
+            raise ValueError(f"unexpected '{tokens[position]}'")
+        return segment_filter
+    except ValidationError as e:
+        messages = "; ".join(error["msg"] for error in e.errors())
+        raise HTTPException(status_code=400, detail=f"Invalid filter: {messages}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid filter: {e}")
+
+
+def _parse_or(tokens: List[str], position: int) -> Tuple[SegmentFilter, int]:
+    parts = []
+    while True:
+        part, position = _parse_and(tokens, position)
+        parts.append(part)
+        if position >= len(tokens) or tokens[position].upper() != "OR":
+            break
+        position += 1
+    return (parts[0] if len(parts) == 1 else SegmentFilter(any_of=parts)), position
+
+
+def _parse_and(tokens: List[str], position: int) -> Tuple[SegmentFilter, int]:
+    parts = []
+    while True:
+        part, position = _parse_term(tokens, position)
+        parts.append(part)
+        if position >= len(tokens) or tokens[position].upper() != "AND":
+            break
+        position += 1
+    return (parts[0] if len(parts) == 1 else SegmentFilter(all_of=parts)), position
+
+
+def _parse_term(tokens: List[str], position: int) -> Tuple[SegmentFilter, int]:
+    if position >= len(tokens):
+        raise ValueError("unexpected end of filter")
+    token = tokens[position]
+    if token.upper() == "NOT":
+        part, position = _parse_term(tokens, position + 1)
+        return SegmentFilter(negated=part), position
+    if token == "(":
+        part, position = _parse_or(tokens, position + 1)
+        if position >= len(tokens) or tokens[position] != ")":
+            raise ValueError("missing ')'")
+        return part, position + 1
+    if token == ")" or token.upper() in ("AND", "OR"):
+        raise ValueError(f"unexpected '{token}'")
+
+    name, _, codes = token.partition(":")
+    if not codes:
+        return SegmentFilter(question=name), position + 1
+    return SegmentFilter(question=name, codes=[int(code) for code in codes.split(",")]), position + 1
+
+
+def _conditions(segment_filter: SegmentFilter) -> Iterator[SegmentFilter]:
+    if segment_filter.question is not None:
+        yield segment_filter
+        return
+    for part in segment_filter.all_of or segment_filter.any_of or [segment_filter.negated]:
+        yield from _conditions(part)
+
+
+class SegmentService:
+    """Survey bitmap indexes and filter evaluation, on an async session."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_segment(
+        self,
+        survey_id: str,
+        segment_filter: SegmentFilter,
+        generation: Optional[int] = None
+    ) -> Segment:
+        """Respondents of the survey matching the filter, 400 for unknown or TEXT-coded questions."""
+        index = await self.get_index(survey_id, generation)
+
+        not_found = [name for name in segment_filter.question_names() if name not in index.questions]
+        if not_found:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Questions not found in survey: {', '.join(not_found)}"
+            )
+        coded_text = [
+            condition.question for condition in _conditions(segment_filter)
+            if condition.codes is not None and index.questions[condition.question].type == "TEXT"
+        ]
+        if coded_text:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Answer codes given for TEXT questions: {', '.join(dict.fromkeys(coded_text))}"
+            )
+
+        return Segment(index, index.evaluate(segment_filter))
+
+    async def get_index(self, survey_id: str, generation: Optional[int] = None) -> SurveyIndex:
+        """Index of the survey at its current data generation, built on first use."""
+        if generation is None:
+            generation = await self.db.scalar(
+                select(DataGeneration.generation).where(DataGeneration.survey_id == survey_id)
+            ) or 0
+
+        index = segment_indexes.get(survey_id, generation)
+        if index is not None:
+            return index
+        async with _build_locks[survey_id]:
+            index = segment_indexes.get(survey_id, generation)
+            if index is None:
+                index = await self._build_index(survey_id, generation)
+                segment_indexes.put(index)
+        return index
+
+    async def _build_index(self, survey_id: str, generation: int) -> SurveyIndex:
+        """Read the survey's responses from server-side cursors and build its index.
+
+        Rows are streamed on the session's connection rather than through the
+        ORM session, and answer option ids are mapped to codes in Python: both
+        cut the per-row cost on the millions of rows of a large survey.
+        """
+        started = time.perf_counter()
+        questions = (await self.db.scalars(select(Question).where(Question.survey_id == survey_id))).all()
+        question_positions = {q.id: i for i, q in enumerate(questions)}
+        option_codes = dict((await self.db.execute(
+            select(AnswerOption.id, AnswerOption.code).where(AnswerOption.question_id.in_(question_positions))
+        )).all())
+        connection = await self.db.connection()
+        chunk_size = settings.SEGMENT_INDEX_CHUNK_SIZE
+
+        choice_parts = []
+        result = await connection.stream(
+            select(ChoiceResponse.question_id, ChoiceResponse.respondent_id, ChoiceResponse.answer_option_id)
+            .where(ChoiceResponse.survey_id == survey_id)
+            .order_by(ChoiceResponse.id)
+            .execution_options(yield_per=chunk_size)
+        )
+        async for partition in result.partitions():
+            choice_parts.append(
+                await run_in_worker(encode_choice_rows, partition, question_positions, option_codes)
+            )
+
+        text_parts = []
+        result = await connection.stream(
+            select(TextResponse.question_id, TextResponse.respondent_id)
+            .where(TextResponse.survey_id == survey_id)
+            .execution_options(yield_per=chunk_size)
+        )
+        async for partition in result.partitions():
+            text_parts.append(await run_in_worker(encode_text_rows, partition, question_positions))
+
+        index = await run_in_worker(
+            build_survey_index, survey_id, generation, questions, choice_parts, text_parts
+        )
+        index.build_seconds = time.perf_counter() - started
+        logger.info(
+            f"Built segment index of survey {survey_id} (generation {generation}): "
+            f"{len(index)} respondents, {index.bitmap_count} bitmaps, {index.nbytes} bytes "
+            f"in {index.build_seconds:.2f}s"
+        )
+        return index
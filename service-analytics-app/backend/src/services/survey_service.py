@@ -1,8 +1,10 @@
 """
 Survey-related business logic.
 """
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Sequence
 from fastapi import HTTPException
 from src.models import Survey, Question, QuestionType
 from src.schemas import (
@@ -12,6 +14,38 @@ from src.schemas import (
     ValidateQuestionsResponse,
 )
 from src.logger import logger
+from src.services.metrics import stage
+
+
+QUESTION_TYPE_NAMES = {
+    QuestionType.TEXT: "TEXT",
+    QuestionType.SINGLE: "SINGLE",
+    QuestionType.MULTIPLE: "MULTIPLE"
+}
+
+
+def question_schema(q: Question) -> QuestionSchema:
+    """API representation of a question."""
+    return QuestionSchema(
+        id=q.id,
+        survey_id=q.survey_id,
+        name=q.name,
+        text=q.text,
+        type=QUESTION_TYPE_NAMES.get(q.type, "TEXT")
+    )
+
+
+def question_errors(request: ValidateQuestionsRequest, survey_questions: Sequence) -> ValidateQuestionsResponse:
+    """Check the requested question names against ``(id, name)`` rows of the survey."""
+    question_name_to_id = {q.name: q.id for q in survey_questions}
+    valid_question_names = set(question_name_to_id.keys())
+
+    errors = []
+    for q_name in request.question_ids:
+        if q_name not in valid_question_names:
+            errors.append(f"Question {q_name} not found in survey {request.survey_id}")
+
+    return ValidateQuestionsResponse(valid=len(errors) == 0, errors=errors)
 
 
 class SurveyService:
@@ -22,56 +56,81 @@ class SurveyService:
 
     def get_all_surveys(self) -> List[SurveySchema]:
         """Get all surveys."""
-        surveys = self.db.query(Survey).all()
-        return [SurveySchema.model_validate(s) for s in surveys]
+        with stage("fetch"):
+            surveys = self.db.query(Survey).all()
+        with stage("models"):
+            return [SurveySchema.model_validate(s) for s in surveys]
 
     def get_survey_questions(self, survey_id: str) -> List[QuestionSchema]:
         """Get all questions for a survey."""
-        survey = self.db.query(Survey).filter(Survey.id == survey_id).first()
-        if not survey:
-            raise HTTPException(status_code=404, detail="Survey not found")
-
-        questions = self.db.query(Question).filter(Question.survey_id == survey_id).all()
-
-        result = []
-        for q in questions:
-            type_map = {
-                QuestionType.TEXT: "TEXT",
-                QuestionType.SINGLE: "SINGLE",
-                QuestionType.MULTIPLE: "MULTIPLE"
-            }
-            result.append(QuestionSchema(
-                id=q.id,
-                survey_id=q.survey_id,
-                name=q.name,
-                text=q.text,
-                type=type_map.get(q.type, "TEXT")
-            ))
-        return result
+        with stage("fetch"):
+            survey = self.db.query(Survey).filter(Survey.id == survey_id).first()
+            if not survey:
+                raise HTTPException(status_code=404, detail="Survey not found")
 
-    def validate_questions(self, request: ValidateQuestionsRequest) -> ValidateQuestionsResponse:
-        """Validate that question IDs (by name) belong to the specified survey."""
-        survey = self.db.query(Survey).filter(Survey.id == request.survey_id).first()
-        if not survey:
-            return ValidateQuestionsResponse(
-                valid=False, 
-                errors=[f"Survey {request.survey_id} not found"]
-            )
+            questions = self.db.query(Question).filter(Question.survey_id == survey_id).all()
 
-        survey_questions = self.db.query(Question.id, Question.name).filter(
-            Question.survey_id == request.survey_id
-        ).all()
+        with stage("models"):
+            return [question_schema(q) for q in questions]
 
-        question_name_to_id = {q.name: q.id for q in survey_questions}
-        valid_question_names = set(question_name_to_id.keys())
+    def validate_questions(self, request: ValidateQuestionsRequest) -> ValidateQuestionsResponse:
+        """Validate that question IDs (by name) belong to the specified survey."""
+        with stage("fetch"):
+            survey = self.db.query(Survey).filter(Survey.id == request.survey_id).first()
+            if not survey:
+                return ValidateQuestionsResponse(
+                    valid=False, 
+                    errors=[f"Survey {request.survey_id} not found"]
+                )
 
-        errors = []
-        for q_name in request.question_ids:
-            if q_name not in valid_question_names:
-                errors.append(f"Question {q_name} not found in survey {request.survey_id}")
+            survey_questions = self.db.query(Question.id, Question.name).filter(
+                Question.survey_id == request.survey_id
+            ).all()
 
-        return ValidateQuestionsResponse(valid=len(errors) == 0, errors=errors)
+        return question_errors(request, survey_questions)
 
     def get_survey_by_id(self, survey_id: str) -> Optional[Survey]:
         """Get survey by ID."""
         return self.db.query(Survey).filter(Survey.id == survey_id).first()
+
+
+class AsyncSurveyService:
+    """Survey operations on an async session."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_all_surveys(self) -> List[SurveySchema]:
+        """Get all surveys."""
+        with stage("fetch"):
+            surveys = (await self.db.scalars(select(Survey))).all()
+        with stage("models"):
+            return [SurveySchema.model_validate(s) for s in surveys]
+
+    async def get_survey_questions(self, survey_id: str) -> List[QuestionSchema]:
+        """Get all questions for a survey."""
+        with stage("fetch"):
+            if await self.get_survey_by_id(survey_id) is None:
+                raise HTTPException(status_code=404, detail="Survey not found")
+
+            questions = (await self.db.scalars(select(Question).where(Question.survey_id == survey_id))).all()
+        with stage("models"):
+            return [question_schema(q) for q in questions]
+
+    async def validate_questions(self, request: ValidateQuestionsRequest) -> ValidateQuestionsResponse:
+        """Validate that question IDs (by name) belong to the specified survey."""
+        with stage("fetch"):
+            if await self.get_survey_by_id(request.survey_id) is None:
+                return ValidateQuestionsResponse(
+                    valid=False,
+                    errors=[f"Survey {request.survey_id} not found"]
+                )
+
+            survey_questions = (await self.db.execute(
+                select(Question.id, Question.name).where(Question.survey_id == request.survey_id)
+            )).all()
+        return question_errors(request, survey_questions)
+
+    async def get_survey_by_id(self, survey_id: str) -> Optional[Survey]:
+        """Get survey by ID."""
+        return await self.db.get(Survey, survey_id)
@@ -0,0 +1,282 @@
+"""
+Full-text search over the text answers of a question.
+
+Every word of the query must occur in an answer, as a word prefix. The
+search runs on the database's text index: ``tsvector`` with a GIN index in
+PostgreSQL (words are also stemmed there), FTS5 in SQLite. Without one, or
+with ``TEXT_SEARCH_BACKEND=memory``, an inverted index of the question's
+answers is built in memory on first use and kept per data generation.
+
+Hits are returned in answer (row id) order; ``after`` takes the ``next_cursor``
+of the previous page. Snippets are HTML: the answer text is escaped and matched
+words are wrapped in ``<mark>``. The database backends mark matches with
+private-use characters, which are turned into tags after escaping.
+"""
+import bisect
+import html
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.models import DataGeneration, Question, QuestionType, Survey, TEXT_SEARCH_TABLE, TextResponse, ts_config
+from src.schemas import TextSearchHit, TextSearchResponse
+from src.settings import settings
+from src.services.concurrency import run_in_worker
+
+WORD = re.compile(r"\w+")
+MARK_START, MARK_END, ELLIPSIS = "<mark>", "</mark>", "…"
+# Match delimiters of the database snippets, replaced by the tags once the text is escaped.
+RAW_MARK_START, RAW_MARK_END = "\ue000", "\ue001"
+SNIPPET_WORDS = 12
+HEADLINE_OPTIONS = f"StartSel={RAW_MARK_START}, StopSel={RAW_MARK_END}, MaxWords=20, MinWords=5, ShortWord=1"
+
+FTS5_SEARCH = text(f"""
+    SELECT f.rowid AS id, t.respondent_id, snippet({TEXT_SEARCH_TABLE}, 0, :start, :end, :ellipsis, :words) AS snippet
+    FROM {TEXT_SEARCH_TABLE} AS f JOIN text_responses AS t ON t.id = f.rowid
+    WHERE {TEXT_SEARCH_TABLE} MATCH :match AND f.rowid > :after AND t.survey_id = :survey_id
+    ORDER BY f.rowid
+    LIMIT :limit
+""")
+
+
+def search_terms(query: str) -> List[str]:
+    """Lowercased words of the query, 400 if there are none."""
+    terms = list(dict.fromkeys(WORD.findall(query.lower())))
+    if not terms:
+        raise HTTPException(status_code=400, detail="Search query has no words")
+    return terms
+
+
+def fts5_match(terms: Sequence[str], question_id: str) -> str:
+    """FTS5 query: every term as a prefix in the text, and the question's id."""
+    words = " AND ".join(f'"{term}"*' for term in terms)
+    return f'text : ({words}) AND question_id : "{question_id.replace(chr(34), chr(34) * 2)}"'
+
+
+def marked_html(raw_snippet: str) -> str:
+    """Escape a database snippet and turn its match delimiters into ``<mark>`` tags."""
+    return html.escape(raw_snippet).replace(RAW_MARK_START, MARK_START).replace(RAW_MARK_END, MARK_END)
+
+
+def snippet(answer: str, terms: Sequence[str]) -> str:
+    """About ``SNIPPET_WORDS`` words of the answer around the first match as HTML, matches marked."""
+    words = list(WORD.finditer(answer))
+    matched = [any(word.group().lower().startswith(term) for term in terms) for word in words]
+    first = matched.index(True) if True in matched else 0
+    start = max(0, min(first - SNIPPET_WORDS // 4, len(words) - SNIPPET_WORDS))
+    end = min(len(words), start + SNIPPET_WORDS)
+
+    escape = html.escape
+    parts = [ELLIPSIS if start > 0 else escape(answer[:words[0].start()] if words else answer)]
+    position = words[start].start() if words else len(answer)
+    for word, is_match in zip(words[start:end], matched[start:end]):
+        parts.append(escape(answer[position:word.start()]))
+        parts.append(f"{MARK_START}{escape(word.group())}{MARK_END}" if is_match else escape(word.group()))
+        position = word.end()
+    parts.append(ELLIPSIS if end < len(words) else escape(answer[position:]))
+    return "".join(parts)
+
+
+class TextAnswerIndex:
+    """Inverted index of the answers of one question: word → sorted answer positions."""
+
+    def __init__(self, generation: int, rows: Sequence[Tuple[int, str, str]]):
+        self.generation = generation
+        self.ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        self.respondent_ids = [row[1] for row in rows]
+        self.answers = [row[2] for row in rows]
+
+        postings: Dict[str, List[int]] = {}
+        for position, answer in enumerate(self.answers):
+            for word in set(WORD.findall(answer.lower())):
+                postings.setdefault(word, []).append(position)
+        self.vocabulary = sorted(postings)
+        self.postings = [np.array(postings[word], dtype=np.int64) for word in self.vocabulary]
+
+    def _prefix_positions(self, term: str) -> np.ndarray:
+        start = bisect.bisect_left(self.vocabulary, term)
+        end = start
+        while end < len(self.vocabulary) and self.vocabulary[end].startswith(term):
+            end += 1
+        if end - start == 1:
+            return self.postings[start]
+        return np.unique(np.concatenate(self.postings[start:end] or [np.empty(0, np.int64)]))
+
+    def search(self, terms: Sequence[str], after: Optional[int], limit: int) -> List[Tuple[int, str, str]]:
+        """Up to ``limit`` hits ``(answer id, respondent id, snippet)`` with ids above ``after``."""
+        positions = self._prefix_positions(terms[0])
+        for term in terms[1:]:
+            positions = np.intersect1d(positions, self._prefix_positions(term), assume_unique=True)
+        if after is not None:
+            positions = positions[self.ids[positions] > after]
+        return [
+            (int(self.ids[position]), self.respondent_ids[position], snippet(self.answers[position], terms))
+            for position in positions[:limit]
+        ]
+
+
+class TextAnswerIndexes:
+    """In-memory answer indexes of this process, least recently used out first."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._indexes: "OrderedDict[str, TextAnswerIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, question_id: str, generation: int) -> Optional[TextAnswerIndex]:
+        with self._lock:
+            index = self._indexes.get(question_id)
+            if index is None or index.generation != generation:
+                return None
+            self._indexes.move_to_end(question_id)
+            return index
+
+    def put(self, question_id: str, index: TextAnswerIndex) -> None:
+        with self._lock:
+            self._indexes[question_id] = index
+            self._indexes.move_to_end(question_id)
+            while len(self._indexes) > max(self.max_entries, 1):
+                self._indexes.popitem(last=False)
+
+
+text_answer_indexes = TextAnswerIndexes(max_entries=settings.TEXT_SEARCH_MEMORY_MAX_ENTRIES)
+
+# Whether the SQLite database has the FTS5 table, per database URL.
+_fts5_available: Dict[str, bool] = {}
+
+
+class TextSearchService:
+    """Search of text answers, on an async session."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def search(
+        self,
+        survey_id: str,
+        question_name: str,
+        query: str,
+        limit: int = 50,
+        after: Optional[int] = None
+    ) -> TextSearchResponse:
+        """Answers of a TEXT question (by name) containing every word of ``query``."""
+        if await self.db.get(Survey, survey_id) is None:
+            raise HTTPException(status_code=404, detail="Survey not found")
+        question = await self.db.scalar(
+            select(Question).where(Question.survey_id == survey_id, Question.name == question_name)
+        )
+        if question is None:
+            raise HTTPException(status_code=404, detail="Question not found")
+        if question.type != QuestionType.TEXT:
+            raise HTTPException(status_code=400, detail=f"Question {question_name} is not a TEXT question")
+        terms = search_terms(query)
+
+        backend = await self._backend()
+        if backend == "postgresql":
+            hits = await self._search_postgresql(question, terms, after, limit + 1)
+        elif backend == "fts5":
+            hits = await self._search_fts5(question, terms, after, limit + 1)
+        else:
+            index = await self._memory_index(question)
+            hits = await run_in_worker(index.search, terms, after, limit + 1)
+
+        next_cursor = None
+        if len(hits) > limit:
+            hits = hits[:limit]
+            next_cursor = hits[-1][0]
+        return TextSearchResponse(
+            survey_id=survey_id,
+            question_id=question_name,
+            query=query,
+            results=[
+                TextSearchHit(response_id=response_id, respondent_id=respondent_id, snippet=hit_snippet)
+                for response_id, respondent_id, hit_snippet in hits
+            ],
+            next_cursor=next_cursor,
+        )
+
+    async def _backend(self) -> str:
+        """``postgresql``, ``fts5`` or ``memory``."""
+        dialect = self.db.bind.dialect.name
+        if settings.TEXT_SEARCH_BACKEND == "memory":
+            return "memory"
+        if dialect == "postgresql":
+            return "postgresql"
+        if dialect == "sqlite":
+            url = str(self.db.bind.url)
+            if url not in _fts5_available:
+                _fts5_available[url] = await self.db.scalar(
+                    text("SELECT count(*) FROM sqlite_master WHERE name = :name"), {"name": TEXT_SEARCH_TABLE}
+                ) > 0
+            if _fts5_available[url]:
+                return "fts5"
+        return "memory"
+
+    async def _search_postgresql(
+        self,
+        question: Question,
+        terms: Sequence[str],
+        after: Optional[int],
+        limit: int
+    ) -> List[Tuple[int, str, str]]:
+        tsquery = func.to_tsquery(ts_config(), " & ".join(f"{term}:*" for term in terms))
+        matches = (
+            select(TextResponse.id, TextResponse.respondent_id, TextResponse.text)
+            .where(
+                TextResponse.survey_id == question.survey_id,
+                TextResponse.question_id == question.id,
+                func.to_tsvector(ts_config(), TextResponse.text).op("@@")(tsquery),
+            )
+            .order_by(TextResponse.id)
+            .limit(limit)
+        )
+        if after is not None:
+            matches = matches.where(TextResponse.id > after)
+        matches = matches.subquery()
+        # Headlines are computed for the page only.
+        rows = await self.db.execute(
+            select(
+                matches.c.id,
+                matches.c.respondent_id,
+                func.ts_headline(ts_config(), matches.c.text, tsquery, HEADLINE_OPTIONS),
+            ).order_by(matches.c.id)
+        )
+        return [(response_id, respondent_id, marked_html(headline)) for response_id, respondent_id, headline in rows]
+
+    async def _search_fts5(
+        self,
+        question: Question,
+        terms: Sequence[str],
+        after: Optional[int],
+        limit: int
+    ) -> List[Tuple[int, str, str]]:
+        rows = await self.db.execute(FTS5_SEARCH, {
+            "start": RAW_MARK_START,
+            "end": RAW_MARK_END,
+            "ellipsis": ELLIPSIS,
+            "words": SNIPPET_WORDS,
+            "match": fts5_match(terms, question.id),
+            "after": after if after is not None else -1,
+            "survey_id": question.survey_id,
+            "limit": limit,
+        })
+        return [(response_id, respondent_id, marked_html(raw)) for response_id, respondent_id, raw in rows]
+
+    async def _memory_index(self, question: Question) -> TextAnswerIndex:
+        generation = await self.db.scalar(
+            select(DataGeneration.generation).where(DataGeneration.survey_id == question.survey_id)
+        ) or 0
+        index = text_answer_indexes.get(question.id, generation)
+        if index is None:
+            rows = (await self.db.execute(
+                select(TextResponse.id, TextResponse.respondent_id, TextResponse.text)
+                .where(TextResponse.survey_id == question.survey_id, TextResponse.question_id == question.id)
+                .order_by(TextResponse.id)
+            )).all()
+            index = await run_in_worker(TextAnswerIndex, generation, rows)
+            text_answer_indexes.put(question.id, index)
+        return index
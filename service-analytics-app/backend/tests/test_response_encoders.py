@@ -0,0 +1,75 @@
+"""
+The orjson fast path must produce the same bytes as the Pydantic response models.
+"""
+import numpy as np
+import pytest
+from src.schemas import GetResponsesResponse, RespondentResponseData, ResponseData
+from src.services.response_encoders import encode_responses_json
+from src.services.response_matrix import QuestionColumn, ResponseMatrix
+
+
+def _column(values):
+    column = np.empty(len(values), dtype=object)
+    column[:] = values
+    return column
+
+
+@pytest.fixture
+def matrix() -> ResponseMatrix:
+    questions = [
+        QuestionColumn("uuid-1", "Q1", "TEXT"),
+        QuestionColumn("uuid-2", "Q2", "SINGLE"),
+        QuestionColumn("uuid-3", "Q3", "MULTIPLE"),
+    ]
+    columns = {
+        "Q1": _column(["Ответ «да» — ✓", None, 'quote " and \\ backslash\n', "emoji 😀"]),
+        "Q2": _column([1, 2, None, 3]),
+        "Q3": _column([[3, 1], None, [2], []]),
+    }
+    return ResponseMatrix(["r-001", "r-002", "ответчик-3", "r-004"], questions, columns)
+
+
+def _models(matrix: ResponseMatrix, question_names, next_cursor) -> GetResponsesResponse:
+    return GetResponsesResponse(
+        respondents=[
+            RespondentResponseData(
+                respondent_id=respondent_id,
+                responses=[
+                    ResponseData(
+                        question_id=question.name,
+                        question_name=question.name,
+                        question_type=question.type,
+                        value=value,
+                    )
+                    for question, value in cells
+                ],
+            )
+            for respondent_id, cells in matrix.iter_rows(question_names)
+        ],
+        next_cursor=next_cursor,
+    )
+
+
+@pytest.mark.parametrize("next_cursor", [None, "r-004", "курсор"])
+@pytest.mark.parametrize(
+    "question_names",
+    [["Q1", "Q2", "Q3"], ["Q3", "Q1"], ["Q2", "missing", "Q2"], []],
+)
+def test_encode_responses_json_matches_models(matrix, question_names, next_cursor):
+    expected = _models(matrix, question_names, next_cursor).model_dump_json().encode()
+
+    assert encode_responses_json(matrix, question_names, next_cursor) == expected
+
+
+def test_unanswered_cells_use_question_defaults(matrix):
+    encoded = encode_responses_json(matrix, ["Q1", "Q3"])
+
+    assert b'"respondent_id":"r-002","responses":[' in encoded
+    assert b'"question_type":"TEXT","value":""' in encoded
+    assert b'"question_type":"MULTIPLE","value":[]' in encoded
+
+
+def test_empty_matrix():
+    empty = ResponseMatrix([], [QuestionColumn("uuid-1", "Q1", "TEXT")], {"Q1": _column([])})
+
+    assert encode_responses_json(empty, ["Q1"], None) == b'{"respondents":[],"next_cursor":null}'
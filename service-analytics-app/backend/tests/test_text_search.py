@@ -0,0 +1,62 @@
+"""
+Search snippets are HTML: answer text is escaped, only the match marks are tags.
+"""
+import sqlite3
+import pytest
+from src.services.text_search_service import (
+    ELLIPSIS,
+    RAW_MARK_END,
+    RAW_MARK_START,
+    SNIPPET_WORDS,
+    marked_html,
+    snippet,
+)
+
+ANSWER = 'Мне <b>очень</b> понравилось <img src=x onerror="alert(1)"> & сервис'
+
+
+def test_snippet_escapes_answer_markup():
+    result = snippet(ANSWER, ["очен"])
+
+    assert "&lt;b&gt;<mark>очень</mark>&lt;/b&gt;" in result
+    assert "&lt;img src=x onerror=&quot;alert(1)&quot;&gt;" in result
+    assert "&amp; сервис" in result
+    assert "<b>" not in result and "<img" not in result
+
+
+def test_snippet_escapes_trimmed_answer():
+    answer = "<i>" + " ".join(f"w{i}" for i in range(3 * SNIPPET_WORDS)) + " <u>target</u> " + "x " * SNIPPET_WORDS
+
+    result = snippet(answer, ["target"])
+
+    assert result.startswith(ELLIPSIS) and result.endswith(ELLIPSIS)
+    assert "&lt;u&gt;<mark>target</mark>&lt;/u&gt;" in result
+    assert "<i>" not in result and "<u>" not in result
+
+
+def test_snippet_without_words_is_escaped():
+    assert snippet("<br>", ["x"]) == "&lt;br&gt;"
+
+
+def test_marked_html_escapes_database_snippet():
+    raw = f"<b>{RAW_MARK_START}очень{RAW_MARK_END}</b> <script>x</script>"
+
+    assert marked_html(raw) == "&lt;b&gt;<mark>очень</mark>&lt;/b&gt; &lt;script&gt;x&lt;/script&gt;"
+
+
+def test_fts5_snippet_is_escaped():
+    connection = sqlite3.connect(":memory:")
+    try:
+        connection.execute("CREATE VIRTUAL TABLE answers USING fts5(text)")
+    except sqlite3.OperationalError:
+        pytest.skip("SQLite is built without FTS5")
+    connection.execute("INSERT INTO answers (text) VALUES (?)", (ANSWER,))
+
+    (raw,) = connection.execute(
+        "SELECT snippet(answers, 0, ?, ?, ?, ?) FROM answers WHERE answers MATCH ?",
+        (RAW_MARK_START, RAW_MARK_END, ELLIPSIS, SNIPPET_WORDS, '"очен"*'),
+    ).fetchone()
+    result = marked_html(raw)
+
+    assert "&lt;b&gt;<mark>очень</mark>&lt;/b&gt;" in result
+    assert "<b>" not in result and "<img" not in result
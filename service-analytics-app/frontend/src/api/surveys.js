@@ -2,6 +2,8 @@ import axios from 'axios'
 
 const API_BASE_URL = '/api'
 
+export const RESPONSES_PAGE_SIZE = 200
+
 const api = axios.create({
   baseURL: API_BASE_URL,
   headers: {
@@ -17,13 +19,15 @@ export const surveysApi = {
       survey_id: surveyId,
       question_ids: questionIds
     }),
-  getResponses: (surveyId, questionIds) =>
+  // page: { limit, after } — keyset pagination over respondent_id
+  getResponses: (surveyId, questionIds, page = {}) =>
     api.post('/surveys/responses', {
       survey_id: surveyId,
-      question_ids: questionIds
+      question_ids: questionIds,
+      ...page
     }),
-  getAllResponses: (surveyId) =>
-    api.get(`/surveys/${surveyId}/all-responses`),
+  getAllResponses: (surveyId, page = {}) =>
+    api.get(`/surveys/${surveyId}/all-responses`, { params: page }),
   getAnswerOptions: (questionIds) =>
     api.get(`/answer-options/questions/${questionIds.join(',')}`)
 }